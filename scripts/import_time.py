@@ -0,0 +1,60 @@
+"""Measure how long `from iytdl import iYTDL` takes in a fresh interpreter
+
+Usage: python scripts/import_time.py [runs]
+"""
+
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+from pathlib import Path
+from typing import Dict, List
+
+
+SRC = Path(__file__).resolve().parent.parent.joinpath("src")
+_line = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+
+def import_times(code: str) -> Dict[str, int]:
+    """Cumulative import time (in us) of every module imported directly by `code`"""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, (str(SRC), env.get("PYTHONPATH"))))
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+    out: Dict[str, int] = {}
+    for line in stderr.splitlines():
+        if (match := _line.match(line)) and not match.group(3):
+            out[match.group(4)] = int(match.group(2))
+    return out
+
+
+def main(runs: int = 5) -> None:
+    # imported by the interpreter itself on start up
+    startup = set(import_times("pass"))
+    totals: List[float] = []
+    for _ in range(runs):
+        times = {
+            name: cumulative
+            for name, cumulative in import_times("from iytdl import iYTDL").items()
+            if name not in startup
+        }
+        totals.append(sum(times.values()) / 1000)
+    print(
+        f"from iytdl import iYTDL: {statistics.median(totals):.1f} ms (median of {runs})"
+    )
+    print("Slowest imports:")
+    for name, cumulative in sorted(times.items(), key=lambda x: x[1], reverse=True)[
+        :10
+    ]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:2]))
@@ -1,2 +1,22 @@
-from iytdl.main import iYTDL  # noqa ignore=F401
-from iytdl.processes import Process  # noqa ignore=F401
+from importlib import import_module
+from typing import TYPE_CHECKING, Any, List
+
+
+if TYPE_CHECKING:
+    from iytdl.main import iYTDL  # noqa ignore=F401
+    from iytdl.processes import Process  # noqa ignore=F401
+
+# Loaded on first access, so that `import iytdl` stays cheap
+_LAZY = {"iYTDL": "iytdl.main", "Process": "iytdl.processes"}
+
+
+def __getattr__(name: str) -> Any:
+    if (module := _LAZY.get(name)) is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted([*globals(), *_LAZY])
@@ -14,3 +14,60 @@ TELEGRA_PH_HEADERS = {
     "referer": f"{TELEGRA_PH}/",
     "accept-language": "en-US,en;q=0.9",
 }
+
+# Search
+SEARCH_PAGE_SIZE = 15
+# Next page of results is fetched when fewer than these are left
+SEARCH_PREFETCH = 5
+
+# Extracted info
+# Kept this long (in seconds) if stream URLs don't tell when they expire
+INFO_CACHE_TTL = 3600
+# Expire a bit before stream URLs do
+INFO_EXPIRY_MARGIN = 300
+# Format fields kept in the info manifest
+MANIFEST_FORMAT_FIELDS = (
+    "format_id",
+    "format",
+    "format_note",
+    "ext",
+    "filesize",
+    "acodec",
+    "vcodec",
+    "abr",
+    "tbr",
+    "width",
+    "height",
+)
+
+# Downloads
+# Bump when download options change, so that older downloads aren't reused
+DOWNLOAD_PROFILE = "1"
+# Written in a media directory once its download is complete
+DOWNLOAD_COMPLETE_MARKER = ".complete"
+# Upload metadata of the downloaded file, written in its media directory
+MEDIA_INFO_FILE = ".media.json"
+# A caller waiting for a download checks this often (in seconds) if it was cancelled
+CANCEL_POLL_INTERVAL = 1
+# Completed downloads are evicted once this fraction of the media cache quota is used
+MEDIA_CACHE_HIGH_WATERMARK = 0.9
+# down to this fraction
+MEDIA_CACHE_LOW_WATERMARK = 0.75
+
+# Uploads
+# Thumbnail taken from a video, kept in its media directory
+VIDEO_THUMBNAIL = ".thumbnail.jpg"
+# Max. width and height of Telegram thumbnails
+THUMBNAIL_SIZE = 320
+# Max. size of Telegram thumbnails (in bytes)
+THUMBNAIL_MAX_BYTES = 200 * 1024
+# JPEG qualities tried in turn until a thumbnail fits
+THUMBNAIL_QUALITY = (85, 70, 55, 40)
+# Processed thumbnails are cached in this subfolder of the download location
+THUMBNAIL_CACHE = ".thumbnails"
+# at most these many, least recently used are deleted
+THUMBNAIL_CACHE_SIZE = 1024
+
+# Jobs
+# An unfinished download / upload is resumed this many times at most
+JOB_MAX_ATTEMPTS = 3
@@ -2,24 +2,40 @@ __all__ = ["Downloader"]
 
 
 import asyncio
+import hashlib
+import json
 import logging
 import os
-import time
 
+from contextlib import asynccontextmanager
 from math import floor
-from typing import Any, Callable, Dict, Union
+from shutil import rmtree
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Union,
+)
 
-import yt_dlp as youtube_dl
-
-from pyrogram import ContinuePropagation, StopPropagation, StopTransmission
-from pyrogram.errors import FloodWait, MessageNotModified
+from pyrogram import StopTransmission
 from pyrogram.types import CallbackQuery, Message
 
-# from youtube_dl.utils import DownloadError, GeoRestrictedError
-from yt_dlp.utils import DownloadError, GeoRestrictedError
-
+from iytdl.constants import (
+    CANCEL_POLL_INTERVAL,
+    DOWNLOAD_COMPLETE_MARKER,
+    DOWNLOAD_PROFILE,
+    YT_VID_URL,
+)
 from iytdl.exceptions import DownloadFailedError
+from iytdl.executors import run_in_executor
+from iytdl.file_lock import FileLock
+from iytdl.journal import message_target
 from iytdl.processes import Process
+from iytdl.progress_channel import ProgressChannel
 from iytdl.utils import *
 
 
@@ -35,32 +51,32 @@ class Downloader:
             "addmetadata": True,
             "geo_bypass": True,
             "nocheckcertificate": True,
-            "outtmpl": os.path.join(
-                str(self.download_path), rnd_key, "%(title)s-%(format)s.%(ext)s"
-            ),
             "logger": logger,
-            "progress_hooks": [prog_func],
-            "format": uid,
             "writethumbnail": True,
             "prefer_ffmpeg": True,
+            # resume `.part` files left by an interrupted download
+            "continuedl": True,
             "postprocessors": [{"key": "FFmpegMetadata"}],
             "quiet": self.silent,
             "logtostderr": self.silent,
         }
-        return await self.ytdownloader(url, options)
+        return await self.ytdownloader(
+            url,
+            options,
+            format=uid,
+            outtmpl=self._outtmpl(rnd_key),
+            progress_hooks=[prog_func],
+        )
 
     async def audio_downloader(
         self, url: str, uid: str, rnd_key: str, prog_func: Callable
     ) -> Union[int, str]:
         options = {
-            "outtmpl": os.path.join(
-                str(self.download_path), rnd_key, "%(title)s-%(format)s.%(ext)s"
-            ),
             "logger": logger,
-            "progress_hooks": [prog_func],
             "writethumbnail": True,
             "prefer_ffmpeg": True,
             "format": "bestaudio/best",
+            "continuedl": True,
             "geo_bypass": True,
             "nocheckcertificate": True,
             "postprocessors": [
@@ -75,16 +91,43 @@ class Downloader:
             "quiet": self.silent,
             "logtostderr": self.silent,
         }
-        return await self.ytdownloader(url, options)
+        return await self.ytdownloader(
+            url,
+            options,
+            outtmpl=self._outtmpl(rnd_key),
+            progress_hooks=[prog_func],
+        )
+
+    def _outtmpl(self, rnd_key: str) -> str:
+        return os.path.join(
+            str(self.download_path), rnd_key, "%(title)s-%(format)s.%(ext)s"
+        )
+
+    @run_in_executor("bulk")
+    def ytdownloader(
+        self, url: str, options: Dict[str, Any], **overrides: Any
+    ) -> Union[int, str]:
+        """Download with a pooled `YoutubeDL` instance
+
+        Parameters:
+        ----------
+            - url (`str`): Youtube_dl supported URL.
+            - options (`Dict[str, Any]`): `YoutubeDL` options shared by similar downloads.
+            - overrides: Per download `"format"`, `"outtmpl"` or `"progress_hooks"`.
+        """
+        from yt_dlp.utils import DownloadError, GeoRestrictedError
+
+        from iytdl.postprocessors import MediaInfoPP
+
+        # upload metadata of the final file, so it isn't parsed again
+        overrides["post_processors"] = [MediaInfoPP()]
 
-    @run_sync
-    def ytdownloader(self, url: str, options: Dict[str, Any]) -> Union[int, str]:
         if self._ffmpeg != "ffmpeg":
             options["ffmpeg_location"] = str(self._ffmpeg)
         if (ext_dl := self.external_downloader) is not None:
             options.update(ext_dl._export())
         try:
-            with youtube_dl.YoutubeDL(options) as ytdl:
+            with self.ydl_pool.checkout(options, **overrides) as ytdl:
                 return ytdl.download([url])
         except DownloadError:
             logger.error("[DownloadError] : Failed to Download Video")
@@ -105,6 +148,8 @@ class Downloader:
         with_progress: bool = True,
         edit_rate: int = 8,
         cb_extra: Union[int, str, None] = None,
+        priority: str = "normal",
+        resume_upload: bool = False,
     ) -> str:
         """Download Media with progress bar
 
@@ -117,94 +162,316 @@ class Downloader:
             - with_progress (`bool`, optional): Enable / Disable progress. (Defaults to `True`)
             - edit_rate (`int`, optional): Progress edit rate in seconds. (Defaults to `8`)
             - cb_extra (`Union[int, str, None]`, optional): Extra callback_data for cancel markup (Defaults to `None`)
+            - priority (`str`, optional): [`'high'` | `'normal'` | `'low'`] When downloads are queued. (Defaults to `"normal"`)
+            - resume_upload (`bool`, optional): If a restart interrupts the download, upload it to `log_group_id` once resumed, pass `True` if `upload()` follows. (Defaults to `False`)
 
         Returns:
         -------
-            `str`: Key to upload media, After successful download
+            `str`: Key to upload media, After successful download.
+                Same for all downloads of the same media, format and `downtype`.
+                Returned without downloading if the media was uploaded before.
 
         Raises:
         ------
             `TypeError`: On unsupported `downtype`
-            `StopTransmission`: When download is cancelled
+            `StopTransmission`: When download is cancelled, a download shared
+                with other callers only stops once all of them cancelled
             `DownloadFailedError`: In case youtube_dl download return code is not equal to 0
+            `InsufficientSpaceError`: If there isn't enough free disk space
         """
-        last_update_time = None
+        process = Process(update, cb_extra=cb_extra, registry=self.processes)
+        key = self.media_key(url, uid, downtype)
+        if await self.cache.get_upload(key):
+            # `upload()` sends it again by its file id
+            return key
+        # messages are edited by `progress.consume()` once every `edit_rate` seconds
+        progress = ProgressChannel()
 
-        process = Process(update, cb_extra=cb_extra)
-        key = rnd_key()
+        async def edit_progress(prog_data: Dict) -> None:
+            if text := self._progress_text(prog_data):
+                await self.progress_func(process, text)
 
-        def prog_func(prog_data: Dict) -> None:
-            nonlocal last_update_time
-            now = int(time.time())
-            # Only edit message once every 8 seconds to avoid ratelimits
+        if downtype == "video":
+            downloader = self.video_downloader
+        elif downtype == "audio":
+            downloader = self.audio_downloader
+        else:
+            raise TypeError(f"'{downtype}' is Unsupported !")
 
-            if process.is_cancelled:
-                logger.warning("Download process is Cancelled")
-                raise StopTransmission
+        async def start() -> Union[int, str]:
+            # shared by every caller waiting for this download
+            async with self.scheduler.slot(
+                "download",
+                self._job_owner(process, cb_extra),
+                priority,
+                on_wait=self._on_download_queued(key),
+            ):
+                await self._make_room(list(self._media_refs))
+                return await downloader(url, uid, key, self._download_hook(key))
 
-            if prog_data.get("status") == "finished":
-                progress = "🔄  Download finished, Uploading..."
-            elif last_update_time is None or (now - last_update_time) >= edit_rate:
-                # ------------ Progress Data ------------ #
-                if not (
-                    (eta := prog_data.get("eta")) and (speed := prog_data.get("speed"))
-                ):
-                    return
-                current = prog_data.get("downloaded_bytes")
-                filename = prog_data.get("filename")
-                if total := prog_data.get("total_bytes"):
-                    percentage = round(current / total * 100)
-                    progress_bar = (
-                        f"[{'█' * floor(15 * percentage / 100)}"
-                        f"{'░' * floor(15 * (1 - percentage / 100))}]"
+        job = {
+            "url": url,
+            "uid": uid,
+            "downtype": downtype,
+            "with_progress": with_progress,
+            "cb_extra": cb_extra,
+            "priority": priority,
+            "upload": resume_upload,
+        }
+        callers = self._download_callers.setdefault(key, {})
+        callers[process] = progress if with_progress else None
+        # taken before the download, so that the media is kept for this caller
+        # even if others sharing it are done with it first
+        self._media_refs[key] = self._media_refs.get(key, 0) + 1
+        if with_progress:
+            editor = asyncio.create_task(progress.consume(edit_progress, edit_rate))
+        try:
+            with self.processes.running(process):
+                async with self._journaled(process, "download", update, job):
+                    # concurrent requests for the same media share one download
+                    await self._until_cancelled(
+                        process,
+                        self._download_flights.run(
+                            key,
+                            self._download_once,
+                            key,
+                            start,
+                            {"url": url, "uid": uid, "downtype": downtype},
+                        ),
                     )
-                    # ---------------------------------------- #
-                    progress = f"""
+        except BaseException:
+            # not downloaded for this caller, nothing to delete
+            if (refs := self._media_refs.pop(key, 1) - 1) > 0:
+                self._media_refs[key] = refs
+            raise
+        finally:
+            # the download goes on for other callers, see `_download_hook`
+            callers.pop(process, None)
+            if not callers and self._download_callers.get(key) is callers:
+                del self._download_callers[key]
+            progress.close()
+            if with_progress:
+                await editor
+        self.media_cache.touch(key)
+        return key
+
+    @staticmethod
+    def _progress_text(prog_data: Dict) -> Optional[str]:
+        """Progress message of a yt-dlp progress hook call"""
+        if prog_data.get("status") == "finished":
+            return "🔄  Download finished, Uploading..."
+        # ------------ Progress Data ------------ #
+        if not ((eta := prog_data.get("eta")) and (speed := prog_data.get("speed"))):
+            return
+        current = prog_data.get("downloaded_bytes")
+        filename = prog_data.get("filename")
+        if total := prog_data.get("total_bytes"):
+            percentage = round(current / total * 100)
+            progress_bar = (
+                f"[{'█' * floor(15 * percentage / 100)}"
+                f"{'░' * floor(15 * (1 - percentage / 100))}]"
+            )
+            # ---------------------------------------- #
+            return f"""
 <i>Downloading:</i>  <code>{filename}</code>
 <b>Completed:</b>  <code>{humanbytes(current)} / {humanbytes(total)}</code>
 <b>Progress:</b>  <code>{progress_bar} {percentage} %</code>
 <b>Speed:</b>  <code>{humanbytes(speed)}</code>
 <b>ETA:</b>  <code>{time_formater(eta)}</code>
 """
-                else:
-                    # Total is None, Generic progress bar
-                    progress = f"""
+        # Total is None, Generic progress bar
+        return f"""
 <i>Downloading:</i>  <code>{filename}</code>
 <b>Completed:</b>  <code>{humanbytes(current)} / [N/A]</code>
 <b>Speed:</b>  <code>-</code>
 <b>ETA:</b>  <code>-</code>
 """
-            else:
-                return
-            if with_progress:
-                self.loop.create_task(self.progress_func(process, progress))
-            last_update_time = now
 
-        if downtype == "video":
-            out = await self.video_downloader(url, uid, key, prog_func)
-        elif downtype == "audio":
-            out = await self.audio_downloader(url, uid, key, prog_func)
-        else:
-            raise TypeError(f"'{downtype}' is Unsupported !")
+    @asynccontextmanager
+    async def _journaled(
+        self,
+        process: Process,
+        stage: str,
+        update: Union[Message, CallbackQuery],
+        job: Dict[str, Any],
+    ) -> AsyncIterator[None]:
+        """Record the job while it runs, so that `start()` resumes it after a crash
 
-        if isinstance(out, int) and out == 0:
-            return key
-        raise DownloadFailedError(str(out))
+        Parameters:
+        ----------
+            - process (`Process`): Process of the job.
+            - stage (`str`): [`'download'` | `'upload'`].
+            - update (`Union[Message, CallbackQuery]`): Update showing its progress.
+            - job (`Dict[str, Any]`): JSON serializable arguments to resume it.
+        """
+        if self.client is None:
+            # nothing to resume with
+            yield
+            return
+        job["target"] = message_target(update)
+        await self.cache.set_job(process.id, stage, job)
+        try:
+            yield
+        except asyncio.CancelledError:
+            # stopped, resumed on next start
+            raise
+        except BaseException:
+            await self.cache.delete_job(process.id)
+            raise
+        await self.cache.delete_job(process.id)
+
+    def _download_hook(self, key: str) -> Callable[[Dict], None]:
+        """yt-dlp progress hook of a shared download, see `_download_callers`"""
+
+        def hook(prog_data: Dict) -> None:
+            # Runs in the download thread for every chunk
+            callers = tuple(self._download_callers.get(key, {}).items())
+            if all(process.is_cancelled for process, _ in callers):
+                logger.warning("Download process is Cancelled")
+                raise StopTransmission
+            for process, progress in callers:
+                if progress is not None and not process.is_cancelled:
+                    progress.put(prog_data)
+
+        return hook
+
+    def _on_download_queued(self, key: str) -> Callable[[int], Awaitable[None]]:
+        """Report position of a queued download to its callers, leaves the queue
+        once all of them cancelled"""
+
+        async def on_wait(position: int) -> None:
+            callers = [
+                (process, progress)
+                for process, progress in self._download_callers.get(key, {}).items()
+                if not process.is_cancelled
+            ]
+            if not callers:
+                logger.warning("Queued process is Cancelled")
+                raise StopTransmission
+            for process, progress in callers:
+                if progress is not None:
+                    await self.progress_func(
+                        process, f"⏳  Queued, position <code>{position}</code>"
+                    )
+
+        return on_wait
 
     @staticmethod
-    async def progress_func(process: Process, text: str) -> None:
+    async def _until_cancelled(process: Process, aw: Awaitable[Any]) -> Any:
+        """Await `aw`, unless `process` is cancelled first
+
+        Raises:
+        ------
+            `StopTransmission`: When cancelled, `aw` is cancelled as well
+        """
+        task = asyncio.ensure_future(aw)
         try:
-            await process.edit(
-                text=text,
-                parse_mode="HTML",
-                disable_web_page_preview=True,
-                reply_markup=process.cancel_markup,
-            )
-        except FloodWait as f:
-            await asyncio.sleep(f.x + 2)
-        except (StopPropagation, StopTransmission) as p_e:
-            raise p_e
-        except (ContinuePropagation, MessageNotModified):
-            pass
-        except Exception:
-            logger.exception("Progress")
+            while True:
+                done, _ = await asyncio.wait({task}, timeout=CANCEL_POLL_INTERVAL)
+                if done and not (
+                    # failed as it was stopped, see `_download_hook`
+                    process.is_cancelled
+                    and not task.cancelled()
+                    and task.exception() is not None
+                ):
+                    return task.result()
+                if process.is_cancelled:
+                    logger.warning("Download process is Cancelled")
+                    raise StopTransmission
+        finally:
+            task.cancel()
+
+    @staticmethod
+    def _job_owner(process: Process, cb_extra: Union[int, str, None]) -> Any:
+        """Jobs of the same owner take turns with other owners' when queued"""
+        return cb_extra if cb_extra is not None else process.user_id
+
+    def _on_queued(
+        self, process: Process, with_progress: bool = True
+    ) -> Callable[[int], Awaitable[None]]:
+        """Report position of a queued job, leaves the queue once cancelled"""
+
+        async def on_wait(position: int) -> None:
+            if process.is_cancelled:
+                logger.warning("Queued process is Cancelled")
+                raise StopTransmission
+            if with_progress:
+                await self.progress_func(
+                    process, f"⏳  Queued, position <code>{position}</code>"
+                )
+
+        return on_wait
+
+    def media_key(self, url: str, uid: str, downtype: str) -> str:
+        """Key of the downloaded media, i.e its subfolder name
+
+        Parameters:
+        ----------
+            - url (`str`): Youtube_dl supported URL.
+            - uid (`str`): Preferred media choice.
+            - downtype (`str`): [`'audio'` | `'video'`].
+
+        Returns:
+        -------
+            `str`: Same for the same media, format and postprocessing
+        """
+        if match := self.yt_link_regex.search(url):
+            url = f"{YT_VID_URL}{match.group(1)}"
+        profile = "|".join((url.strip(), str(uid), downtype, DOWNLOAD_PROFILE))
+        return hashlib.sha1(profile.encode("UTF-8")).hexdigest()[:16]
+
+    async def _download_once(
+        self,
+        key: str,
+        start: Callable[[], Awaitable[Union[int, str]]],
+        source: Dict[str, str],
+    ) -> None:
+        """Download unless done already, waits if another process is downloading it"""
+        marker = self.download_path.joinpath(key, DOWNLOAD_COMPLETE_MARKER)
+        lock = FileLock(self.download_path.joinpath(f"{key}.lock"))
+        while not marker.is_file():
+            if not lock.acquire():
+                await asyncio.sleep(1)
+                continue
+            try:
+                if marker.is_file():
+                    # finished while the lock was being taken
+                    return
+                out = await start()
+                if not (isinstance(out, int) and out == 0):
+                    raise DownloadFailedError(str(out))
+                marker.write_text(json.dumps(source))
+            finally:
+                lock.release()
+
+    def _media_source(self, key: str) -> Optional[Dict[str, str]]:
+        """`url`, `uid` and `downtype` of a downloaded media"""
+        marker = self.download_path.joinpath(key, DOWNLOAD_COMPLETE_MARKER)
+        try:
+            return json.loads(marker.read_text())
+        except (OSError, ValueError):
+            return
+
+    def _release_media(self, key: str) -> None:
+        """Called once a caller of `download()` is done with the media, which is
+        deleted after the last one if `delete_media` is set and there is no media cache
+        """
+        if (refs := self._media_refs.pop(key, 1) - 1) > 0:
+            self._media_refs[key] = refs
+            return
+        if self.delete_file_after_upload and self.media_cache.quota is None:
+            rmtree(self.download_path.joinpath(key), ignore_errors=True)
+
+    @run_in_executor("bulk")
+    def _make_room(self, in_use: List[str]) -> None:
+        self.media_cache.make_room(in_use)
+
+    async def progress_func(self, process: Process, text: str) -> None:
+        """Show progress, without waiting for the edit, see `~iytdl.edit_scheduler.EditScheduler`"""
+        self.edits.submit(
+            process,
+            text,
+            parse_mode="HTML",
+            disable_web_page_preview=True,
+            reply_markup=process.cancel_markup,
+        )
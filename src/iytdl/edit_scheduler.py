@@ -0,0 +1,225 @@
+__all__ = ["EditScheduler", "TokenBucket"]
+
+import asyncio
+import logging
+import time
+
+from collections import OrderedDict
+from contextlib import suppress
+from typing import Any, Dict, Optional, Set, Tuple
+
+from pyrogram import ContinuePropagation, StopPropagation, StopTransmission
+from pyrogram.errors import FloodWait, MessageNotModified
+
+from iytdl.processes import Process
+
+
+logger = logging.getLogger(__name__)
+
+# Last sent text is remembered for these many messages
+_MAX_SENT = 4096
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float) -> None:
+        """Allow `rate` actions per second on average and up to `burst` at once
+
+        The rate is halved on every `backoff()` and recovers by small steps with each `recover()`.
+
+        Parameters:
+        ----------
+            - rate (`float`): Tokens per second.
+            - burst (`float`): Max. tokens.
+        """
+        self.max_rate = self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.blocked_until = 0.0
+        self._updated = time.monotonic()
+
+    def __refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay(self, now: float) -> float:
+        """Seconds until a token is available"""
+        self.__refill(now)
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float) -> None:
+        self.__refill(now)
+        self.tokens -= 1
+
+    def backoff(self, seconds: float, now: float) -> None:
+        """Block for `seconds` and slow down"""
+        self.blocked_until = now + seconds
+        self.tokens = 0
+        self.rate = max(self.rate / 2, self.max_rate / 16)
+
+    def recover(self) -> None:
+        self.rate = min(self.max_rate, self.rate + self.max_rate / 16)
+
+    def idle(self, now: float) -> bool:
+        """Full and at its max. rate, so it can be dropped"""
+        self.__refill(now)
+        return self.tokens >= self.burst and self.rate == self.max_rate
+
+
+class EditScheduler:
+    def __init__(
+        self, rate: float = 20, chat_rate: float = 0.5, chat_burst: float = 3
+    ) -> None:
+        """Send progress edits of all jobs within global and per chat rate limits
+
+        Edits are submitted without waiting, a newer edit of a message replaces
+        the pending one and an edit that doesn't change the text is dropped.
+        A chat is slowed down whenever Telegram asks to wait (`FloodWait`).
+
+        Parameters:
+        ----------
+            - rate (`float`, optional): Max. edits per second, in total. (Defaults to `20`)
+            - chat_rate (`float`, optional): Max. edits per second, per chat. (Defaults to `0.5`)
+            - chat_burst (`float`, optional): Max. edits at once, per chat. (Defaults to `3`)
+        """
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.submitted = 0
+        self.merged = 0
+        self.skipped = 0
+        self.sent = 0
+        self.flood_waits = 0
+        self._global = TokenBucket(rate, rate)
+        self._chats: Dict[str, TokenBucket] = {}
+        # message -> latest edit not sent yet, oldest first
+        self._pending: "OrderedDict[str, Tuple[Process, str, Dict[str, Any]]]" = (
+            OrderedDict()
+        )
+        # message -> task sending its edit
+        self._sending: Dict[str, asyncio.Task] = {}
+        # messages discarded while an edit was being sent, it isn't retried
+        self._discarded: Set[str] = set()
+        self._last_text: "OrderedDict[str, str]" = OrderedDict()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _chat(process: Process) -> str:
+        # Process ID is "chat_id.message_id", or the query ID for inline messages
+        return process.id.rpartition(".")[0] or process.id
+
+    def submit(self, process: Process, text: str, **kwargs: Any) -> None:
+        """Edit the message of `process` as soon as the rate limits allow it
+
+        Parameters:
+        ----------
+            - process (`Process`): Process showing the progress.
+            - text (`str`): New text.
+            - kwargs: Passed on to `process.edit` e.g `reply_markup`.
+        """
+        self.submitted += 1
+        self._discarded.discard(process.id)
+        if self._last_text.get(process.id) == text:
+            # shown already, a pending edit would change it
+            self._pending.pop(process.id, None)
+            self.skipped += 1
+            return
+        if process.id in self._pending:
+            self.merged += 1
+        self._pending[process.id] = (process, text, kwargs)
+        if self._worker is None or self._worker.done():
+            self._wakeup = asyncio.Event()
+            self._worker = asyncio.create_task(self.__run())
+        self._wakeup.set()
+
+    async def discard(self, process_id: str) -> None:
+        """Drop pending edits of a finished process, e.g before its media is sent
+
+        Waits for an edit being sent, so that no progress is shown after that.
+        """
+        self._pending.pop(process_id, None)
+        self._last_text.pop(process_id, None)
+        if (task := self._sending.get(process_id)) is not None:
+            self._discarded.add(process_id)
+            with suppress(asyncio.CancelledError):
+                await asyncio.shield(task)
+
+    async def __run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            now = time.monotonic()
+            delay: Optional[float] = None
+            for msg_id, edit in list(self._pending.items()):
+                if msg_id in self._sending:
+                    continue
+                bucket = self._chats.get(chat := self._chat(edit[0]))
+                if bucket is None:
+                    bucket = self._chats[chat] = TokenBucket(
+                        self.chat_rate, self.chat_burst
+                    )
+                if (wait := max(bucket.delay(now), self._global.delay(now))) > 0:
+                    delay = wait if delay is None else min(delay, wait)
+                    continue
+                bucket.take(now)
+                self._global.take(now)
+                del self._pending[msg_id]
+                self._sending[msg_id] = asyncio.create_task(self.__send(bucket, *edit))
+            if not self._pending:
+                self._chats = {
+                    chat: bucket
+                    for chat, bucket in self._chats.items()
+                    if not bucket.idle(now)
+                }
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def __send(
+        self, bucket: TokenBucket, process: Process, text: str, kwargs: Dict[str, Any]
+    ) -> None:
+        try:
+            await process.edit(text, **kwargs)
+        except FloodWait as f:
+            self.flood_waits += 1
+            bucket.backoff(f.x, time.monotonic())
+            # retry, unless a newer edit is pending or it was discarded
+            if process.id not in self._pending and process.id not in self._discarded:
+                self._pending[process.id] = (process, text, kwargs)
+        except MessageNotModified:
+            self.__sent(process.id, text)
+        except (ContinuePropagation, StopPropagation, StopTransmission):
+            pass
+        except Exception:
+            logger.exception("Unable to Edit message")
+        else:
+            self.sent += 1
+            bucket.recover()
+            self.__sent(process.id, text)
+        finally:
+            self._sending.pop(process.id, None)
+            self._discarded.discard(process.id)
+            self._wakeup.set()
+
+    def __sent(self, msg_id: str, text: str) -> None:
+        self._last_text[msg_id] = text
+        self._last_text.move_to_end(msg_id)
+        while len(self._last_text) > _MAX_SENT:
+            self._last_text.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "submitted": self.submitted,
+            "merged": self.merged,
+            "skipped": self.skipped,
+            "sent": self.sent,
+            "flood_waits": self.flood_waits,
+            "pending": len(self._pending),
+        }
+
+    def close(self) -> None:
+        """Stop sending, pending edits are dropped"""
+        if self._worker is not None:
+            self._worker.cancel()
+        self._pending.clear()
@@ -8,3 +8,7 @@ class UnsupportedUpdateError(TypeError):
 
 class DownloadFailedError(Exception):
     pass
+
+
+class InsufficientSpaceError(DownloadFailedError):
+    pass
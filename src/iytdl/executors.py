@@ -0,0 +1,217 @@
+__all__ = ["ProcessStageExecutor", "StageExecutor", "run_in_executor"]
+
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+import traceback
+
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import wraps
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from iytdl.utils import run_sync
+
+
+class StageExecutor:
+    def __init__(self, name: str, max_workers: int) -> None:
+        """Bounded thread pool for one stage of the pipeline
+
+        Parameters:
+        ----------
+            - name (`str`): Stage name e.g `"interactive"` or `"bulk"`.
+            - max_workers (`int`): Max. no. of threads.
+        """
+        self.name = name
+        self.max_workers = max_workers
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self._lock = threading.Lock()
+        self._pool = self._new_pool()
+
+    def _new_pool(self) -> Executor:
+        return ThreadPoolExecutor(
+            self.max_workers, thread_name_prefix=f"iytdl_{self.name}"
+        )
+
+    async def run(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run a sync function in this pool and await the result"""
+        queued_at = time.monotonic()
+
+        def call() -> Any:
+            wait = time.monotonic() - queued_at
+            with self._lock:
+                self.queued -= 1
+                self.running += 1
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.running -= 1
+                    self.completed += 1
+
+        with self._lock:
+            self.queued += 1
+        future = self._pool.submit(call)
+        future.add_done_callback(self.__dequeue_cancelled)
+        return await asyncio.wrap_future(future)
+
+    def __dequeue_cancelled(self, future: Future) -> None:
+        # cancelled before it was started
+        if future.cancelled():
+            with self._lock:
+                self.queued -= 1
+
+    def stats(self) -> Dict[str, float]:
+        """Queue depth and wait time (in seconds) before a job starts"""
+        with self._lock:
+            started = self.running + self.completed
+            return {
+                "workers": self.max_workers,
+                "queued": self.queued,
+                "running": self.running,
+                "completed": self.completed,
+                "avg_wait": (self.total_wait / started) if started else 0.0,
+                "max_wait": self.max_wait,
+            }
+
+    def shutdown(self, wait: bool = False) -> None:
+        self._pool.shutdown(wait=wait)
+
+
+class _RemoteTraceback(Exception):
+    """Traceback of an error in a worker process, the cause of the error raised again"""
+
+    def __init__(self, tb: str) -> None:
+        self.tb = tb
+
+    def __str__(self) -> str:
+        return self.tb
+
+
+# jobs running in the worker processes, set in each of them by `_init_worker`
+_running: Any = None
+
+
+def _init_worker(
+    running: Any, initializer: Optional[Callable[..., Any]], initargs: Tuple[Any, ...]
+) -> None:
+    global _running
+    _running = running
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def _timed_call(
+    func: Callable[..., Any], args: Tuple[Any, ...], kwargs: Dict[str, Any]
+) -> Tuple[float, Any, Optional[Exception], Optional[str]]:
+    """Runs in a worker process, returns `(start time, result, error, traceback)`"""
+    started_at = time.time()
+    with _running.get_lock():
+        _running.value += 1
+    try:
+        return started_at, func(*args, **kwargs), None, None
+    except Exception as e:
+        return started_at, None, e, traceback.format_exc()
+    finally:
+        with _running.get_lock():
+            _running.value -= 1
+
+
+class ProcessStageExecutor(StageExecutor):
+    def __init__(
+        self,
+        name: str,
+        max_workers: int,
+        initializer: Optional[Callable[..., Any]] = None,
+        initargs: Tuple[Any, ...] = (),
+    ) -> None:
+        """Pool of long lived worker processes for CPU bound work, not limited by the GIL
+
+        Parameters:
+        ----------
+            - name (`str`): Stage name.
+            - max_workers (`int`): Max. no. of processes.
+            - initializer (`Optional[Callable[..., Any]]`, optional): Called once in every new worker. (Defaults to `None`)
+            - initargs (`Tuple[Any, ...]`, optional): Arguments of `initializer`. (Defaults to `()`)
+        """
+        # forking a process with running threads is unsafe
+        self._mp_context = multiprocessing.get_context("spawn")
+        self._initializer = initializer
+        self._initargs = initargs
+        # counted by the workers, see `_timed_call`
+        self._running = self._mp_context.Value("i", 0)
+        # submitted and not finished
+        self._in_flight = 0
+        super().__init__(name, max_workers)
+
+    def _new_pool(self) -> Executor:
+        return ProcessPoolExecutor(
+            self.max_workers,
+            mp_context=self._mp_context,
+            initializer=_init_worker,
+            initargs=(self._running, self._initializer, self._initargs),
+        )
+
+    async def run(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run a picklable sync function in a worker process and await the result
+
+        Errors are raised again with the traceback in the worker as their cause.
+        """
+        queued_at = time.time()
+        future = self._pool.submit(_timed_call, func, args, kwargs)
+        with self._lock:
+            self._in_flight += 1
+        future.add_done_callback(self.__finished)
+        started_at, result, error, tb = await asyncio.wrap_future(future)
+        wait = max(0.0, started_at - queued_at)
+        with self._lock:
+            self.completed += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+        if error is not None:
+            raise error from _RemoteTraceback(tb)
+        return result
+
+    def __finished(self, future: Future) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    async def warm_up(self) -> None:
+        """Start all worker processes now rather than on first use"""
+        await asyncio.gather(*(self.run(os.getpid) for _ in range(self.max_workers)))
+
+    def stats(self) -> Dict[str, float]:
+        out = super().stats()
+        with self._lock:
+            in_flight = self._in_flight
+        out["running"] = min(self._running.value, in_flight)
+        out["queued"] = in_flight - out["running"]
+        return out
+
+
+def run_in_executor(stage: str) -> Callable:
+    """Run a sync method in `self.executors[stage]`, or like `run_sync` if there is none
+
+    Parameters:
+    ----------
+        - stage (`str`): `"interactive"` for extraction and metadata, `"bulk"` for downloads and postprocessing.
+    """
+
+    def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+        @wraps(func)
+        async def wrapper(self, *args: Any, **kwargs: Any) -> Any:
+            executors: Dict[str, StageExecutor] = getattr(self, "executors", {})
+            if (executor := executors.get(stage)) is None:
+                return await run_sync(func)(self, *args, **kwargs)
+            return await executor.run(func, self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
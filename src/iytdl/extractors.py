@@ -1,32 +1,156 @@
-__all__ = ["Extractor"]
+__all__ = ["Extractor", "build_manifest", "extract_manifest"]
 
 import logging
+import re
+import time
 
 from collections import defaultdict
-from typing import Dict, List, Optional, Tuple
-
-import yt_dlp as youtube_dl
+from typing import Any, Dict, List, Optional, Tuple
 
 from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 
-# from youtube_dl.utils import DownloadError, ExtractorError, UnsupportedError
-from yt_dlp.utils import DownloadError, ExtractorError, UnsupportedError
-
-from iytdl.constants import YT_VID_URL
+from iytdl.constants import (
+    INFO_CACHE_TTL,
+    INFO_EXPIRY_MARGIN,
+    MANIFEST_FORMAT_FIELDS,
+    YT_VID_URL,
+)
+from iytdl.executors import run_in_executor
 from iytdl.formatter import ResultFormatter as res_f
+from iytdl.single_flight import single_flight
 from iytdl.types import SearchResult
 from iytdl.utils import *  # noqa ignore=F405
+from iytdl.ydl_pool import YoutubeDLPool
 
 
 logger = logging.getLogger(__name__)
+_expire_regex = re.compile(r"[?&/]expire[=/](\d+)")
+# Instances of this process, used in extraction workers
+_ydl_pool = YoutubeDLPool()
+
+
+def build_manifest(info: Dict[str, Any]) -> Dict[str, Any]:
+    """Trim youtube-dl info to what is needed to show the download buttons
+
+    Parameters:
+    ----------
+        - info (`Dict[str, Any]`): Info returned by `YoutubeDL.extract_info`.
+
+    Returns:
+    -------
+        `Dict[str, Any]`: JSON serializable manifest with an `"expires_at"` (unix time),
+            missing fields are left out so that `.get()` defaults apply
+    """
+    formats = info.get("formats") or (
+        (
+            entries[0].get("formats")
+            if (entries := info.get("entries")) and len(entries) != 0
+            else None
+        )
+        if info.get("_type", "") == "playlist"
+        else None
+    )
+    expiry = [
+        int(match.group(1))
+        for frmt in formats or []
+        if (match := _expire_regex.search(frmt.get("url") or ""))
+    ]
+    description = info.get("description")
+    manifest = {
+        "title": info.get("title"),
+        # only the first 380 characters are shown
+        "description": description[:381] if description else None,
+        "thumbnail": info.get("thumbnail"),
+        "duration": info.get("duration"),
+        "uploader": info.get("uploader"),
+        "formats": [
+            {
+                field: value
+                for field in MANIFEST_FORMAT_FIELDS
+                if (value := frmt.get(field)) is not None
+            }
+            for frmt in formats
+        ]
+        if formats
+        else None,
+    }
+    return {
+        **{k: v for k, v in manifest.items() if v is not None},
+        "expires_at": (
+            (min(expiry) - INFO_EXPIRY_MARGIN)
+            if expiry
+            else (time.time() + INFO_CACHE_TTL)
+        ),
+    }
+
+
+def extract_manifest(
+    url: str, params: Dict[str, Any], pool: Optional[YoutubeDLPool] = None
+) -> Dict[str, Any]:
+    """Extract info without downloading and trim it with `build_manifest`
+
+    Errors are raised again as new exceptions caused by the original ones, without
+    the unpicklable info of yt-dlp errors, so that they can be sent back from a
+    worker process.
+
+    Parameters:
+    ----------
+        - url (`str`): Http URL.
+        - params (`Dict[str, Any]`): Picklable `YoutubeDL` options.
+        - pool (`Optional[YoutubeDLPool]`, optional): Pool to take the `YoutubeDL` instance from. (Defaults to the pool of this process)
+
+    Returns:
+    -------
+        `Dict[str, Any]`: Info manifest
+    """
+    from yt_dlp.utils import DownloadError, ExtractorError, UnsupportedError
+
+    try:
+        with (pool or _ydl_pool).checkout(params) as ytdl:
+            return build_manifest(ytdl.extract_info(url, download=False))
+    except UnsupportedError as e:
+        raise UnsupportedError(url) from e
+    except ExtractorError as e:
+        raise ExtractorError(str(e), expected=True) from e
+    except DownloadError as e:
+        raise DownloadError(str(e)) from e
+
+
+def warm_extract_worker(params: Dict[str, Any]) -> None:
+    """Set up a `YoutubeDL` instance and its extractors in each new extraction process"""
+    with _ydl_pool.checkout(params) as ytdl:
+        for ie_key in ("Youtube", "Generic"):
+            ytdl.get_info_extractor(ie_key)
 
 
 class Extractor:
     def __init__(self, silent: bool = False) -> None:
         self.silent = silent
 
-    @run_sync
-    def generic_extractor(self, key: str, url: str) -> Optional[SearchResult]:
+    @property
+    def extract_params(self) -> Dict[str, Any]:
+        """`YoutubeDL` options to extract info"""
+        return {"no-playlist": True, "quiet": self.silent, "logtostderr": self.silent}
+
+    async def _extract_manifest(self, url: str) -> Dict[str, Any]:
+        """Extract info in worker processes if enabled, else in a thread"""
+        if (executor := getattr(self, "executors", {}).get("extraction")) is not None:
+            return await executor.run(extract_manifest, url, self.extract_params)
+        return await self._extract_in_thread(url)
+
+    @run_in_executor("interactive")
+    def _extract_in_thread(self, url: str) -> Dict[str, Any]:
+        return extract_manifest(url, self.extract_params, self.ydl_pool)
+
+    async def _cached_manifest(self, key: str, url: str) -> Dict[str, Any]:
+        """Extracted info of `url` saved in cache as `key`, until stream URLs expire"""
+        if (manifest := await self.cache.get_info(key)) is None:
+            manifest = await self._extract_manifest(url)
+            await self.cache.set_info(key, manifest, manifest["expires_at"])
+        return manifest
+
+    @single_flight("generic_info", key=lambda key, url: url)
+    async def generic_extractor(self, key: str, url: str) -> Optional[SearchResult]:
         """Generic extractor for URLs other than YouTube
         [more info](https://github.com/yt-dlp/yt-dlp/blob/master/supportedsites.md).
 
@@ -39,6 +163,8 @@ class Extractor:
         -------
             `Optional[SearchResult]`: On Success
         """
+        from yt_dlp.utils import DownloadError, ExtractorError, UnsupportedError
+
         # passing key as we can't pass the entire url in callback_data
         buttons = [
             [
@@ -50,11 +176,8 @@ class Extractor:
                 ),
             ]
         ]
-        params = {"no-playlist": True, "quiet": self.silent, "logtostderr": self.silent}
         try:
-            resp = youtube_dl.YoutubeDL(params).extract_info(url, download=False)
-            # with open("j_debug_data.json", "w") as fx:
-            #     json.dump(resp, fx, indent=4, sort_keys=True)
+            resp = await self._cached_manifest(url, url)
         except UnsupportedError:
             logger.error(f"[URL -> {url}] - is not NOT SUPPORTED")
             return
@@ -69,7 +192,7 @@ class Extractor:
                 self.default_thumb,
                 InlineKeyboardMarkup(buttons),
             )
-        msg = f"<b><a href={url}>{resp.get('title', '[No Title]')}</a></b>\n"
+        msg = f"<b><a href={url}>{resp.get('title') or '[No Title]'}</a></b>\n"
         if description := resp.get("description"):
             msg += (
                 f"<pre>{description[:380]}...</pre>\n"
@@ -79,18 +202,7 @@ class Extractor:
         for info_type in ("duration", "uploader"):
             if info := resp.get(info_type):
                 msg += f"{res_f.format_line(info_type.title(), info)}\n"
-        if formats := (
-            resp.get("formats")
-            or (
-                (
-                    entries[0].get("formats")
-                    if (entries := resp.get("entries")) and len(entries) != 0
-                    else None
-                )
-                if resp.get("_type", "") == "playlist"
-                else None
-            )
-        ):
+        if formats := resp.get("formats"):
             buttons += sublists(
                 list(
                     map(
@@ -117,7 +229,7 @@ class Extractor:
         return SearchResult(
             key,
             msg[:1020],
-            resp.get("thumbnail", self.default_thumb),
+            resp.get("thumbnail") or self.default_thumb,
             InlineKeyboardMarkup(buttons),
         )
 
@@ -151,8 +263,8 @@ class Extractor:
         )[:25]
         return frmt_list if len(frmt_list) > 1 else raw_formats
 
-    @run_sync
-    def get_download_button(self, yt_id: str) -> SearchResult:
+    @single_flight("yt_info")
+    async def get_download_button(self, yt_id: str) -> SearchResult:
         """Generate Inline Buttons for YouTube Video
 
         Parameters:
@@ -163,6 +275,8 @@ class Extractor:
         -------
             `SearchResult`: `~iytdl.types.SearchResult`
         """
+        from yt_dlp.utils import ExtractorError
+
         buttons = [
             [
                 InlineKeyboardButton(
@@ -182,11 +296,8 @@ class Extractor:
                 )
             ]
         ]
-        params = {"no-playlist": True, "quiet": self.silent, "logtostderr": self.silent}
         try:
-            vid_data = youtube_dl.YoutubeDL(params).extract_info(
-                f"{YT_VID_URL}{yt_id}", download=False
-            )
+            vid_data = await self._cached_manifest(yt_id, f"{YT_VID_URL}{yt_id}")
         except ExtractorError:
             vid_data = None
             buttons += best_audio_btn
@@ -196,7 +307,7 @@ class Extractor:
             qual_list = ("1440p", "1080p", "720p", "480p", "360p", "240p", "144p")
             audio_dict: Dict[int, str] = {}
             # ------------------------------------------------ #
-            for video in vid_data["formats"]:
+            for video in vid_data.get("formats") or []:
                 fr_note = video.get("format_note")
                 fr_id = int(video.get("format_id"))
                 fr_size = video.get("filesize")
@@ -205,7 +316,7 @@ class Extractor:
                         if fr_note in (frmt_, frmt_ + "60"):
                             qual_dict[frmt_][fr_id] = fr_size
                 if video.get("acodec") != "none":
-                    bitrrate = int(video.get("abr", 0))
+                    bitrrate = int(video.get("abr") or 0)
                     if bitrrate != 0:
                         audio_dict[
                             bitrrate
@@ -0,0 +1,113 @@
+__all__ = ["FileLock"]
+
+import logging
+import os
+
+from contextlib import suppress
+from pathlib import Path
+from typing import Optional, Union
+
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+
+logger = logging.getLogger(__name__)
+
+
+def _try_lock(fd: int) -> bool:
+    """Lock an open file without waiting, `False` if another owner holds it"""
+    if fcntl is not None:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        return True
+    try:
+        # first byte, the file position is 0 after opening
+        msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+
+def _unlock(fd: int) -> None:
+    """Unlock a file locked by `_try_lock()` on Windows"""
+    os.lseek(fd, 0, os.SEEK_SET)
+    msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+class FileLock:
+    def __init__(self, path: Union[Path, str]) -> None:
+        """Lock shared by processes using the same directory
+
+        Held with `flock()` (`msvcrt.locking()` on Windows) on the lock file, so
+        the OS releases it if its owner dies. On POSIX the file is deleted on
+        release while still locked, and a waiter which locked a deleted file
+        tries again with the new one. Windows can't delete an open file, there
+        it is deleted after unlocking unless another owner opened it meanwhile.
+
+        Parameters:
+        ----------
+            - path (`Union[Path, str]`): Lock file.
+        """
+        self.path = Path(path).absolute()
+        self._fd: Optional[int] = None
+
+    def acquire(self) -> bool:
+        """Try to take the lock without waiting
+
+        Returns:
+        -------
+            `bool`: `True` if the lock was taken
+        """
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_RDWR)
+            except PermissionError:
+                if fcntl is not None:
+                    raise
+                # Windows, being deleted by its last owner
+                return False
+            try:
+                if not _try_lock(fd):
+                    os.close(fd)
+                    return False
+                locked = os.fstat(fd)
+                try:
+                    current = os.stat(self.path)
+                except FileNotFoundError:
+                    current = None
+            except BaseException:
+                os.close(fd)
+                raise
+            if current is not None and (current.st_dev, current.st_ino) == (
+                locked.st_dev,
+                locked.st_ino,
+            ):
+                # owner, for debugging
+                os.ftruncate(fd, 0)
+                os.write(fd, str(os.getpid()).encode())
+                self._fd = fd
+                return True
+            # released since it was opened
+            os.close(fd)
+
+    def release(self) -> None:
+        if self._fd is None:
+            return
+        fd, self._fd = self._fd, None
+        if fcntl is not None:
+            with suppress(FileNotFoundError):
+                self.path.unlink()
+            os.close(fd)
+            return
+        _unlock(fd)
+        os.close(fd)
+        # fails while another waiter has it open, which then owns it
+        with suppress(OSError):
+            self.path.unlink()
@@ -110,7 +110,7 @@ class ResultFormatter:
 
 
 def gen_search_markup(
-    key: str, yt_id: str, total: int, page: int = 1
+    key: str, yt_id: str, total: int, page: int = 1, more: bool = False
 ) -> InlineKeyboardMarkup:
     """Get Buttons for search results
 
@@ -120,6 +120,7 @@ def gen_search_markup(
         - yt_id (`str`): YouTube video ID.
         - total (`int`): Total no. of search results.
         - page (`int`, optional): Page number. (Defaults to `1`)
+        - more (`bool`, optional): More results than `total` can be loaded. (Defaults to `False`)
 
     Returns:
     -------
@@ -133,7 +134,7 @@ def gen_search_markup(
                 callback_data=f"yt_back|{key}|{page}",
             ),
             InlineKeyboardButton(
-                text=f"{page} / {total}",
+                text=f"{page} / {total}{'+' if more else ''}",
                 callback_data=f"yt_next|{key}|{page}",
             ),
         ],
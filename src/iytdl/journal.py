@@ -0,0 +1,37 @@
+__all__ = ["message_target", "restore_update"]
+
+from typing import Any, Dict, Union
+
+from pyrogram import Client
+from pyrogram.types import CallbackQuery, Message
+
+
+def message_target(update: Union[Message, CallbackQuery]) -> Dict[str, Any]:
+    """Where the progress of a job is shown, as stored in the job journal"""
+    if msg := (update if isinstance(update, Message) else update.message):
+        return {"chat_id": msg.chat.id, "message_id": msg.message_id}
+    return {"id": update.id, "inline_message_id": update.inline_message_id}
+
+
+async def restore_update(
+    client: Client, target: Dict[str, Any]
+) -> Union[Message, CallbackQuery]:
+    """Update to edit the progress message of a resumed job, see `message_target`
+
+    Raises:
+    ------
+        `ValueError`: If the message no longer exists
+    """
+    if "inline_message_id" in target:
+        # inline messages can't be fetched, only edited
+        return CallbackQuery(
+            client=client,
+            id=target["id"],
+            from_user=None,
+            chat_instance="",
+            inline_message_id=target["inline_message_id"],
+        )
+    msg = await client.get_messages(target["chat_id"], target["message_id"])
+    if not msg or msg.empty:
+        raise ValueError(f"Message {target} doesn't exist")
+    return msg
@@ -2,33 +2,63 @@ __all__ = ["iYTDL"]
 
 import asyncio
 import hashlib
+import logging
 import re
 
+from contextlib import suppress
 from pathlib import Path, WindowsPath
-from typing import Optional, Tuple, Union
-
-from aiohttp import ClientSession
-from html_telegraph_poster import TelegraphPoster
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from pyrogram import Client
 from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup, InputMediaPhoto
-from youtubesearchpython.__future__ import VideosSearch
 
 from iytdl import types
-from iytdl.constants import YT_VID_URL
+from iytdl.constants import (
+    JOB_MAX_ATTEMPTS,
+    SEARCH_PAGE_SIZE,
+    SEARCH_PREFETCH,
+    YT_VID_URL,
+)
 from iytdl.downloader import Downloader
+from iytdl.edit_scheduler import EditScheduler
 from iytdl.exceptions import *  # noqa ignore=F405
-from iytdl.extractors import Extractor
+from iytdl.executors import ProcessStageExecutor, StageExecutor
+from iytdl.extractors import Extractor, warm_extract_worker
 from iytdl.formatter import ResultFormatter, gen_search_markup
+from iytdl.journal import restore_update
+from iytdl.media_cache import MediaCache
+from iytdl.processes import Process, ProcessRegistry
+from iytdl.progress_channel import ProgressChannel
+from iytdl.scheduler import JobScheduler
+from iytdl.single_flight import SingleFlight, single_flight
 from iytdl.sql_cache import AioSQLiteDB
 from iytdl.types import Buttons
 from iytdl.upload_lib.uploader import Uploader
 from iytdl.utils import run_command, run_sync
+from iytdl.ydl_pool import YoutubeDLPool
+
+
+if TYPE_CHECKING:
+    from aiohttp import ClientSession
+    from youtubesearchpython.__future__ import VideosSearch
+
+logger = logging.getLogger(__name__)
 
 
 class iYTDL(Extractor, Downloader, Uploader):
     def __init__(
         self,
         log_group_id: Union[int, str],
-        session: Optional[ClientSession] = None,
+        session: Optional["ClientSession"] = None,
         silent: bool = False,
         download_path: str = "downloads",
         loop: Optional[asyncio.AbstractEventLoop] = None,
@@ -37,6 +67,23 @@ class iYTDL(Extractor, Downloader, Uploader):
         delete_media: bool = False,
         external_downloader: Optional[types.ExternalDownloader] = None,
         ffmpeg_location: str = "ffmpeg",
+        cache_max_age: Optional[int] = 7 * 24 * 3600,
+        cache_max_entries: Optional[int] = 10000,
+        cache_max_bytes: Optional[int] = None,
+        cache_maintenance_interval: int = 600,
+        memory_cache_size: int = 256,
+        coalesce_requests: bool = True,
+        thumb_timeout: float = 5,
+        fast_search: bool = False,
+        interactive_workers: int = 4,
+        bulk_workers: int = 4,
+        extract_processes: int = 0,
+        max_downloads: Optional[int] = 4,
+        max_uploads: Optional[int] = 4,
+        max_postprocesses: Optional[int] = 2,
+        media_cache_quota: Optional[int] = None,
+        min_free_space: int = 256 * 1024 * 1024,
+        client: Optional[Client] = None,
     ) -> None:
         """Main class
 
@@ -52,25 +99,87 @@ class iYTDL(Extractor, Downloader, Uploader):
             - delete_media: (`bool`, optional): Delete media from local storage after uploading on Telegram. (Defaults to `False`)
             - external_downloader: (`Optional[types.ExternalDownloader]`, optional): External Downloader e.g `types.external_downloader.Aria2c`. (Defaults to `None`)
             - ffmpeg_location (`str`, optional): Custom location for FFMPEG. (Defaults to `"ffmpeg"`)
+            - cache_max_age (`Optional[int]`, optional): Expire cached searches and URLs after this many seconds. (Defaults to `604800`)
+            - cache_max_entries (`Optional[int]`, optional): Max. cached searches and URLs, least recently used are evicted. (Defaults to `10000`)
+            - cache_max_bytes (`Optional[int]`, optional): Max. size of cache file (in bytes). (Defaults to `None`)
+            - cache_maintenance_interval (`int`, optional): Delay between cache clean ups (in seconds). (Defaults to `600`)
+            - memory_cache_size (`int`, optional): No. of searches / URLs also kept in memory, `0` to disable. (Defaults to `256`)
+            - coalesce_requests (`bool`, optional): Share one search / extraction between concurrent identical calls. (Defaults to `True`)
+            - thumb_timeout (`float`, optional): Max. time to find the best YouTube thumbnail (in seconds). (Defaults to `5`)
+            - fast_search (`bool`, optional): Return the first search result right away and format the rest in background. (Defaults to `False`)
+            - interactive_workers (`int`, optional): Threads for extraction and metadata. (Defaults to `4`)
+            - bulk_workers (`int`, optional): Threads for downloads and postprocessing, so that these never hold up extraction. (Defaults to `4`)
+            - extract_processes (`int`, optional): Extract info in these many worker processes instead of threads, `0` to disable. Workers are spawned, so the main script needs an `if __name__ == "__main__":` guard. (Defaults to `0`)
+            - max_downloads (`Optional[int]`, optional): Max. concurrent downloads, others are queued, `None` for no limit. (Defaults to `4`)
+            - max_uploads (`Optional[int]`, optional): Max. concurrent uploads, `None` for no limit. (Defaults to `4`)
+            - max_postprocesses (`Optional[int]`, optional): Max. concurrent thumbnail generations, `None` for no limit. (Defaults to `2`)
+            - media_cache_quota (`Optional[int]`, optional): Keep completed downloads for reuse up to this size (in bytes), least recently used are deleted, even if `delete_media` is set. (Defaults to `None`)
+            - min_free_space (`int`, optional): Refuse new downloads below this free disk space (in bytes), with `media_cache_quota` unused downloads are evicted first. (Defaults to `268435456`)
+            - client (`Optional[Client]`, optional): Pyrogram Client, if set unfinished downloads and uploads are journaled and resumed on `start()`. (Defaults to `None`)
         """
         self.yt_link_regex = re.compile(
             r"(?:youtube(?:-nocookie)?\.com|youtu\.be)/(?:[\w-]+\?v=|embed/|v/|shorts/)?([\w-]{11})"
         )
         self.generic_url_regex = re.compile(r"^https?://\S+")
         self.default_thumb = default_thumb
-        self.http = session or ClientSession()
+        self.thumb_timeout = thumb_timeout
+        self.fast_search = fast_search
+        # search key -> {result index: task formatting that result}
+        self._hydrating: Dict[str, Dict[int, asyncio.Task]] = {}
+        # search key -> task loading its next page
+        self._fetching: Dict[str, asyncio.Task] = {}
+        if session is None:
+            # aiohttp, youtubesearchpython and the like are imported on first use
+            from aiohttp import ClientSession
+
+            session = ClientSession()
+        self.http = session
         _cache_path = Path(cache_path)
         _cache_path.mkdir(exist_ok=True, parents=True)
         if _cache_path.is_file():
             raise TypeError(f"'{cache_path}' expected a Directory got a File instead")
         self.cache = AioSQLiteDB(
-            _cache_path.joinpath("yt_search_cache.db"), clean=False
+            _cache_path.joinpath("yt_search_cache.db"),
+            clean=False,
+            max_age=cache_max_age,
+            max_entries=cache_max_entries,
+            max_bytes=cache_max_bytes,
+            memory_cache_size=memory_cache_size,
         )
+        self._cache_maintenance_interval = cache_maintenance_interval
+        self._cache_maintenance: Optional[asyncio.Task] = None
+        self.single_flight: Optional[SingleFlight] = (
+            SingleFlight() if coalesce_requests else None
+        )
+        self.executors: Dict[str, StageExecutor] = {
+            "interactive": StageExecutor("interactive", interactive_workers),
+            "bulk": StageExecutor("bulk", bulk_workers),
+        }
+        self.ydl_pool = YoutubeDLPool()
+        self.edits = EditScheduler()
+        self.processes = ProcessRegistry()
+        self.scheduler = JobScheduler(
+            {
+                "download": max_downloads,
+                "upload": max_uploads,
+                "postprocess": max_postprocesses,
+            }
+        )
+        self._download_flights = SingleFlight()
+        # media key -> {caller's process: its progress channel, if shown}
+        self._download_callers: Dict[str, Dict[Process, Optional[ProgressChannel]]] = {}
+        # media key -> no. of `download()` callers which haven't uploaded it yet
+        self._media_refs: Dict[str, int] = {}
         self.loop = loop or asyncio.get_event_loop()
         self.download_path = Path(download_path)
         self.log_group_id = log_group_id
 
         self.download_path.mkdir(exist_ok=True, parents=True)
+        self.media_cache = MediaCache(
+            self.download_path, quota=media_cache_quota, min_free=min_free_space
+        )
+        self.client = client
+        self._resumed: Dict[str, asyncio.Task] = {}
         self.external_downloader = external_downloader
         self.delete_file_after_upload = delete_media
         if ffmpeg_location != "ffmpeg":
@@ -79,6 +188,14 @@ class iYTDL(Extractor, Downloader, Uploader):
                 raise FileNotFoundError(ffmpeg_location)
         self._ffmpeg = ffmpeg_location
         super().__init__(silent=silent)
+        if extract_processes > 0:
+            # CPU bound extraction would otherwise hold the GIL
+            self.executors["extraction"] = ProcessStageExecutor(
+                "extraction",
+                extract_processes,
+                initializer=warm_extract_worker,
+                initargs=(self.extract_params,),
+            )
 
     @classmethod
     async def init(cls, *args, **kwargs) -> "iYTDL":
@@ -96,6 +213,23 @@ class iYTDL(Extractor, Downloader, Uploader):
             - delete_media: (`bool`, optional): Delete media from local storage after uploading on Telegram. (Defaults to `False`)
             - external_downloader: (`Optional[types.ExternalDownloader]`, optional): External Downloader e.g `types.external_downloader.Aria2c`. (Defaults to `None`)
             - ffmpeg_location (`str`, optional): Custom location for FFMPEG. (Defaults to `"ffmpeg"`)
+            - cache_max_age (`Optional[int]`, optional): Expire cached searches and URLs after this many seconds. (Defaults to `604800`)
+            - cache_max_entries (`Optional[int]`, optional): Max. cached searches and URLs, least recently used are evicted. (Defaults to `10000`)
+            - cache_max_bytes (`Optional[int]`, optional): Max. size of cache file (in bytes). (Defaults to `None`)
+            - cache_maintenance_interval (`int`, optional): Delay between cache clean ups (in seconds). (Defaults to `600`)
+            - memory_cache_size (`int`, optional): No. of searches / URLs also kept in memory, `0` to disable. (Defaults to `256`)
+            - coalesce_requests (`bool`, optional): Share one search / extraction between concurrent identical calls. (Defaults to `True`)
+            - thumb_timeout (`float`, optional): Max. time to find the best YouTube thumbnail (in seconds). (Defaults to `5`)
+            - fast_search (`bool`, optional): Return the first search result right away and format the rest in background. (Defaults to `False`)
+            - interactive_workers (`int`, optional): Threads for extraction and metadata. (Defaults to `4`)
+            - bulk_workers (`int`, optional): Threads for downloads and postprocessing, so that these never hold up extraction. (Defaults to `4`)
+            - extract_processes (`int`, optional): Extract info in these many worker processes instead of threads, `0` to disable. Workers are spawned, so the main script needs an `if __name__ == "__main__":` guard. (Defaults to `0`)
+            - max_downloads (`Optional[int]`, optional): Max. concurrent downloads, others are queued, `None` for no limit. (Defaults to `4`)
+            - max_uploads (`Optional[int]`, optional): Max. concurrent uploads, `None` for no limit. (Defaults to `4`)
+            - max_postprocesses (`Optional[int]`, optional): Max. concurrent thumbnail generations, `None` for no limit. (Defaults to `2`)
+            - media_cache_quota (`Optional[int]`, optional): Keep completed downloads for reuse up to this size (in bytes), least recently used are deleted, even if `delete_media` is set. (Defaults to `None`)
+            - min_free_space (`int`, optional): Refuse new downloads below this free disk space (in bytes), with `media_cache_quota` unused downloads are evicted first. (Defaults to `268435456`)
+            - client (`Optional[Client]`, optional): Pyrogram Client, if set unfinished downloads and uploads are journaled and resumed on `start()`. (Defaults to `None`)
 
         Returns:
         -------
@@ -106,6 +240,7 @@ class iYTDL(Extractor, Downloader, Uploader):
         await yt.start()
         return yt
 
+    @single_flight("search", key=lambda query: _normalize_query(query))
     async def search(self, query: str) -> types.SearchResult:
         """Search
 
@@ -121,26 +256,65 @@ class iYTDL(Extractor, Downloader, Uploader):
         -------
             `types.SearchResult`
         """
-        hash_key = hashlib.sha1(query.encode(encoding="UTF-8")).hexdigest()
-        # sqlite doesn't support numbers in table name
+        # same as the coalescing key, calls sharing a search share its results
+        hash_key = hashlib.sha1(
+            _normalize_query(query).encode(encoding="UTF-8")
+        ).hexdigest()
+        # Key format is kept as is, so that callbacks of old messages still work
         key = re.sub(r"\d+", "", hash_key)[:10]
         if cached_data := await self.cache.get_key(key, index=0):
             s_len, v_data = cached_data
         else:
-            videosResult = await VideosSearch(query, limit=15).next()
+            search_obj = _videos_search(query)
+            videosResult = await search_obj.next()
             if len((res := videosResult["result"])) == 0:
                 raise NoResultFoundError
-            search_data = await asyncio.gather(
-                *map(lambda x: ResultFormatter.parse(self, x), res[:15])
-            )
-            await self.cache.set_key(key, search_data)
-            v_data = search_data[0]
-            s_len = len(search_data)
+            res = res[:SEARCH_PAGE_SIZE]
+            s_len = len(res)
+            if self.fast_search:
+                v_data = await ResultFormatter.parse(self, res[0])
+                await self.cache.set_key(key, [v_data], total=s_len)
+                await self.cache.set_raw_results(key, res[1:], start=1)
+                self._hydrate(key, res[1:], start=1)
+            else:
+                search_data = await asyncio.gather(
+                    *map(lambda x: ResultFormatter.parse(self, x), res)
+                )
+                await self.cache.set_key(key, search_data)
+                v_data = search_data[0]
+            await self.cache.set_continuation(key, query, search_obj.continuationKey)
         r1 = ResultFormatter(**v_data)
         return types.SearchResult(
-            key, r1.msg, r1.thumb, gen_search_markup(key, r1.yt_id, s_len)
+            key,
+            r1.msg,
+            r1.thumb,
+            gen_search_markup(
+                key, r1.yt_id, s_len, more=await self._has_more(key, 1, s_len)
+            ),
         )
 
+    async def iter_search(self, query: str) -> AsyncIterator[types.SearchResult]:
+        """Iterate over all search results, further pages are loaded on the way
+
+        Parameters:
+        ----------
+            - query (`str`): Search query.
+
+        Raises:
+        ------
+            `NoResultFoundError`: In case of no result.
+
+        Yields:
+        -------
+            `types.SearchResult`
+        """
+        result = await self.search(query)
+        index = 1
+        while result:
+            yield result
+            index += 1
+            result = await self.next_result(result.key, index)
+
     async def next_result(self, key: str, index: int) -> types.SearchResult:
         """Get next result from cached data
 
@@ -153,16 +327,143 @@ class iYTDL(Extractor, Downloader, Uploader):
         -------
             `types.SearchResult`
         """
-        if cached_data := await self.cache.get_key(key, index=index - 1):
+        if not (cached_data := await self.cache.get_key(key, index=index - 1)):
+            cached_data = await self._wait_for_result(key, index - 1)
+        if cached_data:
             s_len, v_data = cached_data
             vid = ResultFormatter(**v_data)
             return types.SearchResult(
                 key,
                 vid.msg,
                 vid.thumb,
-                gen_search_markup(key, vid.yt_id, s_len, index),
+                gen_search_markup(
+                    key,
+                    vid.yt_id,
+                    s_len,
+                    index,
+                    more=await self._has_more(key, index, s_len),
+                ),
             )
 
+    async def _wait_for_result(
+        self, key: str, index: int
+    ) -> Optional[Tuple[int, Dict[str, str]]]:
+        """Wait for a result whose page is still loading or which is still being formatted"""
+        if (task := self._fetching.get(key)) is None and (
+            first := await self.cache.get_key(key, index=0)
+        ):
+            if index >= first[0]:
+                task = self._fetch_more(key)
+        if task is not None:
+            await asyncio.wait({task})
+        if (hydrating := self._hydrating.get(key)) and (task := hydrating.get(index)):
+            await asyncio.wait({task})
+        elif (
+            await self.cache.get_key(key, index=index) is None
+            and (raw_result := await self.cache.get_raw_result(key, index)) is not None
+        ):
+            # formatting failed or was interrupted e.g by a restart
+            await asyncio.wait(self._hydrate(key, [raw_result], start=index))
+        return await self.cache.get_key(key, index=index)
+
+    async def _has_more(self, key: str, page: int, total: int) -> bool:
+        """Whether a search has more than `total` results, loads them if `page` is close to the end"""
+        if not await self.cache.get_continuation(key):
+            return False
+        if total - page < SEARCH_PREFETCH:
+            self._fetch_more(key)
+        return True
+
+    def _fetch_more(self, key: str) -> asyncio.Task:
+        """Load the next page of a search in background, one page at a time"""
+        if (task := self._fetching.get(key)) is None:
+            task = asyncio.create_task(self._load_next_page(key))
+            self._fetching[key] = task
+            task.add_done_callback(lambda _: self._fetching.pop(key, None))
+        return task
+
+    async def _load_next_page(self, key: str) -> None:
+        if not (
+            (continuation := await self.cache.get_continuation(key))
+            and (first := await self.cache.get_key(key, index=0))
+        ):
+            return
+        query, token = continuation
+        start = first[0]
+        search_obj = _videos_search(query)
+        # resume where the last page left off
+        search_obj.continuationKey = token
+        try:
+            res = (await search_obj.next())["result"][:SEARCH_PAGE_SIZE]
+        except Exception:
+            logger.exception(f"Failed to load more search results for {key}")
+            return
+        if res:
+            total = start + len(res)
+            search_data = None
+            if not self.fast_search:
+                try:
+                    search_data = await asyncio.gather(
+                        *map(lambda x: ResultFormatter.parse(self, x), res)
+                    )
+                except Exception:
+                    logger.exception(
+                        f"Failed to format search results of {key}, "
+                        "they are formatted when asked for"
+                    )
+            if search_data is not None:
+                await self.cache.set_key(key, search_data, start=start, total=total)
+            else:
+                # as in fast search, see `_wait_for_result`
+                await self.cache.set_key(key, [], start=start, total=total)
+                await self.cache.set_raw_results(key, res, start=start)
+                if self.fast_search:
+                    self._hydrate(key, res, start=start)
+        await self.cache.set_continuation(
+            key,
+            query,
+            search_obj.continuationKey
+            if res and search_obj.continuationKey != token
+            else None,
+        )
+
+    def _hydrate(
+        self, key: str, raw_results: List[Dict[str, Any]], start: int
+    ) -> List[asyncio.Task]:
+        """Format and cache search results in background
+
+        Parameters:
+        ----------
+            - key (`str`): Search result unique key.
+            - raw_results (`List[Dict[str, Any]]`): Unformatted results.
+            - start (`int`): Index of the first result.
+
+        Returns:
+        -------
+            `List[asyncio.Task]`: Tasks formatting the results.
+        """
+
+        async def hydrate(index: int, raw_result: Dict[str, Any]) -> None:
+            try:
+                await self.cache.set_key(
+                    key, [await ResultFormatter.parse(self, raw_result)], start=index
+                )
+            except Exception:
+                logger.exception(f"Failed to format search result {key}[{index}]")
+            finally:
+                tasks = self._hydrating.get(key, {})
+                if tasks.get(index) is asyncio.current_task():
+                    del tasks[index]
+                if not tasks:
+                    self._hydrating.pop(key, None)
+
+        if not raw_results:
+            return []
+        tasks = self._hydrating.setdefault(key, {})
+        for index, raw_result in enumerate(raw_results, start=start):
+            tasks[index] = asyncio.create_task(hydrate(index, raw_result))
+        return [tasks[index] for index in range(start, start + len(raw_results))]
+
     async def extract_info_from_key(self, key: str) -> Optional[types.SearchResult]:
         """
         Parameters:
@@ -202,13 +503,12 @@ class iYTDL(Extractor, Downloader, Uploader):
             if match := self.yt_link_regex.search(url):
                 # youtube link
                 yt_id = match.group(1)
-                thumb = await self.get_ytthumb(yt_id)
                 if extract:
                     return await self.get_download_button(yt_id)
                 return types.SearchResult(
                     yt_id,
                     f"**[YouTube URL]** -> `'{YT_VID_URL}{yt_id}'`",
-                    thumb,
+                    await self.get_ytthumb(yt_id),
                     InlineKeyboardMarkup(
                         [
                             [
@@ -255,6 +555,10 @@ class iYTDL(Extractor, Downloader, Uploader):
         -------
             `Tuple[InputMediaPhoto, InlineKeyboardMarkup]`
         """
+        if task := self._fetching.get(key):
+            await asyncio.wait({task})
+        if tasks := self._hydrating.get(key):
+            await asyncio.wait(list(tasks.values()))
         if cached_data := await self.cache.get_key(key):
             content = "\n".join(
                 map(
@@ -295,6 +599,8 @@ class iYTDL(Extractor, Downloader, Uploader):
         -------
             `str`: Telegra.ph URL
         """
+        from html_telegraph_poster import TelegraphPoster
+
         post_client = TelegraphPoster(use_api=True)
         auth_name = "X"
         post_client.create_api_token(auth_name)
@@ -307,6 +613,7 @@ class iYTDL(Extractor, Downloader, Uploader):
             )
         ).get("url")
 
+    @single_flight("thumb")
     async def get_ytthumb(self, yt_id: str) -> str:
         """Get YouTube video thumbnail from video ID
 
@@ -318,21 +625,51 @@ class iYTDL(Extractor, Downloader, Uploader):
         -------
             `str`: Thumbnail URL
         """
-        for quality in (
-            "maxresdefault",
-            "hqdefault",
-            "sddefault",
-            "mqdefault",
-            "default",
-        ):
-            link = f"https://i.ytimg.com/vi/{yt_id}/{quality}.jpg"
-            async with self.http.get(link) as resp:
-                if resp.status == 200:
-                    break
-        else:
-            link = self.default_thumb
+        if link := await self.cache.get_thumb(yt_id):
+            return link
+        link = await self._probe_ytthumb(yt_id)
+        if link != self.default_thumb:
+            await self.cache.set_thumb(yt_id, link)
         return link
 
+    async def _probe_ytthumb(self, yt_id: str) -> str:
+        """Probe all thumbnail qualities at once and pick the best available"""
+        links = [
+            f"https://i.ytimg.com/vi/{yt_id}/{quality}.jpg"
+            for quality in (
+                "maxresdefault",
+                "hqdefault",
+                "sddefault",
+                "mqdefault",
+                "default",
+            )
+        ]
+        from aiohttp import ClientError, ClientTimeout
+
+        timeout = ClientTimeout(total=self.thumb_timeout)
+
+        async def is_available(link: str) -> bool:
+            try:
+                async with self.http.head(link, timeout=timeout) as resp:
+                    return resp.status == 200
+            except (ClientError, asyncio.TimeoutError):
+                return False
+
+        probes = [asyncio.ensure_future(is_available(link)) for link in links]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.thumb_timeout
+        try:
+            for link, probe in zip(links, probes):
+                # Once a better quality answers there is no need to wait for the rest
+                if (remaining := deadline - loop.time()) > 0:
+                    await asyncio.wait({probe}, timeout=remaining)
+                if probe.done() and probe.result():
+                    return link
+        finally:
+            for probe in probes:
+                probe.cancel()
+        return self.default_thumb
+
     async def _check_ffmpeg(self) -> None:
         if isinstance(self._ffmpeg, Path):
             ffmpeg = self._ffmpeg
@@ -355,12 +692,98 @@ class iYTDL(Extractor, Downloader, Uploader):
         """Stop iYTDL instance manually or Use Context Manager"""
         if self.http and not self.http.closed:
             await self.http.close()
+        for task in list(self._fetching.values()):
+            task.cancel()
+        for tasks in list(self._hydrating.values()):
+            for task in list(tasks.values()):
+                task.cancel()
+        for task in list(self._resumed.values()):
+            task.cancel()
+        if (task := self._cache_maintenance) and not task.done():
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+        for executor in self.executors.values():
+            executor.shutdown()
+        self.ydl_pool.close()
+        self.edits.close()
         await self.cache.close()
 
     async def start(self) -> None:
         """Start iYTDL instance manually or Use Context Manager"""
         await self._check_ffmpeg()
         await self.cache._init()
+        if (executor := self.executors.get("extraction")) is not None:
+            await executor.warm_up()
+        self._cache_maintenance = asyncio.create_task(
+            self.cache.run_maintenance(self._cache_maintenance_interval)
+        )
+        if self.client is not None:
+            await self.resume_jobs()
+
+    async def resume_jobs(self) -> None:
+        """Resume downloads and uploads left unfinished by the last run in background,
+        a download is followed by its upload if it was started with `resume_upload`
+
+        Jobs whose message can't be fetched, e.g as the client isn't started yet,
+        are kept for the next call.
+        """
+        for job_id, stage, job, attempts in await self.cache.get_jobs():
+            if job_id in self._resumed:
+                continue
+            if attempts >= JOB_MAX_ATTEMPTS:
+                logger.warning(f"Giving up on job {job_id} after {attempts} attempts")
+                await self.cache.delete_job(job_id)
+                continue
+            await self.cache.retry_job(job_id)
+            task = asyncio.create_task(self.__resume_job(job_id, stage, job))
+            task.add_done_callback(lambda _, job_id=job_id: self._resumed.pop(job_id))
+            self._resumed[job_id] = task
+
+    async def __resume_job(self, job_id: str, stage: str, job: Dict[str, Any]) -> None:
+        logger.info(f"Resuming {stage} job {job_id}")
+        kwargs = {
+            "with_progress": job["with_progress"],
+            "cb_extra": job["cb_extra"],
+            "priority": job["priority"],
+        }
+        try:
+            update = await restore_update(self.client, job["target"])
+        except ValueError:
+            logger.warning(f"Dropping job {job_id}, its message no longer exists")
+            await self.cache.delete_job(job_id)
+            return
+        except Exception:
+            logger.exception(f"Failed to restore job {job_id}, will retry")
+            return
+        try:
+            if stage == "download":
+                key = await self.download(
+                    job["url"],
+                    job["uid"],
+                    job["downtype"],
+                    update,
+                    resume_upload=job.get("upload", False),
+                    **kwargs,
+                )
+                if not job.get("upload"):
+                    self._release_media(key)
+                    return
+            else:
+                key = job["key"]
+            await self.upload(
+                self.client,
+                key,
+                job["downtype"],
+                update,
+                caption_link=job.get("caption_link"),
+                **kwargs,
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception(f"Failed to resume job {job_id}")
+            await self.cache.delete_job(job_id)
 
     async def __aenter__(self) -> "iYTDL":
         await self.start()
@@ -368,3 +791,14 @@ class iYTDL(Extractor, Downloader, Uploader):
 
     async def __aexit__(self, *_, **__) -> None:
         await self.stop()
+
+
+def _normalize_query(query: str) -> str:
+    """Queries differing only by case and whitespace share a search key"""
+    return " ".join(query.lower().split())
+
+
+def _videos_search(query: str) -> "VideosSearch":
+    from youtubesearchpython.__future__ import VideosSearch
+
+    return VideosSearch(query, limit=SEARCH_PAGE_SIZE)
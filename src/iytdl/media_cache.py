@@ -0,0 +1,156 @@
+__all__ = ["MediaCache"]
+
+import logging
+import os
+import shutil
+
+from pathlib import Path
+from typing import Collection, Dict, List, Optional, Tuple, Union
+
+from iytdl.constants import (
+    DOWNLOAD_COMPLETE_MARKER,
+    MEDIA_CACHE_HIGH_WATERMARK,
+    MEDIA_CACHE_LOW_WATERMARK,
+)
+from iytdl.exceptions import InsufficientSpaceError
+
+
+logger = logging.getLogger(__name__)
+
+
+class MediaCache:
+    def __init__(
+        self,
+        path: Union[Path, str],
+        quota: Optional[int] = None,
+        min_free: int = 0,
+        high_watermark: float = MEDIA_CACHE_HIGH_WATERMARK,
+        low_watermark: float = MEDIA_CACHE_LOW_WATERMARK,
+    ) -> None:
+        """Completed downloads kept for reuse, least recently used are deleted to stay within a quota
+
+        A download is a subfolder named by its media key which holds a completion marker,
+        the marker's modification time is its last use.
+
+        Parameters:
+        ----------
+            - path (`Union[Path, str]`): Download location.
+            - quota (`Optional[int]`, optional): Max. size of completed downloads (in bytes), `None` for no limit. (Defaults to `None`)
+            - min_free (`int`, optional): Min. free disk space to start a download (in bytes), downloads are only evicted for it with a `quota`. (Defaults to `0`)
+            - high_watermark (`float`, optional): Evict once this fraction of `quota` is used. (Defaults to `0.9`)
+            - low_watermark (`float`, optional): Evict down to this fraction of `quota`. (Defaults to `0.75`)
+        """
+        self.path = Path(path)
+        self.quota = quota
+        self.min_free = min_free
+        self.high_watermark = high_watermark
+        self.low_watermark = low_watermark
+        self.evicted = 0
+
+    def _marker(self, key: str) -> Path:
+        return self.path.joinpath(key, DOWNLOAD_COMPLETE_MARKER)
+
+    def touch(self, key: str) -> None:
+        """Mark a download as recently used"""
+        try:
+            os.utime(self._marker(key))
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def __folder_size(folder: Path) -> int:
+        size = 0
+        for entry in os.scandir(folder):
+            try:
+                if entry.is_file(follow_symlinks=False):
+                    size += entry.stat(follow_symlinks=False).st_size
+                elif entry.is_dir(follow_symlinks=False):
+                    size += MediaCache.__folder_size(Path(entry.path))
+            except FileNotFoundError:
+                pass
+        return size
+
+    def entries(self) -> List[Tuple[float, str, int]]:
+        """Completed downloads as `(last use, key, size)`, least recently used first"""
+        out = []
+        for folder in self.path.iterdir():
+            try:
+                last_used = self._marker(folder.name).stat().st_mtime
+                out.append((last_used, folder.name, self.__folder_size(folder)))
+            except (FileNotFoundError, NotADirectoryError):
+                # not completed, or deleted in the meantime
+                continue
+        return sorted(out)
+
+    def free_space(self) -> int:
+        return shutil.disk_usage(self.path).free
+
+    def evict(self, in_use: Collection[str] = (), target: Optional[int] = None) -> int:
+        """Delete least recently used downloads until they fit within `target` bytes
+
+        Parameters:
+        ----------
+            - in_use (`Collection[str]`, optional): Keys which must be kept. (Defaults to `()`)
+            - target (`Optional[int]`, optional): Size to stay within, low watermark of `quota` if `None`. (Defaults to `None`)
+
+        Returns:
+        -------
+            `int`: Freed space (in bytes)
+        """
+        if target is None:
+            if self.quota is None:
+                return 0
+            target = int(self.quota * self.low_watermark)
+        entries = self.entries()
+        used = sum(size for _, _, size in entries)
+        freed = 0
+        for _, key, size in entries:
+            if used - freed <= target:
+                break
+            if key in in_use:
+                continue
+            # marker first, so that the download isn't reused half deleted
+            try:
+                self._marker(key).unlink()
+            except FileNotFoundError:
+                continue
+            shutil.rmtree(self.path.joinpath(key), ignore_errors=True)
+            freed += size
+            self.evicted += 1
+            logger.debug(f"Evicted media '{key}' ({size} bytes)")
+        return freed
+
+    def make_room(self, in_use: Collection[str] = ()) -> None:
+        """Enforce the quota and ensure enough free space for a new download
+
+        Parameters:
+        ----------
+            - in_use (`Collection[str]`, optional): Keys which must be kept. (Defaults to `()`)
+
+        Raises:
+        ------
+            `InsufficientSpaceError`: If free space stays below `min_free`, with a quota after evicting every unused download
+        """
+        if self.quota is not None:
+            if sum(size for _, _, size in self.entries()) > (
+                self.quota * self.high_watermark
+            ):
+                self.evict(in_use)
+        if self.min_free and self.free_space() < self.min_free:
+            if self.quota is not None:
+                self.evict(in_use, target=0)
+            if (free := self.free_space()) < self.min_free:
+                raise InsufficientSpaceError(
+                    f"Only {free} bytes free in '{self.path}', "
+                    f"at least {self.min_free} are required"
+                )
+
+    def stats(self) -> Dict[str, int]:
+        entries = self.entries()
+        return {
+            "entries": len(entries),
+            "size": sum(size for _, _, size in entries),
+            "quota": self.quota or 0,
+            "evicted": self.evicted,
+            "free": self.free_space(),
+        }
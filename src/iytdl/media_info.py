@@ -0,0 +1,66 @@
+__all__ = ["media_record", "read_media_info", "write_media_info"]
+
+import json
+import logging
+import os
+
+from pathlib import Path
+from typing import Any, Dict, Union
+
+from iytdl.constants import MEDIA_INFO_FILE
+
+
+logger = logging.getLogger(__name__)
+
+
+def media_record(info: Dict[str, Any]) -> Dict[str, Any]:
+    """Final files of a download and their upload metadata, from yt-dlp's info dict
+
+    `"file"` is the media after merging or converting it and `"thumbnail"` the
+    written thumbnail, unless it was deleted after embedding it. Performer and
+    title are picked the same way `FFmpegMetadata` tags them.
+    """
+    folder = os.path.dirname(info["filepath"])
+    record = {
+        "file": os.path.basename(info["filepath"]),
+        "thumbnail": next(
+            (
+                os.path.basename(path)
+                for thumb in reversed(info.get("thumbnails") or [])
+                if (path := thumb.get("filepath"))
+                and os.path.dirname(path) == folder
+                and os.path.isfile(path)
+            ),
+            None,
+        ),
+        "duration": int(info["duration"]) if info.get("duration") else None,
+        "width": info.get("width"),
+        "height": info.get("height"),
+        "performer": next(
+            filter(
+                None, map(info.get, ("artist", "creator", "uploader", "uploader_id"))
+            ),
+            None,
+        ),
+        "title": info.get("track") or info.get("title"),
+    }
+    return {k: v for k, v in record.items() if v is not None}
+
+
+def write_media_info(folder: Union[Path, str], record: Dict[str, Any]) -> None:
+    """Write the sidecar record of a media directory"""
+    path = Path(folder).joinpath(MEDIA_INFO_FILE)
+    tmp = path.with_name(f"{path.name}.tmp")
+    tmp.write_text(json.dumps(record))
+    os.replace(tmp, path)
+
+
+def read_media_info(folder: Union[Path, str]) -> Dict[str, Any]:
+    """Sidecar record of a media directory, empty if there is none"""
+    try:
+        return json.loads(Path(folder).joinpath(MEDIA_INFO_FILE).read_text())
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError):
+        logger.warning(f"Unreadable media info in '{folder}'")
+        return {}
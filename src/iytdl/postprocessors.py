@@ -0,0 +1,24 @@
+__all__ = ["MediaInfoPP"]
+
+import os
+
+from typing import Any, Dict, List, Tuple
+
+from yt_dlp.postprocessor.common import PostProcessor
+
+from iytdl.media_info import media_record, write_media_info
+
+
+class MediaInfoPP(PostProcessor):
+    """Write the upload metadata of the final file next to it, see `iytdl.media_info`
+
+    Add it after the other postprocessors, so that it sees the file they leave.
+    """
+
+    def run(self, info: Dict[str, Any]) -> Tuple[List[str], Dict[str, Any]]:
+        try:
+            write_media_info(os.path.dirname(info["filepath"]), media_record(info))
+        except (KeyError, OSError) as e:
+            # uploads probe the file instead
+            self.report_warning(f"Unable to write media info: {e}")
+        return [], info
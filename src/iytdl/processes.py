@@ -1,7 +1,11 @@
-__all__ = ["Process"]
+__all__ = ["Process", "ProcessRegistry"]
 
 
-from typing import Callable, Set, Union
+import threading
+import weakref
+
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional, Tuple, Union
 
 from pyrogram.types import (
     CallbackQuery,
@@ -13,7 +17,74 @@ from pyrogram.types import (
 from iytdl.exceptions import UnsupportedUpdateError
 
 
-_CANCELLED: Set[str] = set()
+class _Job:
+    __slots__ = ("id", "state", "runs", "cancelled", "transfer", "__weakref__")
+
+    def __init__(self, process_id: str) -> None:
+        self.id = process_id
+        # "created" -> "running" -> "done"
+        self.state = "created"
+        self.runs = 0
+        # set from any thread, checked by progress hooks
+        self.cancelled = threading.Event()
+        # (start, last progress update) of a Telegram transfer
+        self.transfer: Optional[Tuple[int, int]] = None
+
+
+class ProcessRegistry:
+    def __init__(self) -> None:
+        """Jobs of the processes in use, a job is dropped once no `Process` refers to it"""
+        self._jobs: "weakref.WeakValueDictionary[str, _Job]" = (
+            weakref.WeakValueDictionary()
+        )
+        self._lock = threading.Lock()
+        _REGISTRIES.add(self)
+
+    def job(self, process_id: str) -> _Job:
+        with self._lock:
+            if (job := self._jobs.get(process_id)) is None:
+                job = self._jobs[process_id] = _Job(process_id)
+            return job
+
+    @contextmanager
+    def running(self, process: "Process") -> Iterator[None]:
+        """Mark the job of `process` as running until exit"""
+        job = process.job
+        job.runs += 1
+        job.state = "running"
+        try:
+            yield
+        finally:
+            job.runs -= 1
+            if job.runs == 0:
+                job.state = "done"
+
+    def cancel(self, process_id: str) -> bool:
+        """Cancel a job
+
+        Parameters:
+        ----------
+            - process_id (`str`): Unique ID.
+
+        Returns:
+        -------
+            `bool`: `False` if there is no such job, e.g it is done already
+        """
+        if (job := self._jobs.get(process_id)) is None or job.state == "done":
+            return False
+        job.cancelled.set()
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        out = dict.fromkeys(("created", "running", "done"), 0)
+        for job in list(self._jobs.values()):
+            out[job.state] += 1
+        return out
+
+
+_REGISTRIES: "weakref.WeakSet[ProcessRegistry]" = weakref.WeakSet()
+# Used by processes created without one
+_DEFAULT_REGISTRY = ProcessRegistry()
 
 
 class Process:
@@ -21,12 +92,14 @@ class Process:
         self,
         update: Union[Message, CallbackQuery],
         cb_extra: Union[int, str, None] = None,
+        registry: Optional[ProcessRegistry] = None,
     ) -> None:
         """
         Parameters:
         ----------
             - update (`Union[Message, CallbackQuery]`)
             - cb_extra (`Union[int, str, None]`, optional) Extra callback_data for cancel markup (default `None`)
+            - registry (`Optional[ProcessRegistry]`, optional) Registry of its job, a shared one if `None` (default `None`)
 
         Raises:
         ------
@@ -48,19 +121,21 @@ class Process:
         self.edit: Callable = edit_func
         self.edit_media: Callable = media_edit_func
         self.id: str = process_id
+        self.user_id: Optional[int] = update.from_user.id if update.from_user else None
         self.__cb_extra = cb_extra
+        self.job = (registry or _DEFAULT_REGISTRY).job(process_id)
 
     @staticmethod
     def cancel_id(process_id: str) -> None:
-        """Cancel Upload / Download Process by ID
+        """Cancel Upload / Download Process by ID, in every registry
 
         Parameters:
         ----------
             - process_id (`str`): Unique ID.
 
         """
-        global _CANCELLED
-        _CANCELLED.add(process_id)
+        for registry in list(_REGISTRIES):
+            registry.cancel(process_id)
 
     @staticmethod
     def remove_id(process_id: str) -> None:
@@ -71,14 +146,14 @@ class Process:
             - process_id (`str`): Unique ID.
 
         """
-        global _CANCELLED
-        _CANCELLED.remove(process_id)
+        for registry in list(_REGISTRIES):
+            if (job := registry._jobs.get(process_id)) is not None:
+                job.cancelled.clear()
 
     @property
     def cancel(self) -> None:
         """Cancel process"""
-        global _CANCELLED
-        _CANCELLED.add(self.id)
+        self.job.cancelled.set()
 
     @property
     def is_cancelled(self) -> bool:
@@ -88,7 +163,7 @@ class Process:
         -------
             - `bool`: True if cancelled else False
         """
-        return self.id in _CANCELLED
+        return self.job.cancelled.is_set()
 
     @property
     def cancel_markup(self) -> InlineKeyboardMarkup:
@@ -0,0 +1,50 @@
+__all__ = ["ProgressChannel"]
+
+import asyncio
+import threading
+
+from contextlib import suppress
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+class ProgressChannel:
+    def __init__(self) -> None:
+        """Latest progress of a job, written from any thread and read on the event loop
+
+        Only the latest snapshot is kept, so writing it is cheap and a slow reader
+        skips intermediate ones. Create it in a coroutine.
+        """
+        self._lock = threading.Lock()
+        self._latest: Optional[Dict[str, Any]] = None
+        self._closed = asyncio.Event()
+
+    def put(self, snapshot: Dict[str, Any]) -> None:
+        """Replace the latest snapshot, thread-safe"""
+        with self._lock:
+            self._latest = snapshot
+
+    def take(self) -> Optional[Dict[str, Any]]:
+        """Latest snapshot if any was put since the last call"""
+        with self._lock:
+            snapshot, self._latest = self._latest, None
+        return snapshot
+
+    def close(self) -> None:
+        """Stop `consume()` after passing on the last snapshot, call it on the event loop"""
+        self._closed.set()
+
+    async def consume(
+        self, callback: Callable[[Dict[str, Any]], Awaitable[Any]], interval: float
+    ) -> None:
+        """Pass the latest snapshot to `callback` at most once every `interval` seconds until closed
+
+        Parameters:
+        ----------
+            - callback (`Callable[[Dict[str, Any]], Awaitable[Any]]`): Coroutine function e.g to edit the progress message.
+            - interval (`float`): Delay between two calls (in seconds).
+        """
+        while not self._closed.is_set():
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._closed.wait(), interval)
+            if (snapshot := self.take()) is not None:
+                await callback(snapshot)
@@ -0,0 +1,162 @@
+__all__ = ["JobScheduler", "PRIORITIES"]
+
+import asyncio
+import logging
+
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from itertools import zip_longest
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    Hashable,
+    List,
+    Optional,
+)
+
+
+logger = logging.getLogger(__name__)
+
+# Priority classes, in the order they are served
+PRIORITIES = ("high", "normal", "low")
+
+
+class JobScheduler:
+    def __init__(
+        self, limits: Dict[str, Optional[int]], report_interval: float = 5
+    ) -> None:
+        """Limit concurrent jobs per stage, queued jobs are started by priority
+        and users take turns within a priority
+
+        Parameters:
+        ----------
+            - limits (`Dict[str, Optional[int]]`): Max. concurrent jobs per stage e.g `{"download": 4}`, `None` for no limit.
+            - report_interval (`float`, optional): Max. delay between two checks of queue position (in seconds). (Defaults to `5`)
+        """
+        self.limits = {stage: limit for stage, limit in limits.items() if limit}
+        self.report_interval = report_interval
+        self.running: Dict[str, int] = dict.fromkeys(self.limits, 0)
+        # stage -> priority -> user -> waiting jobs, users in order of their turn
+        self._queues: Dict[
+            str, Dict[str, "OrderedDict[Hashable, Deque[asyncio.Future]]"]
+        ] = {
+            stage: {priority: OrderedDict() for priority in PRIORITIES}
+            for stage in self.limits
+        }
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        stage: str,
+        user: Hashable = None,
+        priority: str = "normal",
+        on_wait: Optional[Callable[[int], Awaitable[Any]]] = None,
+    ) -> AsyncIterator[None]:
+        """Wait for a free slot of `stage`, it is held until exit
+
+        Parameters:
+        ----------
+            - stage (`str`): `"download"`, `"upload"` or `"postprocess"`.
+            - user (`Hashable`, optional): Jobs of the same user take turns with those of other users. (Defaults to `None`)
+            - priority (`str`, optional): One of `PRIORITIES`. (Defaults to `"normal"`)
+            - on_wait (`Optional[Callable[[int], Awaitable[Any]]]`, optional): Called with the queue position (starting at `1`) whenever it changes, raise to leave the queue. (Defaults to `None`)
+
+        Raises:
+        ------
+            `ValueError`: On unknown `priority`
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"'{priority}' is not one of {', '.join(PRIORITIES)}")
+        if stage not in self.limits:
+            yield
+            return
+        if self.running[stage] < self.limits[stage] and not self.queued(stage):
+            self.running[stage] += 1
+        else:
+            await self.__wait(stage, user, priority, on_wait)
+        try:
+            yield
+        finally:
+            self.__release(stage)
+
+    async def __wait(
+        self,
+        stage: str,
+        user: Hashable,
+        priority: str,
+        on_wait: Optional[Callable[[int], Awaitable[Any]]],
+    ) -> None:
+        future = asyncio.get_running_loop().create_future()
+        self._queues[stage][priority].setdefault(user, deque()).append(future)
+        try:
+            last_position = None
+            while not future.done():
+                if on_wait is not None:
+                    if (position := self.position(stage, future)) != last_position:
+                        last_position = position
+                        await on_wait(position)
+                await asyncio.wait([future], timeout=self.report_interval)
+        except BaseException:
+            if future.done():
+                # the slot was handed over in the meantime
+                self.__release(stage)
+            else:
+                future.cancel()
+                self.__remove(stage, user, priority, future)
+            raise
+
+    def __remove(
+        self, stage: str, user: Hashable, priority: str, future: asyncio.Future
+    ) -> None:
+        users = self._queues[stage][priority]
+        if (waiting := users.get(user)) is not None:
+            waiting.remove(future)
+            if not waiting:
+                del users[user]
+
+    def __release(self, stage: str) -> None:
+        self.running[stage] -= 1
+        while self.running[stage] < self.limits[stage]:
+            if (future := self.__next(stage)) is None:
+                break
+            self.running[stage] += 1
+            future.set_result(None)
+
+    def __next(self, stage: str) -> Optional[asyncio.Future]:
+        """Dequeue the next job, its user goes to the back of the line"""
+        for users in self._queues[stage].values():
+            if users:
+                user, waiting = next(iter(users.items()))
+                future = waiting.popleft()
+                if waiting:
+                    users.move_to_end(user)
+                else:
+                    del users[user]
+                return future
+
+    def queued(self, stage: str) -> List[asyncio.Future]:
+        """Waiting jobs of `stage`, in the order they will be started"""
+        if stage not in self.limits:
+            return []
+        order: List[asyncio.Future] = []
+        for users in self._queues[stage].values():
+            for turn in zip_longest(*users.values()):
+                order.extend(future for future in turn if future is not None)
+        return order
+
+    def position(self, stage: str, future: asyncio.Future) -> int:
+        return self.queued(stage).index(future) + 1
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {
+            stage: {
+                "limit": limit,
+                "running": self.running[stage],
+                "queued": len(self.queued(stage)),
+            }
+            for stage, limit in self.limits.items()
+        }
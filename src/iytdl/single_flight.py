@@ -0,0 +1,87 @@
+__all__ = ["SingleFlight", "single_flight"]
+
+import asyncio
+import logging
+
+from copy import deepcopy
+from functools import wraps
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    def __init__(self) -> None:
+        """Coalesce concurrent identical calls into one in-flight call"""
+        self.calls = 0
+        self.coalesced = 0
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+
+    async def run(
+        self,
+        key: Hashable,
+        func: Callable[..., Awaitable[Any]],
+        *args: Any,
+        **kwargs: Any,
+    ) -> Any:
+        """Await `func(*args, **kwargs)` or join the running call with the same `key`
+
+        Parameters:
+        ----------
+            - key (`Hashable`): Identifies identical calls.
+            - func (`Callable[..., Awaitable[Any]]`): Coroutine function.
+
+        Returns:
+        -------
+            `Any`: A copy of the shared result, as callers may modify it (e.g `Buttons.add`)
+        """
+        self.calls += 1
+        if (future := self._in_flight.get(key)) is not None:
+            self.coalesced += 1
+        else:
+            future = asyncio.ensure_future(func(*args, **kwargs))
+            self._in_flight[key] = future
+            future.add_done_callback(lambda f: self.__done(key, f))
+        # a cancelled caller must not cancel the call for everyone else
+        return deepcopy(await asyncio.shield(future))
+
+    def __done(self, key: Hashable, future: asyncio.Future) -> None:
+        if self._in_flight.get(key) is future:
+            del self._in_flight[key]
+        if not future.cancelled() and (err := future.exception()):
+            logger.debug(f"Call {key} failed: {err!r}")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._in_flight),
+        }
+
+
+def _call_key(*args: Any, **kwargs: Any) -> Hashable:
+    return args, tuple(sorted(kwargs.items()))
+
+
+def single_flight(namespace: str, key: Callable[..., Hashable] = _call_key) -> Callable:
+    """Coalesce concurrent calls of an async method with `self.single_flight`
+
+    Parameters:
+    ----------
+        - namespace (`str`): Separates keys of different methods.
+        - key (`Callable[..., Hashable]`, optional): Builds the key from call arguments. (Defaults to all arguments)
+    """
+
+    def decorator(func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        @wraps(func)
+        async def wrapper(self, *args: Any, **kwargs: Any) -> Any:
+            if (flights := getattr(self, "single_flight", None)) is None:
+                return await func(self, *args, **kwargs)
+            return await flights.run(
+                (namespace, key(*args, **kwargs)), func, self, *args, **kwargs
+            )
+
+        return wrapper
+
+    return decorator
@@ -1,19 +1,131 @@
-__all__ = ["AioSQLiteDB"]
+__all__ = ["AioSQLiteDB", "LRUCache"]
 
+import asyncio
+import json
+import logging
 import os
+import time
 
-from typing import Any, Dict, List, Optional, Tuple, Union
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import (
+    Any,
+    AsyncIterator,
+    Dict,
+    Hashable,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
 import aiosqlite
 
 from iytdl.utils import rnd_key
 
 
+logger = logging.getLogger(__name__)
+
+# Columns of a formatted search result, see `~iytdl.formatter.ResultFormatter`
+VIDEO_COLUMNS: Tuple[str, ...] = (
+    "yt_id",
+    "thumb",
+    "title",
+    "body",
+    "duration",
+    "views",
+    "upload_date",
+    "chnl_name",
+    "chnl_id",
+)
+_TABLES: Tuple[str, ...] = (
+    "url_cache",
+    "queries",
+    "videos",
+    "query_results",
+    "raw_results",
+    "thumbs",
+    "info_cache",
+    "uploads",
+    "jobs",
+)
+# Prefix of memory cache keys, per table
+_MEMORY_KEYS: Dict[str, str] = {
+    "thumbs": "thumb",
+    "info_cache": "info",
+    "uploads": "upload",
+}
+# Columns of an uploaded media, see `AioSQLiteDB.set_upload`
+UPLOAD_COLUMNS: Tuple[str, ...] = ("file_id", "media_type", "caption", "url", "uid")
+# Pages freed per `incremental_vacuum` step
+_VACUUM_STEP = 256
+_PRAGMAS: Tuple[str, ...] = (
+    "PRAGMA synchronous = NORMAL",
+    # 8 MiB page cache per connection
+    "PRAGMA cache_size = -8192",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA busy_timeout = 5000",
+)
+
+
+class LRUCache:
+    def __init__(self, capacity: int = 256) -> None:
+        """In-memory Least Recently Used cache
+
+        Parameters:
+        ----------
+            capacity (`int`, optional): Max. no. of entries. (Defaults to `256`)
+
+        """
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Any:
+        """Get value or `None` and mark it as recently used"""
+        try:
+            self._data.move_to_end(key)
+        except KeyError:
+            self.misses += 1
+            return
+        self.hits += 1
+        return self._data[key]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.capacity:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> Any:
+        return self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self), "hits": self.hits, "misses": self.misses}
+
+
 class AioSQLiteDB:
-    db: aiosqlite.Connection
-    cur: aiosqlite.Cursor
+    con: aiosqlite.Connection
 
-    def __init__(self, db_name: str, clean: bool = False) -> None:
+    def __init__(
+        self,
+        db_name: str,
+        clean: bool = False,
+        max_age: Optional[int] = None,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        memory_cache_size: int = 0,
+        readers: int = 2,
+        commit_delay: float = 0.005,
+    ) -> None:
         """Create / Load Cache
 
         Parameters:
@@ -22,10 +134,46 @@ class AioSQLiteDB:
 
             clean (`bool`, optional): Delete old cache and create new. (Defaults to `False`)
 
+            max_age (`Optional[int]`, optional): Expire entries older than this (in seconds). (Defaults to `None`)
+
+            max_entries (`Optional[int]`, optional): Max. search queries, URLs, thumbnails, video infos and uploads to keep, each. (Defaults to `None`)
+
+            max_bytes (`Optional[int]`, optional): Max. size of cache file (in bytes). (Defaults to `None`)
+
+            memory_cache_size (`int`, optional): Keep these many searches / URLs in memory, `0` to disable. (Defaults to `0`)
+
+            readers (`int`, optional): No. of read only connections. (Defaults to `2`)
+
+            commit_delay (`float`, optional): Writes within this window (in seconds) share a commit. (Defaults to `0.005`)
+
         """
         if clean and os.path.isfile(db_name):
             os.remove(db_name)
         self.db_name = db_name
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.evictions: Dict[str, int] = {"expired": 0, "lru": 0}
+        # write-through front cache, values are prefixed by their `created_at`
+        self.memory: Optional[LRUCache] = (
+            LRUCache(memory_cache_size) if memory_cache_size > 0 else None
+        )
+        # last access times are written in batches by `maintain()`
+        self._touched: Dict[str, Dict[str, float]] = {
+            "queries": {},
+            "url_cache": {},
+            "thumbs": {},
+            "info_cache": {},
+            "uploads": {},
+        }
+        # All writes go through `self.con`, reads through a pool of connections
+        self._n_readers = max(1, readers)
+        self._readers: "asyncio.Queue[aiosqlite.Connection]"
+        self._reader_cons: List[aiosqlite.Connection] = []
+        self._write_lock = asyncio.Lock()
+        self._commit_delay = commit_delay
+        self._pending_commit: Optional[asyncio.Future] = None
+        self._commit_task: Optional[asyncio.Task] = None
 
     async def _init(self) -> None:
         """Async init"""
@@ -36,22 +184,283 @@ class AioSQLiteDB:
             if os.path.isfile(self.db_name):
                 os.remove(self.db_name)
             self.con = await aiosqlite.connect(self.db_name)
-        self.cur = await self.con.cursor()
-        await self.__init_tables()
+        async with self.con.cursor() as cur:
+            await self.__enable_auto_vacuum(cur)
+            await cur.execute("PRAGMA journal_mode = WAL")
+            for pragma in _PRAGMAS:
+                await cur.execute(pragma)
+            await self.__init_tables(cur)
+            await self.__migrate_legacy_tables(cur)
+        self._readers = asyncio.Queue()
+        for _ in range(self._n_readers):
+            con = await aiosqlite.connect(self.db_name)
+            for pragma in (*_PRAGMAS, "PRAGMA query_only = ON"):
+                await con.execute(pragma)
+            self._reader_cons.append(con)
+            self._readers.put_nowait(con)
+
+    @asynccontextmanager
+    async def _reader(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Borrow a read only connection from the pool"""
+        con = await self._readers.get()
+        try:
+            yield con
+        finally:
+            self._readers.put_nowait(con)
+
+    async def _fetchall(
+        self, sql: str, params: Iterable[Any] = ()
+    ) -> List[Tuple[Any, ...]]:
+        async with self._reader() as con:
+            async with con.execute(sql, params) as cur:
+                return await cur.fetchall()
 
-    async def __init_tables(self) -> None:
+    async def _fetchone(
+        self, sql: str, params: Iterable[Any] = ()
+    ) -> Optional[Tuple[Any, ...]]:
+        async with self._reader() as con:
+            async with con.execute(sql, params) as cur:
+                return await cur.fetchone()
+
+    @asynccontextmanager
+    async def _writer(self) -> AsyncIterator[aiosqlite.Cursor]:
+        """Cursor of the writer connection, changes are committed on exit
+
+        Changes are rolled back if the body raises, those of other writers waiting
+        for the same commit are kept.
+        """
+        async with self._write_lock:
+            async with self.con.cursor() as cur:
+                if not self.con.in_transaction:
+                    await cur.execute("BEGIN")
+                await cur.execute("SAVEPOINT writer")
+                try:
+                    yield cur
+                except BaseException:
+                    await cur.execute("ROLLBACK TO writer")
+                    await cur.execute("RELEASE writer")
+                    raise
+                await cur.execute("RELEASE writer")
+        await self._commit()
+
+    async def _commit(self) -> None:
+        """Group commit, concurrent writers wait for the same commit"""
+        if self._pending_commit is None:
+            self._pending_commit = asyncio.get_running_loop().create_future()
+            self._commit_task = asyncio.create_task(self.__commit_later())
+        await asyncio.shield(self._pending_commit)
+
+    async def __commit_later(self) -> None:
+        await asyncio.sleep(self._commit_delay)
+        async with self._write_lock:
+            future, self._pending_commit = self._pending_commit, None
+            try:
+                await self.con.commit()
+            except Exception as e:
+                future.set_exception(e)
+            else:
+                future.set_result(None)
+
+    @staticmethod
+    async def __enable_auto_vacuum(cur: aiosqlite.Cursor) -> None:
+        """Switch to incremental auto vacuum, so that `maintain()` can shrink the file"""
+        await cur.execute("PRAGMA auto_vacuum")
+        if (await cur.fetchone())[0] == 2:
+            return
+        await cur.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        # Existing databases only pick up the new mode after a full VACUUM
+        await cur.execute("VACUUM")
+
+    async def __init_tables(self, cur: aiosqlite.Cursor) -> None:
         """Create required Tables"""
-        await self.cur.execute(
+        await cur.executescript(
             """
 CREATE TABLE IF NOT EXISTS url_cache (
     key TEXT NOT NULL UNIQUE,
     url TEXT,
     PRIMARY KEY(key)
+);
+CREATE TABLE IF NOT EXISTS queries (
+    key TEXT NOT NULL UNIQUE,
+    total INTEGER NOT NULL,
+    created_at REAL NOT NULL DEFAULT 0,
+    last_access REAL NOT NULL DEFAULT 0,
+    query TEXT,
+    continuation TEXT,
+    PRIMARY KEY(key)
+);
+CREATE TABLE IF NOT EXISTS videos (
+    yt_id TEXT NOT NULL UNIQUE,
+    thumb TEXT,
+    title TEXT,
+    body TEXT,
+    duration TEXT,
+    views TEXT,
+    upload_date TEXT,
+    chnl_name TEXT,
+    chnl_id TEXT,
+    PRIMARY KEY(yt_id)
+);
+CREATE TABLE IF NOT EXISTS query_results (
+    query_key TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    yt_id TEXT NOT NULL,
+    PRIMARY KEY(query_key, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS query_results_yt_id ON query_results(yt_id);
+CREATE TABLE IF NOT EXISTS raw_results (
+    query_key TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    result TEXT NOT NULL,
+    PRIMARY KEY(query_key, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS thumbs (
+    key TEXT NOT NULL UNIQUE,
+    url TEXT NOT NULL,
+    created_at REAL NOT NULL DEFAULT 0,
+    last_access REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY(key)
+);
+CREATE TABLE IF NOT EXISTS info_cache (
+    key TEXT NOT NULL UNIQUE,
+    manifest TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    created_at REAL NOT NULL DEFAULT 0,
+    last_access REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY(key)
+);
+CREATE TABLE IF NOT EXISTS uploads (
+    key TEXT NOT NULL UNIQUE,
+    file_id TEXT NOT NULL,
+    media_type TEXT NOT NULL,
+    caption TEXT,
+    url TEXT,
+    uid TEXT,
+    created_at REAL NOT NULL DEFAULT 0,
+    last_access REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY(key)
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT NOT NULL UNIQUE,
+    stage TEXT NOT NULL,
+    job TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY(id)
 );"""
         )
+        # Columns added after a table was first created
+        for table, column, definition in (
+            ("url_cache", "created_at", "REAL NOT NULL DEFAULT 0"),
+            ("url_cache", "last_access", "REAL NOT NULL DEFAULT 0"),
+            ("queries", "query", "TEXT"),
+            ("queries", "continuation", "TEXT"),
+        ):
+            await cur.execute(f"PRAGMA table_info({table})")
+            if column not in [x[1] for x in await cur.fetchall()]:
+                await cur.execute(
+                    f"ALTER TABLE {table} ADD COLUMN {column} {definition}"
+                )
+        now = time.time()
+        for table in ("queries", "url_cache", "thumbs", "info_cache", "uploads"):
+            await cur.execute(
+                f"UPDATE {table} SET created_at = ?, last_access = ? "
+                "WHERE created_at = 0",
+                (now, now),
+            )
+            await cur.execute(
+                f"CREATE INDEX IF NOT EXISTS {table}_last_access "
+                f"ON {table}(last_access)"
+            )
         await self.con.commit()
 
-    async def set_key(self, key: str, value: List[Dict[str, Any]]) -> None:
+    async def __migrate_legacy_tables(self, cur: aiosqlite.Cursor) -> None:
+        """Fold old table-per-query caches into `queries`, `videos` and `query_results`"""
+        await cur.execute(
+            "SELECT name FROM sqlite_master "
+            "WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+        )
+        legacy = [name for (name,) in await cur.fetchall() if name not in _TABLES]
+        if not legacy:
+            return
+        for table in legacy:
+            try:
+                await cur.execute(f'SELECT * FROM "{table}" ORDER BY rowid')
+            except aiosqlite.OperationalError:
+                continue
+            columns = [x[0] for x in cur.description]
+            if not set(VIDEO_COLUMNS).issubset(columns):
+                # Not a search cache table
+                continue
+            rows = [dict(zip(columns, row)) for row in await cur.fetchall()]
+            if rows:
+                await self.__write_results(cur, table, rows)
+            await cur.execute(f'DROP TABLE "{table}"')
+            logger.info(f"Migrated legacy search cache table '{table}'")
+        await self.con.commit()
+
+    def __min_created_at(self) -> float:
+        """Entries created before this are expired"""
+        return (time.time() - self.max_age) if self.max_age else 0
+
+    def __from_memory(self, key: Tuple[str, str]) -> Optional[Tuple[Any, ...]]:
+        if self.memory is None:
+            return
+        if (entry := self.memory.get(key)) is not None:
+            if entry[0] >= self.__min_created_at():
+                return entry
+            self.memory.pop(key)
+
+    def __to_memory(self, key: Tuple[str, str], *value: Any) -> None:
+        if self.memory is not None:
+            self.memory.set(key, (time.time(), *value))
+
+    @staticmethod
+    async def __write_results(
+        cur: aiosqlite.Cursor,
+        key: str,
+        value: List[Dict[str, Any]],
+        start: int = 0,
+        total: Optional[int] = None,
+    ) -> None:
+        now = time.time()
+        if start == 0:
+            # New search, drop results left over from an older one
+            await cur.execute("DELETE FROM query_results WHERE query_key = ?", (key,))
+            await cur.execute("DELETE FROM raw_results WHERE query_key = ?", (key,))
+            await cur.execute(
+                "INSERT OR REPLACE INTO "
+                "queries(key, total, created_at, last_access) VALUES(?, ?, ?, ?)",
+                (key, total or len(value), now, now),
+            )
+        elif total is not None:
+            await cur.execute(
+                "UPDATE queries SET total = ? WHERE key = ?", (total, key)
+            )
+        await cur.executemany(
+            f"INSERT OR REPLACE INTO videos({', '.join(VIDEO_COLUMNS)}) "
+            f"VALUES({', '.join('?' for _ in VIDEO_COLUMNS)})",
+            [tuple(x.get(col) for col in VIDEO_COLUMNS) for x in value],
+        )
+        await cur.executemany(
+            "INSERT OR REPLACE INTO query_results(query_key, position, yt_id) "
+            "VALUES(?, ?, ?)",
+            [(key, pos, x["yt_id"]) for pos, x in enumerate(value, start=start)],
+        )
+        if start != 0:
+            # formatted, see `set_raw_results`
+            await cur.executemany(
+                "DELETE FROM raw_results WHERE query_key = ? AND position = ?",
+                [(key, pos) for pos in range(start, start + len(value))],
+            )
+
+    async def set_key(
+        self,
+        key: str,
+        value: List[Dict[str, Any]],
+        start: int = 0,
+        total: Optional[int] = None,
+    ) -> None:
         """Set Key in Cache
 
         Parameters:
@@ -60,40 +469,30 @@ CREATE TABLE IF NOT EXISTS url_cache (
 
             value (`List[Dict[str, Any]]`): YT Search Data.
 
+            start (`int`, optional): Position of the first result, `0` replaces the whole search. (Defaults to `0`)
+
+            total (`Optional[int]`, optional): Total no. of results, if more are added later. (Defaults to `None`)
+
         """
-        await self.cur.execute(
-            f"""
-CREATE TABLE IF NOT EXISTS {key} (
-    yt_id TEXT NOT NULL UNIQUE,
-    thumb TEXT,
-    title TEXT,
-    body TEXT,
-    duration TEXT,
-    views	TEXT,
-    upload_date TEXT,
-    chnl_name TEXT,
-    chnl_id	TEXT,
-    PRIMARY KEY(yt_id)
-);"""
-        )
-        params = list(value[0].keys())
-        cmd = (
-            f"INSERT INTO "
-            f"{key}({', '.join(params)}) "
-            f"VALUES({', '.join(['?' for _ in range(len(params))])}) "
-        )
-        try:
-            await self.cur.executemany(
-                cmd,
-                [tuple(x.values()) for x in value],
-            )
-        except aiosqlite.IntegrityError:
-            pass
-        await self.con.commit()
+        async with self._writer() as cur:
+            await self.__write_results(cur, key, value, start, total)
+        rows = [{col: x.get(col) for col in VIDEO_COLUMNS} for x in value]
+        if start == 0:
+            if self.memory is not None:
+                # replaced along with the `queries` row
+                self.memory.pop(("continuation", key))
+            total = total or len(rows)
+            self.__to_memory(("query", key), total, rows + [None] * (total - len(rows)))
+        elif self.memory is not None and (entry := self.memory.pop(("query", key))):
+            created_at, old_total, old_rows = entry
+            total = total or old_total
+            merged = old_rows + [None] * (max(total, start + len(rows)) - len(old_rows))
+            merged[start : start + len(rows)] = rows
+            self.memory.set(("query", key), (created_at, total, merged))
 
     async def get_key(
         self, key: str, index: Optional[int] = None
-    ) -> Union[Tuple[int, str, None], Dict[str, str], None]:
+    ) -> Union[Tuple[int, Dict[str, str]], List[Tuple[str, ...]], None]:
         """Get Data saved in Cache from Key
 
         Parameters:
@@ -104,21 +503,164 @@ CREATE TABLE IF NOT EXISTS {key} (
 
         Returns:
         -------
-            Union[Tuple[int, str, None], Dict[str, str], None]
+            Union[Tuple[int, Dict[str, str]], List[Tuple[str, ...]], None]
         """
-        try:
-            await self.cur.execute(f"SELECT * FROM {key}")
-        except aiosqlite.OperationalError:
+        if index is not None and index < 0:
+            return
+        if self.memory is not None:
+            # Load the whole query once, pagination is then served from memory
+            if not (entry := self.__from_memory(("query", key))):
+                if not (loaded := await self.__load_query(key)):
+                    return [] if index is None else None
+                self.memory.set(("query", key), loaded)
+                entry = loaded
+            self._touched["queries"][key] = time.time()
+            _, total, rows = entry
+            if index is None:
+                return [tuple(x.get(col) for col in VIDEO_COLUMNS) for x in rows if x]
+            if index < len(rows) and (row := rows[index]):
+                return total, row.copy()
             return
-        data = await self.cur.fetchall()
-        d_len = len(data)
+        columns = ", ".join(f"v.{col}" for col in VIDEO_COLUMNS)
         if index is None:
+            if data := await self._fetchall(
+                f"SELECT {columns} FROM query_results r "
+                "JOIN queries q ON q.key = r.query_key "
+                "JOIN videos v ON v.yt_id = r.yt_id "
+                "WHERE r.query_key = ? AND q.created_at >= ? ORDER BY r.position",
+                (key, self.__min_created_at()),
+            ):
+                self._touched["queries"][key] = time.time()
             return data
-        if 0 <= index < d_len:
-            return d_len, dict(
-                zip(map(lambda x: x[0], self.cur.description), data[index])
+        if row := await self._fetchone(
+            f"SELECT q.total, {columns} FROM query_results r "
+            "JOIN queries q ON q.key = r.query_key "
+            "JOIN videos v ON v.yt_id = r.yt_id "
+            "WHERE r.query_key = ? AND r.position = ? AND q.created_at >= ?",
+            (key, index, self.__min_created_at()),
+        ):
+            self._touched["queries"][key] = time.time()
+            return row[0], dict(zip(VIDEO_COLUMNS, row[1:]))
+
+    async def __load_query(
+        self, key: str
+    ) -> Optional[Tuple[float, int, List[Optional[Dict[str, Any]]]]]:
+        """All results of a query as `(created_at, total, results)`
+
+        Results which are not written yet are `None`.
+        """
+        columns = ", ".join(f"v.{col}" for col in VIDEO_COLUMNS)
+        if data := await self._fetchall(
+            f"SELECT q.created_at, q.total, r.position, {columns} "
+            "FROM query_results r "
+            "JOIN queries q ON q.key = r.query_key "
+            "JOIN videos v ON v.yt_id = r.yt_id "
+            "WHERE r.query_key = ? AND q.created_at >= ? ORDER BY r.position",
+            (key, self.__min_created_at()),
+        ):
+            created_at, total = data[0][:2]
+            rows: List[Optional[Dict[str, Any]]] = [None] * max(total, data[-1][2] + 1)
+            for row in data:
+                rows[row[2]] = dict(zip(VIDEO_COLUMNS, row[3:]))
+            return created_at, total, rows
+
+    async def set_continuation(
+        self, key: str, query: str, continuation: Optional[str]
+    ) -> None:
+        """Save where a search left off, call after `set_key()`
+
+        Parameters:
+        ----------
+            key (`str`): Unique Key.
+
+            query (`str`): Search query.
+
+            continuation (`Optional[str]`): Token of the next page, `None` if there are no more results.
+
+        """
+        async with self._writer() as cur:
+            await cur.execute(
+                "UPDATE queries SET query = ?, continuation = ? WHERE key = ?",
+                (query, continuation, key),
+            )
+        self.__to_memory(("continuation", key), query, continuation)
+
+    async def get_continuation(self, key: str) -> Optional[Tuple[str, str]]:
+        """Get the query and the token to load more results of a search
+
+        Parameters:
+        ----------
+            key (`str`): Unique Key.
+
+        Returns:
+        -------
+            Optional[Tuple[str, str]]: `(query, continuation)` if there are more results
+        """
+        if not (entry := self.__from_memory(("continuation", key))):
+            if not (
+                entry := await self._fetchone(
+                    "SELECT created_at, query, continuation FROM queries "
+                    "WHERE key = ? AND created_at >= ?",
+                    (key, self.__min_created_at()),
+                )
+            ):
+                return
+            if self.memory is not None:
+                self.memory.set(("continuation", key), entry)
+        _, query, continuation = entry
+        if query and continuation:
+            return query, continuation
+
+    async def set_raw_results(
+        self, key: str, raw_results: List[Dict[str, Any]], start: int
+    ) -> None:
+        """Save unformatted results counted in the total, call after `set_key()`
+
+        Each is dropped once its formatted result is set, so that a result which
+        failed to be formatted or was interrupted can be formatted on demand.
+
+        Parameters:
+        ----------
+            key (`str`): Unique Key.
+
+            raw_results (`List[Dict[str, Any]]`): Unformatted search results.
+
+            start (`int`): Position of the first result.
+
+        """
+        if not raw_results:
+            return
+        async with self._writer() as cur:
+            await cur.executemany(
+                "INSERT OR REPLACE INTO raw_results(query_key, position, result) "
+                "VALUES(?, ?, ?)",
+                [
+                    (key, pos, json.dumps(x, separators=(",", ":"), default=str))
+                    for pos, x in enumerate(raw_results, start=start)
+                ],
             )
 
+    async def get_raw_result(self, key: str, index: int) -> Optional[Dict[str, Any]]:
+        """Get an unformatted result, see `set_raw_results()`
+
+        Parameters:
+        ----------
+            key (`str`): Unique Key.
+
+            index (`int`): Result index.
+
+        Returns:
+        -------
+            Optional[Dict[str, Any]]: If the result isn't formatted yet
+        """
+        if row := await self._fetchone(
+            "SELECT r.result FROM raw_results r "
+            "JOIN queries q ON q.key = r.query_key "
+            "WHERE r.query_key = ? AND r.position = ? AND q.created_at >= ?",
+            (key, index, self.__min_created_at()),
+        ):
+            return json.loads(row[0])
+
     async def save_url(self, url: str) -> str:
         """Save Url and get Key.
 
@@ -131,16 +673,31 @@ CREATE TABLE IF NOT EXISTS {key} (
             str: Unique Key
 
         """
-        # Check Existing Key
-        await self.cur.execute("SELECT key FROM url_cache WHERE url = ?", (url,))
-        if old_key := await self.cur.fetchone():
-            return old_key[0]
-        # New Key
-        key = rnd_key(5)
-        await self.cur.execute(
-            "INSERT INTO url_cache(key, url) VALUES(?, ?)", (key, url)
-        )
-        await self.con.commit()
+        if entry := self.__from_memory(("url_key", url)):
+            self._touched["url_cache"][entry[1]] = time.time()
+            return entry[1]
+        now = time.time()
+        async with self._writer() as cur:
+            # Check Existing Key
+            await cur.execute("SELECT key FROM url_cache WHERE url = ?", (url,))
+            if old_key := await cur.fetchone():
+                key = old_key[0]
+                # Saving again renews an expired key
+                await cur.execute(
+                    "UPDATE url_cache SET created_at = ?, last_access = ? "
+                    "WHERE key = ?",
+                    (now, now, key),
+                )
+            else:
+                # New Key
+                key = rnd_key(5)
+                await cur.execute(
+                    "INSERT INTO url_cache(key, url, created_at, last_access) "
+                    "VALUES(?, ?, ?, ?)",
+                    (key, url, now, now),
+                )
+        self.__to_memory(("url_key", url), key)
+        self.__to_memory(("url", key), url)
         return key
 
     async def get_url(self, key: str) -> Optional[str]:
@@ -155,10 +712,430 @@ CREATE TABLE IF NOT EXISTS {key} (
             Optional[str]: URL if found
 
         """
-        await self.cur.execute("SELECT url FROM url_cache WHERE key = ?", (key,))
-        if value := await self.cur.fetchone():
-            return value[0]
+        if entry := self.__from_memory(("url", key)):
+            self._touched["url_cache"][key] = time.time()
+            return entry[1]
+        if value := await self._fetchone(
+            "SELECT created_at, url FROM url_cache WHERE key = ? AND created_at >= ?",
+            (key, self.__min_created_at()),
+        ):
+            self._touched["url_cache"][key] = time.time()
+            if self.memory is not None:
+                self.memory.set(("url", key), value)
+            return value[1]
+
+    async def get_thumb(self, yt_id: str) -> Optional[str]:
+        """Get resolved thumbnail of a YouTube video
+
+        Parameters:
+        ----------
+            yt_id (`str`): YouTube video ID.
+
+        Returns:
+        -------
+            Optional[str]: Thumbnail URL if found
+
+        """
+        if entry := self.__from_memory(("thumb", yt_id)):
+            self._touched["thumbs"][yt_id] = time.time()
+            return entry[1]
+        if value := await self._fetchone(
+            "SELECT created_at, url FROM thumbs WHERE key = ? AND created_at >= ?",
+            (yt_id, self.__min_created_at()),
+        ):
+            self._touched["thumbs"][yt_id] = time.time()
+            if self.memory is not None:
+                self.memory.set(("thumb", yt_id), value)
+            return value[1]
+
+    async def set_thumb(self, yt_id: str, url: str) -> None:
+        """Save resolved thumbnail of a YouTube video
+
+        Parameters:
+        ----------
+            yt_id (`str`): YouTube video ID.
+
+            url (`str`): Thumbnail URL.
+
+        """
+        now = time.time()
+        async with self._writer() as cur:
+            await cur.execute(
+                "INSERT OR REPLACE INTO thumbs(key, url, created_at, last_access) "
+                "VALUES(?, ?, ?, ?)",
+                (yt_id, url, now, now),
+            )
+        self.__to_memory(("thumb", yt_id), url)
+
+    async def get_info(self, key: str) -> Optional[Dict[str, Any]]:
+        """Get extracted info of a video / URL, see `~iytdl.extractors.build_manifest`
+
+        Parameters:
+        ----------
+            key (`str`): YouTube video ID or URL.
+
+        Returns:
+        -------
+            Optional[Dict[str, Any]]: Info manifest if found and not expired
+
+        """
+        now = time.time()
+        if entry := self.__from_memory(("info", key)):
+            if entry[2] > now:
+                self._touched["info_cache"][key] = now
+                return entry[1]
+            self.memory.pop(("info", key))
+        if value := await self._fetchone(
+            "SELECT created_at, manifest, expires_at FROM info_cache "
+            "WHERE key = ? AND created_at >= ? AND expires_at > ?",
+            (key, self.__min_created_at(), now),
+        ):
+            self._touched["info_cache"][key] = now
+            manifest = json.loads(value[1])
+            if self.memory is not None:
+                self.memory.set(("info", key), (value[0], manifest, value[2]))
+            return manifest
+
+    async def set_info(
+        self, key: str, manifest: Dict[str, Any], expires_at: float
+    ) -> None:
+        """Save extracted info of a video / URL
+
+        Parameters:
+        ----------
+            key (`str`): YouTube video ID or URL.
+
+            manifest (`Dict[str, Any]`): Info manifest.
+
+            expires_at (`float`): Unix time after which the info is stale e.g when stream URLs expire.
+
+        """
+        now = time.time()
+        async with self._writer() as cur:
+            await cur.execute(
+                "INSERT OR REPLACE INTO "
+                "info_cache(key, manifest, expires_at, created_at, last_access) "
+                "VALUES(?, ?, ?, ?, ?)",
+                (
+                    key,
+                    json.dumps(manifest, separators=(",", ":")),
+                    expires_at,
+                    now,
+                    now,
+                ),
+            )
+        self.__to_memory(("info", key), manifest, expires_at)
+
+    async def get_upload(self, key: str) -> Optional[Dict[str, Optional[str]]]:
+        """Get Telegram file of an already uploaded media
+
+        Parameters:
+        ----------
+            key (`str`): Media key, see `~iytdl.downloader.Downloader.media_key`.
+
+        Returns:
+        -------
+            Optional[Dict[str, Optional[str]]]: `file_id`, `media_type`, `caption`, `url` and `uid` if found
+
+        """
+        if entry := self.__from_memory(("upload", key)):
+            self._touched["uploads"][key] = time.time()
+            return dict(entry[1])
+        # Not expired by `max_age`, file ids stay valid for much longer
+        if value := await self._fetchone(
+            f"SELECT {', '.join(UPLOAD_COLUMNS)} FROM uploads WHERE key = ?", (key,)
+        ):
+            self._touched["uploads"][key] = time.time()
+            upload = dict(zip(UPLOAD_COLUMNS, value))
+            self.__to_memory(("upload", key), upload)
+            return dict(upload)
+
+    async def set_upload(
+        self,
+        key: str,
+        file_id: str,
+        media_type: str,
+        caption: Optional[str] = None,
+        url: Optional[str] = None,
+        uid: Optional[str] = None,
+    ) -> None:
+        """Save Telegram file of an uploaded media
+
+        Parameters:
+        ----------
+            key (`str`): Media key.
+
+            file_id (`str`): Telegram file id.
+
+            media_type (`str`): [`'audio'` | `'video'` | `'document'`].
+
+            caption (`Optional[str]`, optional): Caption as HTML. (Defaults to `None`)
+
+            url (`Optional[str]`, optional): Source URL, to download it again if `file_id` stops working. (Defaults to `None`)
+
+            uid (`Optional[str]`, optional): Format of the source. (Defaults to `None`)
+
+        """
+        upload = dict(zip(UPLOAD_COLUMNS, (file_id, media_type, caption, url, uid)))
+        now = time.time()
+        async with self._writer() as cur:
+            await cur.execute(
+                "INSERT OR REPLACE INTO "
+                f"uploads(key, {', '.join(UPLOAD_COLUMNS)}, created_at, last_access) "
+                "VALUES(?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, *upload.values(), now, now),
+            )
+        self.__to_memory(("upload", key), upload)
+
+    async def delete_upload(self, key: str) -> None:
+        """Forget an uploaded media e.g when its file id is no longer valid
+
+        Parameters:
+        ----------
+            key (`str`): Media key.
+
+        """
+        async with self._writer() as cur:
+            await cur.execute("DELETE FROM uploads WHERE key = ?", (key,))
+        if self.memory is not None:
+            self.memory.pop(("upload", key))
+
+    async def set_job(self, job_id: str, stage: str, job: Dict[str, Any]) -> None:
+        """Record an unfinished job, it keeps its no. of `attempts`
+
+        Parameters:
+        ----------
+            job_id (`str`): Process ID of the job.
+
+            stage (`str`): [`'download'` | `'upload'`].
+
+            job (`Dict[str, Any]`): Arguments to resume the job.
+
+        """
+        async with self._writer() as cur:
+            await cur.execute(
+                "INSERT INTO jobs(id, stage, job, updated_at) VALUES(?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET "
+                "stage = excluded.stage, job = excluded.job, "
+                "updated_at = excluded.updated_at",
+                (job_id, stage, json.dumps(job, separators=(",", ":")), time.time()),
+            )
+
+    async def retry_job(self, job_id: str) -> None:
+        """Count an attempt to resume a job"""
+        async with self._writer() as cur:
+            await cur.execute(
+                "UPDATE jobs SET attempts = attempts + 1 WHERE id = ?", (job_id,)
+            )
+
+    async def delete_job(self, job_id: str) -> None:
+        """Remove a finished or failed job"""
+        async with self._writer() as cur:
+            await cur.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    async def get_jobs(self) -> List[Tuple[str, str, Dict[str, Any], int]]:
+        """Unfinished jobs
+
+        Returns:
+        -------
+            List[Tuple[str, str, Dict[str, Any], int]]: `(job_id, stage, job, attempts)`, oldest first
+
+        """
+        return [
+            (job_id, stage, json.loads(job), attempts)
+            for job_id, stage, job, attempts in await self._fetchall(
+                "SELECT id, stage, job, attempts FROM jobs ORDER BY updated_at"
+            )
+        ]
+
+    async def __flush_touched(self, cur: aiosqlite.Cursor) -> None:
+        """Write batched last access times"""
+        for table, touched in self._touched.items():
+            if not touched:
+                continue
+            self._touched[table] = {}
+            await cur.executemany(
+                f"UPDATE {table} SET last_access = ? WHERE key = ?",
+                [(last_access, key) for key, last_access in touched.items()],
+            )
+
+    async def __delete_queries(
+        self, cur: aiosqlite.Cursor, where: str, params: Tuple[Any, ...]
+    ) -> int:
+        await cur.execute(f"SELECT key FROM queries WHERE {where}", params)
+        if not (keys := await cur.fetchall()):
+            return 0
+        await cur.executemany("DELETE FROM queries WHERE key = ?", keys)
+        await cur.executemany("DELETE FROM query_results WHERE query_key = ?", keys)
+        await cur.executemany("DELETE FROM raw_results WHERE query_key = ?", keys)
+        if self.memory is not None:
+            for (key,) in keys:
+                self.memory.pop(("query", key))
+                self.memory.pop(("continuation", key))
+        return len(keys)
+
+    async def __delete_entries(
+        self, cur: aiosqlite.Cursor, table: str, where: str, params: Tuple[Any, ...]
+    ) -> int:
+        """Delete from `url_cache`, `thumbs`, `info_cache` or `uploads`"""
+        url = "url" if table == "url_cache" else "NULL"
+        await cur.execute(f"SELECT key, {url} FROM {table} WHERE {where}", params)
+        if not (rows := await cur.fetchall()):
+            return 0
+        await cur.executemany(
+            f"DELETE FROM {table} WHERE key = ?", [(key,) for key, _ in rows]
+        )
+        if self.memory is not None:
+            for key, url in rows:
+                if table == "url_cache":
+                    self.memory.pop(("url", key))
+                    self.memory.pop(("url_key", url))
+                else:
+                    self.memory.pop((_MEMORY_KEYS[table], key))
+        return len(rows)
+
+    @staticmethod
+    def __lru_where(table: str, keep: int) -> Tuple[str, Tuple[Any, ...]]:
+        """Condition matching all but the `keep` most recently used rows"""
+        return (
+            f"key IN (SELECT key FROM {table} "
+            "ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+            (keep,),
+        )
+
+    @staticmethod
+    async def __delete_orphan_videos(cur: aiosqlite.Cursor) -> None:
+        await cur.execute(
+            "DELETE FROM videos WHERE NOT EXISTS "
+            "(SELECT 1 FROM query_results r WHERE r.yt_id = videos.yt_id)"
+        )
+
+    async def __incremental_vacuum(self, cur: aiosqlite.Cursor) -> None:
+        """Return free pages to the file system in small steps"""
+        while True:
+            await cur.execute("PRAGMA freelist_count")
+            if (await cur.fetchone())[0] == 0:
+                break
+            async with self._write_lock:
+                await cur.execute(f"PRAGMA incremental_vacuum({_VACUUM_STEP})")
+                await cur.fetchall()
+                await self.con.commit()
+            # let pending queries run in between
+            await asyncio.sleep(0)
+
+    async def db_size(self) -> int:
+        """Size of the cache excluding free pages (in bytes)"""
+        async with self._reader() as con:
+            async with con.cursor() as cur:
+                return await self.__db_size(cur)
+
+    @staticmethod
+    async def __db_size(cur: aiosqlite.Cursor) -> int:
+        await cur.execute("PRAGMA page_count")
+        page_count = (await cur.fetchone())[0]
+        await cur.execute("PRAGMA freelist_count")
+        free_pages = (await cur.fetchone())[0]
+        await cur.execute("PRAGMA page_size")
+        return (page_count - free_pages) * (await cur.fetchone())[0]
+
+    async def maintain(self) -> None:
+        """Expire old entries, evict least recently used ones and shrink the cache file"""
+        async with self._write_lock:
+            async with self.con.cursor() as cur:
+                await self.__flush_touched(cur)
+                self.evictions["expired"] += await self.__delete_entries(
+                    cur, "info_cache", "expires_at < ?", (time.time(),)
+                )
+                if self.max_age:
+                    expired = (self.__min_created_at(),)
+                    self.evictions["expired"] += await self.__delete_queries(
+                        cur, "created_at < ?", expired
+                    )
+                    for table in ("url_cache", "thumbs", "info_cache"):
+                        self.evictions["expired"] += await self.__delete_entries(
+                            cur, table, "created_at < ?", expired
+                        )
+                if self.max_entries:
+                    self.evictions["lru"] += await self.__delete_queries(
+                        cur, *self.__lru_where("queries", self.max_entries)
+                    )
+                    for table in ("url_cache", "thumbs", "info_cache", "uploads"):
+                        self.evictions["lru"] += await self.__delete_entries(
+                            cur, table, *self.__lru_where(table, self.max_entries)
+                        )
+                await self.__delete_orphan_videos(cur)
+                await self.con.commit()
+        if self.max_bytes:
+            while await self.db_size() > self.max_bytes:
+                async with self._write_lock:
+                    async with self.con.cursor() as cur:
+                        await cur.execute("SELECT COUNT(*) FROM queries")
+                        if not (total := (await cur.fetchone())[0]):
+                            break
+                        # Drop ~10% of the least recently used queries per pass
+                        self.evictions["lru"] += await self.__delete_queries(
+                            cur,
+                            *self.__lru_where("queries", total - max(1, total // 10)),
+                        )
+                        await self.__delete_orphan_videos(cur)
+                        await self.con.commit()
+        async with self.con.cursor() as cur:
+            await self.__incremental_vacuum(cur)
+            # keep the write-ahead log from growing between checkpoints
+            async with self._write_lock:
+                await cur.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    async def run_maintenance(self, interval: int = 600) -> None:
+        """Run `maintain()` forever, every `interval` seconds
+
+        Parameters:
+        ----------
+            interval (`int`, optional): Delay between two runs (in seconds). (Defaults to `600`)
+
+        """
+        while True:
+            try:
+                await self.maintain()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Search cache maintenance failed")
+            await asyncio.sleep(interval)
+
+    async def stats(self) -> Dict[str, int]:
+        """Cache statistics
+
+        Returns:
+        -------
+            Dict[str, int]: No. of entries, evictions and cache size (in bytes)
+
+        """
+        out: Dict[str, int] = {}
+        for table in (
+            "queries",
+            "videos",
+            "url_cache",
+            "thumbs",
+            "info_cache",
+            "uploads",
+        ):
+            out[table] = (await self._fetchone(f"SELECT COUNT(*) FROM {table}"))[0]
+        out["db_size"] = await self.db_size()
+        out.update({f"evicted_{k}": v for k, v in self.evictions.items()})
+        if self.memory is not None:
+            out.update({f"memory_{k}": v for k, v in self.memory.stats().items()})
+        out["file_size"] = (
+            os.path.getsize(self.db_name) if os.path.isfile(self.db_name) else 0
+        )
+        return out
 
     async def close(self) -> None:
         """Close Cache File"""
-        await self.con.close()
+        try:
+            async with self._writer() as cur:
+                await self.__flush_touched(cur)
+        finally:
+            for con in self._reader_cons:
+                await con.close()
+            self._reader_cons.clear()
+            await self.con.close()
@@ -1,16 +1,28 @@
-__all__ = ["unquote_filename", "thumb_from_audio", "covert_to_jpg", "take_screen_shot"]
+__all__ = [
+    "unquote_filename",
+    "thumb_from_audio",
+    "covert_to_jpg",
+    "normalize_thumb",
+    "probe_metadata",
+    "take_screen_shot",
+]
 
+import hashlib
+import os
 import re
+import secrets
 
+from contextlib import suppress
 from io import BytesIO
 from pathlib import Path
-from typing import Any, Optional, Tuple, Union
+from typing import Any, Dict, Optional, Tuple, Union
 
-import mutagen
-
-from PIL import Image
-
-from iytdl.upload_lib import ext
+from iytdl.constants import (
+    THUMBNAIL_CACHE_SIZE,
+    THUMBNAIL_MAX_BYTES,
+    THUMBNAIL_QUALITY,
+    THUMBNAIL_SIZE,
+)
 from iytdl.utils import run_command
 
 
@@ -36,65 +48,173 @@ def unquote_filename(filename: Union[Path, str]) -> str:
     return str(filename)
 
 
-def thumb_from_audio(filename: Union[Path, str]) -> Optional[str]:
+def thumb_from_audio(
+    filename: Union[Path, str], cache_dir: Union[Path, str, None] = None
+) -> Optional[str]:
     """Extract album art from audio
 
     Parameters:
     ----------
         - filename (`Union[Path, str]`): audio file path.
+        - cache_dir (`Union[Path, str, None]`, optional): See `normalize_thumb` (default `None` i.e next to the audio).
 
     Returns:
     -------
         `Optional[str]`: if audio has album art
 
     """
+    import mutagen
+
     file = Path(filename) if isinstance(filename, str) else filename
     if not (audio_id3 := mutagen.File(str(file))):
         return
-    thumb_path = file.parent.joinpath("album_art.jpg")
     for key in audio_id3.keys():
         if "APIC" in key and (album_art := getattr(audio_id3[key], "data", None)):
-            thumb_path = file.parent.joinpath("album_art.jpg")
-            with BytesIO(album_art) as img_io:
-                with Image.open(img_io) as img:
-                    img.convert("RGB").save(str(thumb_path), "JPEG")
-            break
-    if thumb_path.is_file():
-        return str(thumb_path)
+            return normalize_thumb(album_art, cache_dir or file.parent)[0]
 
 
-def covert_to_jpg(filename: Union[Path, str]) -> Tuple[str, Tuple[int]]:
+def covert_to_jpg(
+    filename: Union[Path, str], cache_dir: Union[Path, str, None] = None
+) -> Tuple[str, Tuple[int]]:
     """Convert images to Telegram supported thumb
 
     Parameters:
     ----------
         - filename (`Union[Path, str]`): Image file path.
+        - cache_dir (`Union[Path, str, None]`, optional): See `normalize_thumb` (default `None` i.e next to the image).
 
     Returns:
     -------
-        `Tuple[str, Tuple[int]]`: (thumb_path, dimensions)
+        `Tuple[str, Tuple[int]]`: (thumb_path, dimensions of the image)
 
     """
     file = Path(filename) if isinstance(filename, str) else filename
-    with Image.open(file) as img:
-        if file.name.lower().endswith(ext.photo[:2]):
-            thumb_path = str(file)
-        else:
-            thumb_path = str(file.parent.joinpath(f"{file.stem}.jpeg"))
-            img.convert("RGB").save(thumb_path, "JPEG")
-        size = img.size
-    return thumb_path, size
+    return normalize_thumb(file, cache_dir or file.parent)
+
+
+def normalize_thumb(
+    source: Union[Path, str, bytes],
+    cache_dir: Union[Path, str],
+    size: int = THUMBNAIL_SIZE,
+    max_bytes: int = THUMBNAIL_MAX_BYTES,
+) -> Tuple[str, Tuple[int]]:
+    """Resize and recompress an image to a JPEG within Telegram's thumbnail limits
+
+    Results are cached in `cache_dir` by the hash of the source image, so the
+    same thumbnail is processed once. Blocking, call it in an executor.
+
+    Parameters:
+    ----------
+        - source (`Union[Path, str, bytes]`): Image file path or content.
+        - cache_dir (`Union[Path, str]`): Directory of processed thumbnails.
+        - size (`int`, optional): Max. width and height (default `320`).
+        - max_bytes (`int`, optional): Max. JPEG size (default `200 KiB`).
+
+    Returns:
+    -------
+        `Tuple[str, Tuple[int]]`: (thumb_path, dimensions of the source image)
+
+    """
+    from PIL import Image
+
+    data = source if isinstance(source, bytes) else Path(source).read_bytes()
+    cache = Path(cache_dir)
+    digest = hashlib.sha1(data).hexdigest()[:16]
+    thumb_path = cache.joinpath(f"{digest}-{size}.jpg")
+    with BytesIO(data) as img_io, Image.open(img_io) as img:
+        # only the header is read, media dimensions may fall back to these
+        source_size = img.size
+        if thumb_path.is_file():
+            with suppress(FileNotFoundError):
+                # last use, see `_prune_thumbs`
+                os.utime(thumb_path)
+                return str(thumb_path), source_size
+        # JPEGs are decoded at a reduced scale close to `size`
+        img.draft("RGB", (size, size))
+        thumb = img.convert("RGB")
+    thumb.thumbnail((size, size))
+    for quality in THUMBNAIL_QUALITY:
+        out = BytesIO()
+        thumb.save(out, "JPEG", quality=quality, optimize=True)
+        if out.tell() <= max_bytes:
+            break
+
+    cache.mkdir(parents=True, exist_ok=True)
+    tmp_path = thumb_path.with_name(f"{thumb_path.stem}-{secrets.token_hex(4)}.tmp")
+    tmp_path.write_bytes(out.getvalue())
+    os.replace(tmp_path, thumb_path)
+    _prune_thumbs(cache)
+    return str(thumb_path), source_size
+
+
+# see `normalize_thumb`, other images may share the directory
+_THUMB_NAME = re.compile(r"[0-9a-f]{16}-\d+\.jpg")
+
+
+def _prune_thumbs(cache: Path, keep: int = THUMBNAIL_CACHE_SIZE) -> None:
+    """Delete least recently used thumbnails beyond `keep`"""
+    thumbs = []
+    for entry in os.scandir(cache):
+        if _THUMB_NAME.fullmatch(entry.name):
+            with suppress(FileNotFoundError):
+                thumbs.append((entry.stat().st_mtime, entry.path))
+    for _, path in sorted(thumbs)[: max(len(thumbs) - keep, 0)]:
+        with suppress(FileNotFoundError):
+            os.remove(path)
+
+
+def probe_metadata(filename: Union[Path, str]) -> Dict[str, Any]:
+    """Read duration, artist and title from the media container
+
+    Slow for large files, used when the download didn't record them.
+
+    Parameters:
+    ----------
+        - filename (`Union[Path, str]`): Media file path.
+
+    Returns:
+    -------
+        `Dict[str, Any]`: `"duration"`, `"performer"` and `"title"` if found
+
+    """
+    from hachoir.metadata import extractMetadata
+    from hachoir.metadata.metadata_item import QUALITY_FASTEST
+    from hachoir.parser import createParser
+
+    if not (parser := createParser(str(filename))):
+        return {}
+    # closes the file, and reads as little of it as possible
+    with parser:
+        metadata = extractMetadata(parser, quality=QUALITY_FASTEST)
+    out: Dict[str, Any] = {}
+    if metadata:
+        if metadata.has("duration"):
+            out["duration"] = metadata.get("duration").seconds
+        if metadata.has("artist"):
+            out["performer"] = metadata.get("artist")
+        if metadata.has("title"):
+            out["title"] = metadata.get("title")
+    return out
 
 
 async def take_screen_shot(
-    video_file: str, ttl: int = -1, **kwargs: Any
+    video_file: str,
+    ttl: int = -1,
+    output: Union[Path, str, None] = None,
+    size: int = THUMBNAIL_SIZE,
+    **kwargs: Any,
 ) -> Optional[str]:
     """Generate Thumbnail from video
 
+    Seeks to the keyframe before `ttl` and decodes only that frame, scaled down
+    to fit in `size` x `size`.
+
     Parameters:
     ----------
         - video_file (`str`): Video file path.
         - ttl (`int`, optional): Timestamp (default `-1` i.e use ffprobe).
+        - output (`Union[Path, str, None]`, optional): Thumbnail path (default `None` i.e `<video name>.jpg`).
+        - size (`int`, optional): Max. width and height (default `320`).
         - **kwargs (`Any`, optional) Pass ffmpeg and ffprobe custom path.
 
     Returns:
@@ -102,14 +222,14 @@ async def take_screen_shot(
         `Optional[str]`: On Success
     """
     file = Path(video_file)
-    ss_path = file.parent.joinpath(f"{file.stem}.jpg")
-    vid_path = f'"{video_file}"'
+    ss_path = Path(output) if output else file.parent.joinpath(f"{file.stem}.jpg")
+    # run without a shell, so that quotes in file names don't matter
     if ttl == -1:
         try:
             get_duration = [
-                kwargs.get("ffprobe", "ffprobe"),
+                str(kwargs.get("ffprobe") or "ffprobe"),
                 "-i",
-                vid_path,
+                str(file),
                 "-v",
                 "quiet",
                 "-show_entries",
@@ -118,25 +238,41 @@ async def take_screen_shot(
                 "-of",
                 "default=noprint_wrappers=1:nokey=1",
             ]
-            _dur, _rt_code = await run_command(" ".join(get_duration), shell=True)
+            _dur, _rt_code = await run_command(*get_duration)
 
             if _rt_code != 0:
                 return
             ttl = int(float(_dur)) // 2
         except Exception:
             return
+    # written next to it first, so that a partial thumbnail is never used
+    tmp_path = ss_path.with_name(f"{ss_path.stem}-{secrets.token_hex(4)}.jpg")
     cmd = [
-        kwargs.get("ffmpeg", "ffmpeg"),
+        str(kwargs.get("ffmpeg") or "ffmpeg"),
         "-hide_banner",
-        "-loglevel error",
+        "-loglevel",
+        "error",
+        "-skip_frame",
+        "nokey",
         "-ss",
         str(ttl),
         "-i",
-        vid_path,
-        "-vframes",
+        str(file),
+        "-frames:v",
         "1",
-        f'"{ss_path}"',
+        "-vf",
+        f"scale='min({size},iw)':'min({size},ih)':force_original_aspect_ratio=decrease",
+        "-q:v",
+        "4",
+        "-y",
+        str(tmp_path),
     ]
-    rt_code = (await run_command(" ".join(cmd), shell=True))[1]
-    if rt_code == 0 and ss_path.is_file():
-        return str(ss_path)
+    try:
+        rt_code = (await run_command(*cmd))[1]
+        # no frame decoded, e.g past the end, leaves an empty file
+        if rt_code == 0 and tmp_path.is_file() and tmp_path.stat().st_size > 0:
+            os.replace(tmp_path, ss_path)
+            return str(ss_path)
+    finally:
+        with suppress(FileNotFoundError):
+            tmp_path.unlink()
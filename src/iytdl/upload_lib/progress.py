@@ -5,7 +5,7 @@ import logging
 import time
 
 from math import floor
-from typing import Dict, Tuple
+from typing import TYPE_CHECKING, Any, Optional
 
 from pyrogram import Client, ContinuePropagation, StopPropagation, StopTransmission
 from pyrogram.errors import FloodWait, MessageNotModified
@@ -14,7 +14,9 @@ from iytdl.processes import Process
 from iytdl.utils import *
 
 
-_PROGRESS: Dict[str, Tuple[int, int]] = {}
+if TYPE_CHECKING:
+    from iytdl.edit_scheduler import EditScheduler
+
 LOG = logging.getLogger(__name__)
 
 
@@ -26,6 +28,7 @@ async def progress(
     filename: str,
     mode: str = "upload",
     edit_rate: int = 8,
+    edits: Optional["EditScheduler"] = None,
 ):
     """Pyrogram Upload / Download Progress Bar
 
@@ -38,6 +41,7 @@ async def progress(
         - filename (`str`): Display name of the file.
         - mode (`str`, optional): `"upload"` or `"download"`. (Defaults to `"upload"`)
         - edit_rate (`int`, optional): Message edit rate. (Defaults to `8`)
+        - edits (`Optional[EditScheduler]`, optional): Submit edits to it instead of waiting for them. (Defaults to `None`)
     """
     if process.is_cancelled:
         LOG.warning("Upload process is Cancelled")
@@ -45,21 +49,18 @@ async def progress(
         await client.stop_transmission()
 
     if current == total:
-        if process.id not in _PROGRESS:
+        if process.job.transfer is None:
             return
-        del _PROGRESS[process.id]
-        try:
-            await process.edit(f"`Finalizing {mode} process ...`")
-        except FloodWait as f_w:
-            await asyncio.sleep(f_w.x + 2)
+        process.job.transfer = None
+        await _edit(process, f"`Finalizing {mode} process ...`", edits)
         return
     now = int(time.time())
-    if process.id not in _PROGRESS:
-        _PROGRESS[process.id] = (now, now)
-    start, last_update_time = _PROGRESS[process.id]
+    if process.job.transfer is None:
+        process.job.transfer = (now, now)
+    start, last_update_time = process.job.transfer
     # ------------------------------------ #
     if (now - last_update_time) >= edit_rate:
-        _PROGRESS[process.id] = (start, now)
+        process.job.transfer = (start, now)
         # Only edit message once every 8 seconds to avoid ratelimits
         after = now - start
         speed = current / after
@@ -76,13 +77,23 @@ async def progress(
 <b>Speed:</b>  <code>{humanbytes(speed)}</code>
 <b>ETA:</b>  <code>{time_formater(eta)}</code>
 """
-        try:
-            await process.edit(progress, reply_markup=process.cancel_markup)
-        except FloodWait as f:
-            await asyncio.sleep(f.x + 2)
-        except (ContinuePropagation, MessageNotModified):
-            pass
-        except (StopPropagation, StopTransmission) as p_e:
-            raise p_e
-        except Exception:
-            LOG.exception("Unable to Edit message")
+        await _edit(process, progress, edits, reply_markup=process.cancel_markup)
+
+
+async def _edit(
+    process: Process, text: str, edits: Optional["EditScheduler"], **kwargs: Any
+) -> None:
+    if edits is not None:
+        # never holds up the transfer
+        edits.submit(process, text, **kwargs)
+        return
+    try:
+        await process.edit(text, **kwargs)
+    except FloodWait as f:
+        await asyncio.sleep(f.x + 2)
+    except (ContinuePropagation, MessageNotModified):
+        pass
+    except (StopPropagation, StopTransmission) as p_e:
+        raise p_e
+    except Exception:
+        LOG.exception("Unable to Edit message")
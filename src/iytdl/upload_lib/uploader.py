@@ -4,12 +4,17 @@ import asyncio
 import logging
 import os
 
-from shutil import rmtree
+from pathlib import Path
 from typing import Any, Dict, Literal, Optional, Union
 
-from hachoir.metadata import extractMetadata
-from hachoir.parser import createParser
 from pyrogram import Client
+from pyrogram.errors import (
+    FileIdInvalid,
+    FileReferenceExpired,
+    FileReferenceInvalid,
+    MediaEmpty,
+    MediaInvalid,
+)
 from pyrogram.types import (
     CallbackQuery,
     InputMediaAudio,
@@ -18,6 +23,9 @@ from pyrogram.types import (
     Message,
 )
 
+from iytdl.constants import THUMBNAIL_CACHE, VIDEO_THUMBNAIL
+from iytdl.executors import run_in_executor
+from iytdl.media_info import read_media_info
 from iytdl.processes import Process
 from iytdl.upload_lib import ext
 from iytdl.upload_lib.functions import *  # noqa ignore=F405
@@ -27,13 +35,28 @@ from iytdl.utils import *  # noqa ignore=F405
 
 logger = logging.getLogger(__name__)
 
+# Raised when a cached file id can't be sent anymore, `ValueError` if it can't be decoded
+FILE_ID_ERRORS = (
+    FileIdInvalid,
+    FileReferenceExpired,
+    FileReferenceInvalid,
+    MediaEmpty,
+    MediaInvalid,
+    ValueError,
+)
+
+
+def _check_size(file: Path, size: int) -> None:
+    if size > 2147000000:  # 2 * 1024 * 1024 * 1024 = 2147483648
+        raise ValueError(f"[{file}] will not be uploaded as filesize exceeds '2 GB' !")
+
 
 class Uploader:
-    @run_sync
+    @run_in_executor("interactive")
     def find_media(
         self, key: str, media_type: Literal["audio", "video"]
     ) -> Dict[str, Any]:
-        """Search Downloaded files for thumbnail and media
+        """Media and thumbnail of a download, as recorded by it
 
         Parameters:
         ----------
@@ -54,47 +77,78 @@ class Uploader:
         media_path = self.download_path.joinpath(key)
         if not media_path.is_dir():
             raise FileNotFoundError(f"'{media_path}' doesn't exist !")
+        # files recorded by the download, older downloads are searched for
+        record = read_media_info(media_path)
+        if not (info_dict := self.__recorded_files(media_path, media_type, record)):
+            record = {}
+            info_dict = self.__scan_files(media_path, media_type)
+
+        if media := info_dict.get(media_type):
+            metadata = record or probe_metadata(media)
+            if duration := metadata.get("duration"):
+                info_dict["duration"] = duration
+
+            if media_type == "audio":
+                info_dict.pop("size", None)
+                for field in ("performer", "title"):
+                    if value := metadata.get(field):
+                        info_dict[field] = value
+                # If Thumb doesn't exist then check for Album art
+                if not info_dict.get("thumb"):
+                    info_dict["thumb"] = thumb_from_audio(
+                        media, self.download_path.joinpath(THUMBNAIL_CACHE)
+                    )
+            else:
+                # thumbnail dimensions if the download didn't record them
+                width, height = info_dict.pop("size", (1280, 720))
+                info_dict["height"] = metadata.get("height") or height
+                info_dict["width"] = metadata.get("width") or width
+            return info_dict
+
+    def __recorded_files(
+        self, media_path: Path, media_type: str, record: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Media and thumbnail named in the media info, empty if it has none"""
+        if not (name := record.get("file")) or not name.lower().endswith(
+            getattr(ext, media_type)
+        ):
+            return {}
+        file = media_path.joinpath(name)
+        try:
+            size = file.stat().st_size
+        except FileNotFoundError:
+            return {}
+        _check_size(file, size)
+        info_dict = {media_type: str(file), "file_name": name}
+        if (thumb := record.get("thumbnail")) and (
+            thumb_file := media_path.joinpath(thumb)
+        ).is_file():
+            info_dict["thumb"], info_dict["size"] = covert_to_jpg(
+                thumb_file, self.download_path.joinpath(THUMBNAIL_CACHE)
+            )
+        return info_dict
+
+    def __scan_files(self, media_path: Path, media_type: str) -> Dict[str, Any]:
+        """Search the media directory for media and thumbnail"""
         info_dict: Dict = {}
         for file in media_path.iterdir():
             if (
                 not info_dict.get(media_type)
                 and file.name.lower().endswith(getattr(ext, media_type))
-                and file.stat().st_size != 0
+                and (size := file.stat().st_size) != 0
             ):
-                if (
-                    file.stat().st_size > 2147000000
-                ):  # 2 * 1024 * 1024 * 1024 = 2147483648
-                    raise ValueError(
-                        f"[{file}] will not be uploaded as filesize exceeds '2 GB' !"
-                    )
+                _check_size(file, size)
                 f_path = unquote_filename(file)
                 info_dict[media_type] = f_path
                 info_dict["file_name"] = os.path.basename(f_path)
             if not info_dict.get("thumb") and file.name.lower().endswith(ext.photo):
-                info_dict["thumb"], info_dict["size"] = covert_to_jpg(file)
+                info_dict["thumb"], info_dict["size"] = covert_to_jpg(
+                    file, self.download_path.joinpath(THUMBNAIL_CACHE)
+                )
 
             if media_type in info_dict and "thumb" in info_dict:
                 break
-
-        if media := info_dict.get(media_type):
-            metadata = extractMetadata(createParser(media))
-            if metadata and metadata.has("duration"):
-                info_dict["duration"] = metadata.get("duration").seconds
-
-            if media_type == "audio":
-                info_dict.pop("size", None)
-                if metadata.has("artist"):
-                    info_dict["performer"] = metadata.get("artist")
-                if metadata.has("title"):
-                    info_dict["title"] = metadata.get("title")
-                # If Thumb doesn't exist then check for Album art
-                if not info_dict.get("thumb"):
-                    info_dict["thumb"] = thumb_from_audio(media)
-            else:
-                width, height = info_dict.pop("size", (1280, 720))
-                info_dict["height"] = height
-                info_dict["width"] = width
-            return info_dict
+        return info_dict
 
     async def get_input_media(
         self,
@@ -143,8 +197,9 @@ class Uploader:
         caption_link: Optional[str] = None,
         with_progress: bool = True,
         cb_extra: Union[int, str, None] = None,
+        priority: str = "normal",
     ) -> Union[CallbackQuery, Message]:
-        """Upload downloaded Media with progress
+        """Upload downloaded Media with progress, media uploaded before is sent by its file id
 
         Parameters:
         ----------
@@ -155,50 +210,159 @@ class Uploader:
             - caption_link (`Optional[str]`, optional): Custom caption href link. (Defaults to `None`)
             - with_progress (`bool`, optional): Enable / Disable progress. (Defaults to `True`)
             - cb_extra (`Union[int, str, None]`, optional): Extra callback_data for cancel markup (Defaults to `None`)
+            - priority (`str`, optional): [`'high'` | `'normal'` | `'low'`] When uploads are queued. (Defaults to `"normal"`)
 
         Returns:
         -------
             `Union[CallbackQuery, Message]`: On Success
         """
+        job = {
+            "key": key,
+            "downtype": downtype,
+            "caption_link": caption_link,
+            "with_progress": with_progress,
+            "cb_extra": cb_extra,
+            "priority": priority,
+        }
+        process = Process(update, cb_extra=cb_extra, registry=self.processes)
+        with self.processes.running(process):
+            async with self._journaled(process, "upload", update, job):
+                return await self.__upload(
+                    client,
+                    key,
+                    downtype,
+                    update,
+                    caption_link,
+                    with_progress,
+                    cb_extra,
+                    priority,
+                )
+
+    async def __upload(
+        self,
+        client: Client,
+        key: str,
+        downtype: str,
+        update: Union[CallbackQuery, Message],
+        caption_link: Optional[str],
+        with_progress: bool,
+        cb_extra: Union[int, str, None],
+        priority: str,
+    ) -> Union[CallbackQuery, Message]:
+        if cached := await self.cache.get_upload(key):
+            try:
+                return await self.__send_cached(key, cached, update, cb_extra)
+            except FILE_ID_ERRORS as e:
+                logger.warning(f"Cached upload '{key}' can't be sent: {e!r}")
+                await self.cache.delete_upload(key)
+                if not cached["url"]:
+                    raise
+                # same url, uid and downtype, so the key doesn't change
+                await self.download(
+                    cached["url"],
+                    cached["uid"],
+                    downtype,
+                    update,
+                    with_progress=with_progress,
+                    cb_extra=cb_extra,
+                    priority=priority,
+                )
         if mkwargs := await self.find_media(key, downtype):
 
             if caption_link:
                 caption = f"<a href={caption_link}>{mkwargs['file_name']}</a>"
             else:
                 caption = mkwargs["file_name"]
-            process = Process(update, cb_extra=cb_extra)
+            process = Process(update, cb_extra=cb_extra, registry=self.processes)
+            owner = self._job_owner(process, cb_extra)
+            on_wait = self._on_queued(process, with_progress)
             try:
-                if downtype == "video":
-                    return await self.__upload_video(
-                        client, process, caption, mkwargs, with_progress
-                    )
-                if downtype == "audio":
-                    return await self.__upload_audio(
-                        client, process, caption, mkwargs, with_progress
-                    )
+                if downtype == "video" and not mkwargs.get("thumb"):
+                    thumb = self.download_path.joinpath(key, VIDEO_THUMBNAIL)
+                    if thumb.is_file():
+                        # taken for an earlier upload
+                        mkwargs["thumb"] = str(thumb)
+                    else:
+                        async with self.scheduler.slot(
+                            "postprocess", owner, priority, on_wait=on_wait
+                        ):
+                            mkwargs["thumb"] = await self.__screen_shot(mkwargs, thumb)
+                async with self.scheduler.slot(
+                    "upload", owner, priority, on_wait=on_wait
+                ):
+                    if downtype == "video":
+                        return await self.__upload_video(
+                            client, process, key, caption, mkwargs, with_progress
+                        )
+                    if downtype == "audio":
+                        return await self.__upload_audio(
+                            client, process, key, caption, mkwargs, with_progress
+                        )
             finally:
-                if self.delete_file_after_upload:
-                    rmtree(self.download_path.joinpath(key), ignore_errors=True)
+                self._release_media(key)
+
+    async def __send_cached(
+        self,
+        key: str,
+        cached: Dict[str, Optional[str]],
+        update: Union[CallbackQuery, Message],
+        cb_extra: Union[int, str, None] = None,
+    ) -> Union[CallbackQuery, Message]:
+        process = Process(update, cb_extra=cb_extra, registry=self.processes)
+        media_cls = {"audio": InputMediaAudio, "video": InputMediaVideo}.get(
+            cached["media_type"], InputMediaDocument
+        )
+        await self.edits.discard(process.id)
+        try:
+            return await process.edit_media(
+                media=media_cls(cached["file_id"], caption=cached["caption"] or ""),
+                reply_markup=None,
+            )
+        finally:
+            # downloaded before the upload was cached
+            if key in self._media_refs:
+                self._release_media(key)
+
+    async def __save_upload(self, key: str, uploaded: Message) -> None:
+        """Remember the file id, so that the media is never uploaded again"""
+        for media_type in ("video", "audio", "document"):
+            if media := getattr(uploaded, media_type):
+                break
+        else:
+            return
+        source = self._media_source(key) or {}
+        await self.cache.set_upload(
+            key,
+            media.file_id,
+            media_type,
+            caption=uploaded.caption.html if uploaded.caption else None,
+            url=source.get("url"),
+            uid=source.get("uid"),
+        )
+
+    async def __screen_shot(
+        self, mkwargs: Dict[str, Any], output: Path
+    ) -> Optional[str]:
+        """Thumbnail from the middle of the video"""
+        # known from the download, ffprobe is only needed for older ones
+        ttl = (duration // 2) if (duration := mkwargs.get("duration")) else -1
+        return await take_screen_shot(
+            mkwargs["video"],
+            ttl,
+            output=output,
+            ffmpeg=self._ffmpeg,
+            ffprobe=getattr(self, "_ffprobe", None),
+        )
 
     async def __upload_video(
         self,
         client: Client,
         process: Process,
+        key: str,
         caption: str,
         mkwargs: Dict[str, Any],
         with_progress: bool = True,
     ):
-
-        if not mkwargs.get("thumb"):
-            ttl = (duration // 2) if (duration := mkwargs.get("duration")) else -1
-
-            mkwargs["thumb"] = await take_screen_shot(
-                mkwargs["video"],
-                ttl,
-                ffmpeg=self._ffmpeg,
-                ffprobe=getattr(self, "_ffprobe", None),
-            )
-
         if not (
             uploaded := await client.send_video(
                 chat_id=self.log_group_id,
@@ -206,7 +370,14 @@ class Uploader:
                 parse_mode="HTML",
                 disable_notification=True,
                 progress=upload_progress if with_progress else None,
-                progress_args=(client, process, mkwargs["file_name"])
+                progress_args=(
+                    client,
+                    process,
+                    mkwargs["file_name"],
+                    "upload",
+                    8,
+                    self.edits,
+                )
                 if with_progress
                 else (),
                 **mkwargs,
@@ -214,8 +385,11 @@ class Uploader:
         ):
 
             return
+        await self.__save_upload(key, uploaded)
         await asyncio.sleep(2)
         if not process.is_cancelled:
+            # a late progress edit would fail on the media message
+            await self.edits.discard(process.id)
             if uploaded.video:
 
                 return await process.edit_media(
@@ -236,6 +410,7 @@ class Uploader:
         self,
         client: Client,
         process: Process,
+        key: str,
         caption: str,
         mkwargs: Dict[str, Any],
         with_progress: bool = True,
@@ -247,15 +422,25 @@ class Uploader:
                 parse_mode="HTML",
                 disable_notification=True,
                 progress=upload_progress if with_progress else None,
-                progress_args=(client, process, mkwargs["file_name"])
+                progress_args=(
+                    client,
+                    process,
+                    mkwargs["file_name"],
+                    "upload",
+                    8,
+                    self.edits,
+                )
                 if with_progress
                 else (),
                 **mkwargs,
             )
         ):
             return
+        await self.__save_upload(key, uploaded)
         await asyncio.sleep(2)
         if not process.is_cancelled:
+            # a late progress edit would fail on the media message
+            await self.edits.discard(process.id)
             if uploaded.audio:
                 return await process.edit_media(
                     media=InputMediaAudio(
@@ -16,14 +16,24 @@ from datetime import timedelta
 from functools import partial, wraps
 from io import BytesIO
 from random import sample
-from typing import Any, Awaitable, Callable, List, Optional, Tuple, Union
-
-from aiohttp import ClientSession, FormData
-from PIL import Image
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Awaitable,
+    Callable,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
 from iytdl.constants import *  # noqa ignore=F405
 
 
+if TYPE_CHECKING:
+    from aiohttp import ClientSession
+
+
 _CHAR: List[str] = list("_ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxy")
 logger = logging.getLogger(__name__)
 
@@ -101,7 +111,7 @@ def rnd_key(length: int = 8) -> str:
     return "".join(sample(_CHAR, length))
 
 
-async def upload_to_telegraph(http: ClientSession, url: str) -> Optional[str]:
+async def upload_to_telegraph(http: "ClientSession", url: str) -> Optional[str]:
     """Upload Images to Telegra.ph via URL
 
     Parameters:
@@ -113,6 +123,9 @@ async def upload_to_telegraph(http: ClientSession, url: str) -> Optional[str]:
     -------
         `Optional[str]`: Telegra.ph link on success
     """
+    from aiohttp import FormData
+    from PIL import Image
+
     async with http.get(url) as img_url:
         img_bytes = await img_url.read()
     with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as temp_img:
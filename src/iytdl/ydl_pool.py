@@ -0,0 +1,174 @@
+__all__ = ["YoutubeDLPool"]
+
+import logging
+import threading
+
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Callable, Dict, Hashable, Iterator, List
+
+
+if TYPE_CHECKING:
+    import yt_dlp as youtube_dl
+
+logger = logging.getLogger(__name__)
+
+# Options which can differ between two uses of the same instance
+OVERRIDABLE = ("format", "outtmpl", "progress_hooks", "post_processors")
+
+
+class YoutubeDLPool:
+    def __init__(self, max_idle: int = 4, max_profiles: int = 16) -> None:
+        """Reusable `YoutubeDL` instances, grouped by their options
+
+        Parameters:
+        ----------
+            - max_idle (`int`, optional): Max. idle instances kept per profile. (Defaults to `4`)
+            - max_profiles (`int`, optional): Max. option profiles, least recently used are dropped. (Defaults to `16`)
+        """
+        self.max_idle = max_idle
+        self.max_profiles = max_profiles
+        self.created = 0
+        self.reused = 0
+        self._lock = threading.Lock()
+        self._idle: "OrderedDict[Hashable, List[youtube_dl.YoutubeDL]]" = OrderedDict()
+
+    @staticmethod
+    def profile(params: Dict[str, Any]) -> Hashable:
+        """Key of instances created with the same `params`"""
+        return tuple(sorted((key, repr(value)) for key, value in params.items()))
+
+    @contextmanager
+    def checkout(
+        self, params: Dict[str, Any], **overrides: Any
+    ) -> Iterator["youtube_dl.YoutubeDL"]:
+        """Borrow a `YoutubeDL` instance, it is returned to the pool on exit
+
+        Parameters:
+        ----------
+            - params (`Dict[str, Any]`): `YoutubeDL` options, don't put per call values here.
+            - overrides: Per call `"format"`, `"outtmpl"`, `"progress_hooks"` or `"post_processors"`,
+                i.e `PostProcessor` instances run after the ones in `params`.
+
+        Raises:
+        ------
+            `ValueError`: If an option can't be overridden
+        """
+        if unknown := set(overrides).difference(OVERRIDABLE):
+            raise ValueError(f"Can't override {', '.join(sorted(unknown))}")
+        key = self.profile(params)
+        with self._lock:
+            if idle := self._idle.get(key):
+                ytdl = idle.pop()
+                self.reused += 1
+            else:
+                ytdl = None
+                self.created += 1
+        if ytdl is None:
+            import yt_dlp as youtube_dl
+
+            ytdl = youtube_dl.YoutubeDL(dict(params))
+        try:
+            restore = self.__override(ytdl, overrides)
+        except Exception:
+            self.__checkin(key, ytdl)
+            raise
+        try:
+            yield ytdl
+        finally:
+            restore()
+            self.__checkin(key, ytdl)
+
+    @staticmethod
+    def __override(
+        ytdl: "youtube_dl.YoutubeDL", overrides: Dict[str, Any]
+    ) -> Callable[[], None]:
+        """Apply per call options, returns a function to undo it"""
+        saved_hooks = ytdl._progress_hooks
+        saved_outtmpl = ytdl.params.get("outtmpl")
+        # parsed templates of older yt-dlp (e.g 2021.9.25) without `_parse_outtmpl()`
+        saved_outtmpl_dict = getattr(ytdl, "outtmpl_dict", None)
+        saved_format = ytdl.params.get("format"), ytdl.format_selector
+        saved_pps = list(ytdl._pps["post_process"])
+        if "format" in overrides:
+            # parsed first, as it is the only one that can fail
+            fmt = overrides["format"]
+            ytdl.format_selector = (
+                fmt
+                if fmt in (None, "-") or callable(fmt)
+                else ytdl.build_format_selector(fmt)
+            )
+            ytdl.params["format"] = fmt
+        if "progress_hooks" in overrides:
+            ytdl._progress_hooks = list(overrides["progress_hooks"] or [])
+        if "outtmpl" in overrides:
+            outtmpl = overrides["outtmpl"]
+            ytdl.params["outtmpl"] = (
+                outtmpl.copy() if isinstance(outtmpl, dict) else {"default": outtmpl}
+            )
+            YoutubeDLPool.__parse_outtmpl(ytdl)
+        for pp in overrides.get("post_processors") or []:
+            ytdl.add_post_processor(pp)
+        # return code and counters are kept from the last use otherwise
+        ytdl._download_retcode = 0
+        ytdl._num_downloads = 0
+
+        def restore() -> None:
+            ytdl._progress_hooks = saved_hooks
+            if saved_outtmpl is None:
+                ytdl.params.pop("outtmpl", None)
+            else:
+                ytdl.params["outtmpl"] = saved_outtmpl
+            if saved_outtmpl_dict is not None:
+                ytdl.outtmpl_dict = saved_outtmpl_dict
+            ytdl.params["format"], ytdl.format_selector = saved_format
+            ytdl._pps["post_process"] = saved_pps
+
+        return restore
+
+    @staticmethod
+    def __parse_outtmpl(ytdl: "youtube_dl.YoutubeDL") -> None:
+        """Apply `params["outtmpl"]`, the way the installed yt-dlp does it"""
+        if hasattr(ytdl, "_parse_outtmpl"):
+            ytdl._parse_outtmpl()
+        else:
+            ytdl.outtmpl_dict = ytdl.parse_outtmpl()
+
+    def __checkin(self, key: Hashable, ytdl: "youtube_dl.YoutubeDL") -> None:
+        dropped: List["youtube_dl.YoutubeDL"] = []
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            self._idle.move_to_end(key)
+            if len(idle) < self.max_idle:
+                idle.append(ytdl)
+            else:
+                dropped.append(ytdl)
+            while len(self._idle) > self.max_profiles:
+                dropped += self._idle.popitem(last=False)[1]
+        for ytdl in dropped:
+            self.__close(ytdl)
+
+    @staticmethod
+    def __close(ytdl: "youtube_dl.YoutubeDL") -> None:
+        try:
+            # older yt-dlp has no `close()`, only saves cookies on exit
+            ytdl.__exit__(None, None, None)
+        except Exception:
+            logger.exception("Failed to close YoutubeDL instance")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "profiles": len(self._idle),
+                "idle": sum(map(len, self._idle.values())),
+                "created": self.created,
+                "reused": self.reused,
+            }
+
+    def close(self) -> None:
+        """Close all idle instances"""
+        with self._lock:
+            idle, self._idle = self._idle, OrderedDict()
+        for instances in idle.values():
+            for ytdl in instances:
+                self.__close(ytdl)
@@ -0,0 +1,234 @@
+import asyncio
+import sqlite3
+import time
+
+import pytest
+
+from iytdl.sql_cache import VIDEO_COLUMNS, AioSQLiteDB
+
+
+def _video(yt_id: str, title: str = "title"):
+    return {**dict.fromkeys(VIDEO_COLUMNS), "yt_id": yt_id, "title": title}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("memory_cache_size", [0, 16])
+async def test_search_cache(tmp_path, memory_cache_size):
+    cache = AioSQLiteDB(
+        tmp_path.joinpath("cache.db"), memory_cache_size=memory_cache_size
+    )
+    await cache._init()
+    try:
+        await cache.set_key("abcde", [_video("v1"), _video("v2"), _video("v3")])
+        await cache.set_key("fghij", [_video("v2", "shared")])
+
+        total, data = await cache.get_key("abcde", index=1)
+        assert total == 3
+        assert data["yt_id"] == "v2"
+        # video shared by both queries is stored once
+        assert (await cache.stats())["videos"] == 3
+        assert await cache.get_key("abcde", index=3) is None
+        assert await cache.get_key("klmno", index=0) is None
+        assert [x[0] for x in await cache.get_key("abcde")] == ["v1", "v2", "v3"]
+
+        key = await cache.save_url("https://example.com")
+        assert await cache.save_url("https://example.com") == key
+        assert await cache.get_url(key) == "https://example.com"
+        if memory_cache_size:
+            assert cache.memory.hits > 0
+    finally:
+        await cache.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("memory_cache_size", [0, 16])
+async def test_search_continuation(tmp_path, memory_cache_size):
+    cache = AioSQLiteDB(
+        tmp_path.joinpath("cache.db"), memory_cache_size=memory_cache_size
+    )
+    await cache._init()
+    try:
+        await cache.set_key("abcde", [_video("v1")])
+        await cache.set_continuation("abcde", "query", "token")
+        assert await cache.get_continuation("abcde") == ("query", "token")
+
+        await cache.set_key("abcde", [_video("v2"), _video("v3")], start=1, total=3)
+        total, data = await cache.get_key("abcde", index=2)
+        assert total == 3
+        assert data["yt_id"] == "v3"
+
+        await cache.set_continuation("abcde", "query", None)
+        assert await cache.get_continuation("abcde") is None
+        # a new search starts over
+        await cache.set_continuation("abcde", "query", "token")
+        await cache.set_key("abcde", [_video("v1")])
+        assert await cache.get_continuation("abcde") is None
+    finally:
+        await cache.close()
+
+
+@pytest.mark.asyncio
+async def test_raw_results(tmp_path):
+    cache = AioSQLiteDB(tmp_path.joinpath("cache.db"))
+    await cache._init()
+    try:
+        await cache.set_key("abcde", [_video("v1")], total=3)
+        await cache.set_raw_results("abcde", [{"id": "v2"}, {"id": "v3"}], start=1)
+        assert await cache.get_raw_result("abcde", 1) == {"id": "v2"}
+
+        # dropped once formatted
+        await cache.set_key("abcde", [_video("v2")], start=1)
+        assert await cache.get_raw_result("abcde", 1) is None
+        assert await cache.get_raw_result("abcde", 2) == {"id": "v3"}
+        # and by a new search
+        await cache.set_key("abcde", [_video("v1")])
+        assert await cache.get_raw_result("abcde", 2) is None
+    finally:
+        await cache.close()
+
+
+@pytest.mark.asyncio
+async def test_single_writer(tmp_path):
+    cache = AioSQLiteDB(tmp_path.joinpath("cache.db"), readers=2)
+    await cache._init()
+    try:
+        key = await cache.save_url("https://example.com/1")
+        async with cache._writer() as cur:
+            await cur.execute(
+                "UPDATE url_cache SET url = ? WHERE key = ?",
+                ("https://example.com/2", key),
+            )
+            # readers aren't blocked by the open write and don't see it yet
+            urls = await asyncio.wait_for(
+                asyncio.gather(*(cache.get_url(key) for _ in range(4))), 1
+            )
+            assert urls == ["https://example.com/1"] * 4
+        assert await cache.get_url(key) == "https://example.com/2"
+
+        # fails on the second video, after the query and first video are written
+        with pytest.raises(sqlite3.IntegrityError):
+            await cache.set_key("abcde", [_video("v1"), _video(None)])
+        with pytest.raises(RuntimeError):
+            async with cache._writer() as cur:
+                await cur.execute("DELETE FROM url_cache")
+                raise RuntimeError
+        # commits along with the next write
+        await cache.set_key("fghij", [_video("v2")])
+    finally:
+        await cache.close()
+
+    con = sqlite3.connect(tmp_path.joinpath("cache.db"))
+    try:
+        assert con.execute("SELECT key FROM queries").fetchall() == [("fghij",)]
+        assert con.execute("SELECT yt_id FROM videos").fetchall() == [("v2",)]
+        assert con.execute("SELECT COUNT(*) FROM url_cache").fetchone() == (1,)
+    finally:
+        con.close()
+    db_path = tmp_path.joinpath("cache.db")
+    with sqlite3.connect(db_path) as con:
+        con.execute(f"CREATE TABLE abcde ({', '.join(VIDEO_COLUMNS)})")
+        con.executemany(
+            f"INSERT INTO abcde VALUES({', '.join('?' for _ in VIDEO_COLUMNS)})",
+            [tuple(_video(f"v{i}").values()) for i in range(3)],
+        )
+    cache = AioSQLiteDB(db_path)
+    await cache._init()
+    try:
+        total, data = await cache.get_key("abcde", index=2)
+        assert total == 3
+        assert data["yt_id"] == "v2"
+    finally:
+        await cache.close()
+
+
+@pytest.mark.asyncio
+async def test_eviction(tmp_path):
+    cache = AioSQLiteDB(tmp_path.joinpath("cache.db"), max_entries=2)
+    await cache._init()
+    try:
+        for key in ("abcde", "fghij", "klmno"):
+            await cache.set_key(key, [_video(f"{key}_v")])
+        # "abcde" becomes the most recently used
+        assert await cache.get_key("abcde", index=0)
+        await cache.maintain()
+
+        assert await cache.get_key("fghij", index=0) is None
+        assert await cache.get_key("abcde", index=0)
+        stats = await cache.stats()
+        assert stats["queries"] == 2
+        assert stats["videos"] == 2
+        assert stats["evicted_lru"] == 1
+    finally:
+        await cache.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("memory_cache_size", [0, 16])
+async def test_info_cache(tmp_path, memory_cache_size):
+    cache = AioSQLiteDB(
+        tmp_path.joinpath("cache.db"), memory_cache_size=memory_cache_size
+    )
+    await cache._init()
+    try:
+        manifest = {"title": "title", "formats": [{"format_id": "18"}]}
+        await cache.set_info("abcdefghijk", manifest, time.time() + 60)
+        await cache.set_info("https://example.com", manifest, time.time() - 1)
+
+        assert await cache.get_info("abcdefghijk") == manifest
+        # stream URLs have expired
+        assert await cache.get_info("https://example.com") is None
+        await cache.maintain()
+        stats = await cache.stats()
+        assert stats["info_cache"] == 1
+        assert stats["evicted_expired"] == 1
+    finally:
+        await cache.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("memory_cache_size", [0, 16])
+async def test_upload_cache(tmp_path, memory_cache_size):
+    cache = AioSQLiteDB(
+        tmp_path.joinpath("cache.db"),
+        max_age=1,
+        memory_cache_size=memory_cache_size,
+    )
+    await cache._init()
+    try:
+        await cache.set_upload(
+            "0123456789abcdef", "FILE_ID", "video", "📹  title", "url", "18"
+        )
+        time.sleep(1.1)
+        await cache.maintain()
+        # file ids outlive `max_age`
+        upload = await cache.get_upload("0123456789abcdef")
+        assert upload["file_id"] == "FILE_ID"
+        assert upload["media_type"] == "video"
+        assert upload["uid"] == "18"
+
+        await cache.delete_upload("0123456789abcdef")
+        assert await cache.get_upload("0123456789abcdef") is None
+    finally:
+        await cache.close()
+
+
+@pytest.mark.asyncio
+async def test_job_journal(tmp_path):
+    cache = AioSQLiteDB(tmp_path.joinpath("cache.db"))
+    await cache._init()
+    try:
+        job = {"url": "url", "uid": "18", "downtype": "video"}
+        await cache.set_job("-100.1", "download", job)
+        await cache.retry_job("-100.1")
+        await cache.set_job("-100.1", "upload", {**job, "key": "0123456789abcdef"})
+        await cache.set_job("-100.2", "download", job)
+
+        jobs = await cache.get_jobs()
+        assert [job_id for job_id, *_ in jobs] == ["-100.1", "-100.2"]
+        # attempts are kept when a job moves on to the next stage
+        assert jobs[0][1:] == ("upload", {**job, "key": "0123456789abcdef"}, 1)
+
+        await cache.delete_job("-100.1")
+        assert len(await cache.get_jobs()) == 1
+    finally:
+        await cache.close()
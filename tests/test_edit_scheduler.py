@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+from pyrogram.errors import FloodWait
+
+from iytdl.edit_scheduler import EditScheduler
+
+
+class FakeProcess:
+    def __init__(self, process_id, flood_waits=0):
+        self.id = process_id
+        self.edits = []
+        self.flood_waits = flood_waits
+
+    async def edit(self, text, **kwargs):
+        if self.flood_waits:
+            self.flood_waits -= 1
+            raise FloodWait(x=0)
+        self.edits.append(text)
+
+
+@pytest.mark.asyncio
+async def test_merge_and_skip():
+    edits = EditScheduler(rate=100, chat_rate=100, chat_burst=1)
+    process = FakeProcess("-100.1")
+    for i in range(10):
+        edits.submit(process, f"progress {i}")
+    await asyncio.sleep(0.05)
+    edits.submit(process, "progress 9")
+    await asyncio.sleep(0.05)
+    edits.close()
+
+    # merged into the latest, which isn't sent again
+    assert process.edits == ["progress 9"]
+    stats = edits.stats()
+    assert stats["merged"] == 9
+    assert stats["skipped"] == 1
+
+
+@pytest.mark.asyncio
+async def test_chat_rate_and_flood_wait():
+    edits = EditScheduler(rate=100, chat_rate=10, chat_burst=1)
+    chat = [FakeProcess(f"-100.{i}") for i in range(3)]
+    other = FakeProcess("-200.1", flood_waits=1)
+    for process in (*chat, other):
+        edits.submit(process, "text")
+    await asyncio.sleep(0.05)
+    # one edit per 0.1 seconds in the first chat, the other chat isn't held up
+    assert sum(len(process.edits) for process in chat) == 1
+    await asyncio.sleep(0.3)
+    edits.close()
+
+    assert all(process.edits == ["text"] for process in chat)
+    # retried after the flood wait
+    assert other.edits == ["text"]
+    assert edits.stats()["flood_waits"] == 1
+
+
+class SlowProcess(FakeProcess):
+    async def edit(self, text, **kwargs):
+        await asyncio.sleep(0.05)
+        await super().edit(text, **kwargs)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("flood_waits", [0, 1])
+async def test_discard_in_flight(flood_waits):
+    edits = EditScheduler(rate=100, chat_rate=100, chat_burst=1)
+    process = SlowProcess("-100.1", flood_waits=flood_waits)
+    edits.submit(process, "progress")
+    await asyncio.sleep(0.01)
+    # the edit is being sent, discard waits for it
+    await edits.discard(process.id)
+    sent = list(process.edits)
+    await asyncio.sleep(0.2)
+    edits.close()
+
+    # nothing is edited after discard, a flood waited edit isn't retried
+    assert process.edits == sent
+    assert sent == ([] if flood_waits else ["progress"])
@@ -0,0 +1,134 @@
+import asyncio
+import os
+import threading
+import time
+
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from yt_dlp.utils import DownloadError
+
+from iytdl.executors import ProcessStageExecutor, StageExecutor, run_in_executor
+from iytdl.extractors import extract_manifest, warm_extract_worker
+
+
+class Stages:
+    def __init__(self, bulk_workers):
+        self.executors = {
+            "interactive": StageExecutor("interactive", 2),
+            "bulk": StageExecutor("bulk", bulk_workers),
+        }
+        self.release = threading.Event()
+
+    @run_in_executor("bulk")
+    def download(self):
+        self.release.wait(5)
+        return threading.current_thread().name
+
+    @run_in_executor("interactive")
+    def extract(self):
+        return threading.current_thread().name
+
+    def shutdown(self):
+        self.release.set()
+        for executor in self.executors.values():
+            executor.shutdown(wait=True)
+
+
+@pytest.mark.asyncio
+async def test_saturated_bulk_stage():
+    stages = Stages(bulk_workers=1)
+    try:
+        downloads = [asyncio.ensure_future(stages.download()) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        # the bulk pool is busy, interactive work doesn't wait for it
+        thread = await asyncio.wait_for(stages.extract(), 1)
+        assert thread.startswith("iytdl_interactive")
+        stats = stages.executors["bulk"].stats()
+        assert (stats["running"], stats["queued"], stats["completed"]) == (1, 2, 0)
+        assert stages.executors["interactive"].stats()["completed"] == 1
+
+        stages.release.set()
+        threads = await asyncio.gather(*downloads)
+        assert all(thread.startswith("iytdl_bulk") for thread in threads)
+        stats = stages.executors["bulk"].stats()
+        assert (stats["running"], stats["queued"], stats["completed"]) == (0, 0, 3)
+        # the last one waited for the first two
+        assert stats["max_wait"] >= 0.05
+    finally:
+        stages.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_cancel_queued():
+    stages = Stages(bulk_workers=1)
+    try:
+        running = asyncio.ensure_future(stages.download())
+        queued = asyncio.ensure_future(stages.download())
+        await asyncio.sleep(0.05)
+        queued.cancel()
+        await asyncio.sleep(0.05)
+        stats = stages.executors["bulk"].stats()
+        # never started
+        assert (stats["running"], stats["queued"]) == (1, 0)
+        stages.release.set()
+        await running
+    finally:
+        stages.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_without_executors():
+    stages = Stages(bulk_workers=1)
+    stages.shutdown()
+    # like `run_sync`, e.g for classes without stage pools
+    stages.executors = {}
+    assert not (await stages.extract()).startswith("iytdl_")
+
+
+async def _wait_for(condition, timeout=30):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        await asyncio.sleep(0.05)
+
+
+@pytest.mark.asyncio
+async def test_process_pool():
+    params = {"quiet": True}
+    executor = ProcessStageExecutor(
+        "extraction", 1, initializer=warm_extract_worker, initargs=(params,)
+    )
+    try:
+        await executor.warm_up()
+        assert await executor.run(os.getpid) != os.getpid()
+
+        jobs = [asyncio.ensure_future(executor.run(time.sleep, 0.5)) for _ in range(2)]
+        await _wait_for(lambda: executor.stats()["running"] == 1)
+        assert executor.stats()["queued"] == 1
+        await asyncio.gather(*jobs)
+        stats = executor.stats()
+        assert (stats["running"], stats["queued"], stats["completed"]) == (0, 0, 4)
+
+        with pytest.raises(DownloadError) as error:
+            await executor.run(extract_manifest, "notaurl", params)
+        # raised again with the traceback in the worker
+        assert "not a valid URL" in str(error.value)
+        remote = str(error.value.__cause__)
+        assert "Traceback" in remote and "extract_manifest" in remote
+    finally:
+        executor.shutdown(wait=True)
+
+
+@pytest.mark.asyncio
+async def test_failed_initializer():
+    executor = ProcessStageExecutor(
+        "extraction", 1, initializer=os.chdir, initargs=("/nonexistent",)
+    )
+    try:
+        with pytest.raises(BrokenProcessPool):
+            await executor.run(os.getpid)
+        assert executor.stats()["queued"] == 0
+    finally:
+        executor.shutdown(wait=True)
@@ -0,0 +1,66 @@
+import pytest
+
+from iytdl.extractors import Extractor, build_manifest
+from iytdl.sql_cache import AioSQLiteDB
+
+
+INFO = {
+    "title": "Title",
+    "formats": [
+        # muxed, without "abr"
+        {"format_id": "18", "ext": "mp4", "format_note": "360p", "acodec": "mp4a"},
+        {
+            "format_id": "140",
+            "ext": "m4a",
+            "format_note": "medium",
+            "acodec": "mp4a",
+            "vcodec": "none",
+            "abr": 129.5,
+            "filesize": 3 * 1024 * 1024,
+        },
+        {
+            "format_id": "137",
+            "ext": "mp4",
+            "format_note": "1080p",
+            "acodec": "none",
+            "width": 1920,
+            "height": 1080,
+        },
+    ],
+}
+
+
+@pytest.mark.asyncio
+async def test_buttons_from_manifest(tmp_path):
+    manifest = build_manifest(INFO)
+    # missing fields are left out
+    assert "thumbnail" not in manifest
+    assert manifest["formats"][0] == {
+        "format_id": "18",
+        "ext": "mp4",
+        "format_note": "360p",
+        "acodec": "mp4a",
+    }
+
+    extractor = Extractor()
+    extractor.default_thumb = "default.png"
+    extractor.cache = AioSQLiteDB(tmp_path.joinpath("cache.db"))
+    await extractor.cache._init()
+    try:
+        for key in ("dQw4w9WgXcQ", "https://example.com"):
+            await extractor.cache.set_info(key, manifest, manifest["expires_at"])
+
+        result = await extractor.get_download_button("dQw4w9WgXcQ")
+        callbacks = [
+            button.callback_data
+            for row in result.buttons.inline_keyboard
+            for button in row
+        ]
+        assert "yt_dl|dQw4w9WgXcQ|137|v" in callbacks
+        assert "yt_dl|dQw4w9WgXcQ|18|v" in callbacks
+        assert "yt_dl|dQw4w9WgXcQ|129|a" in callbacks
+
+        result = await extractor.generic_extractor("abcde", "https://example.com")
+        assert result.image_url == "default.png"
+    finally:
+        await extractor.cache.close()
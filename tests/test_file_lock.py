@@ -0,0 +1,110 @@
+import errno
+import importlib
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from iytdl.file_lock import FileLock
+
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+def test_exclusive(tmp_path):
+    path = tmp_path.joinpath("key.lock")
+    first, second = FileLock(path), FileLock(path)
+    assert first.acquire()
+    assert not second.acquire()
+    first.release()
+    assert not path.exists()
+    assert second.acquire()
+    second.release()
+
+
+def test_dead_owner(tmp_path):
+    path = tmp_path.joinpath("key.lock")
+    # exits without releasing, as a crashed process would
+    subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys; from iytdl.file_lock import FileLock;"
+            f"sys.exit(0 if FileLock({str(path)!r}).acquire() else 1)",
+        ],
+        check=True,
+        env={"PYTHONPATH": os.pathsep.join(sys.path)},
+    )
+    assert path.exists()
+    lock = FileLock(path)
+    assert lock.acquire()
+    lock.release()
+
+
+def test_no_two_owners(tmp_path):
+    path = tmp_path.joinpath("key.lock")
+    owners = []
+    overlaps = []
+
+    def worker():
+        lock = FileLock(path)
+        for _ in range(200):
+            if not lock.acquire():
+                continue
+            owners.append(lock)
+            if len(owners) > 1:
+                overlaps.append(len(owners))
+            time.sleep(0.0001)
+            owners.remove(lock)
+            lock.release()
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not overlaps
+
+
+class FakeMsvcrt:
+    """`msvcrt.locking()` backed by `flock()`, which also locks per open file"""
+
+    LK_NBLCK = 2
+    LK_UNLCK = 0
+
+    @staticmethod
+    def locking(fd, mode, nbytes):
+        assert nbytes == 1
+        if mode == FakeMsvcrt.LK_UNLCK:
+            assert os.lseek(fd, 0, os.SEEK_CUR) == 0
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            return
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise OSError(errno.EACCES, "Permission denied")
+
+
+@pytest.mark.skipif(fcntl is None, reason="fake msvcrt uses flock")
+def test_windows_fallback(tmp_path, monkeypatch):
+    monkeypatch.setitem(sys.modules, "fcntl", None)
+    monkeypatch.setitem(sys.modules, "msvcrt", FakeMsvcrt)
+    monkeypatch.delitem(sys.modules, "iytdl.file_lock")
+    windows_lock = importlib.import_module("iytdl.file_lock")
+    monkeypatch.undo()
+    assert windows_lock.fcntl is None
+
+    path = tmp_path.joinpath("key.lock")
+    first, second = windows_lock.FileLock(path), windows_lock.FileLock(path)
+    assert first.acquire()
+    assert not second.acquire()
+    first.release()
+    assert not path.exists()
+    assert second.acquire()
+    second.release()
@@ -0,0 +1,96 @@
+import pytest
+
+import iytdl.main
+
+from iytdl.formatter import ResultFormatter
+from iytdl.main import iYTDL
+
+
+def _raw(yt_id):
+    return {"id": yt_id, "title": yt_id, "channel": {"name": "chnl", "id": "c1"}}
+
+
+async def _iytdl(tmp_path, monkeypatch, failing, **kwargs):
+    """iYTDL failing to format the results in `failing` once"""
+    ytdl = iYTDL(log_group_id=1, cache_path=tmp_path.joinpath("cache"), **kwargs)
+    await ytdl.cache._init()
+
+    async def get_ytthumb(yt_id):
+        return f"https://i.ytimg.com/vi/{yt_id}/0.jpg"
+
+    ytdl.get_ytthumb = get_ytthumb
+    parse = ResultFormatter.parse
+
+    async def flaky_parse(yt_class, raw_result):
+        if raw_result["id"] in failing:
+            failing.remove(raw_result["id"])
+            raise ConnectionError
+        return await parse(yt_class, raw_result)
+
+    monkeypatch.setattr(ResultFormatter, "parse", flaky_parse)
+    return ytdl
+
+
+@pytest.mark.asyncio
+async def test_format_on_demand(tmp_path, monkeypatch):
+    ytdl = await _iytdl(tmp_path, monkeypatch, {"v2"})
+    try:
+        # as saved by a fast search
+        first = await ResultFormatter.parse(ytdl, _raw("v1"))
+        await ytdl.cache.set_key("abcde", [first], total=3)
+        await ytdl.cache.set_raw_results("abcde", [_raw("v2"), _raw("v3")], start=1)
+        for task in ytdl._hydrate("abcde", [_raw("v2")], start=1):
+            await task
+        # failed, formatted again when asked for
+        assert await ytdl.cache.get_key("abcde", index=1) is None
+        result = await ytdl.next_result("abcde", 2)
+        assert "v2" in result.caption
+
+        # never formatted, e.g after a restart
+        result = await ytdl.next_result("abcde", 3)
+        assert "v3" in result.caption
+        assert await ytdl.cache.get_raw_result("abcde", 2) is None
+    finally:
+        await ytdl.stop()
+
+
+class FakeVideosSearch:
+    results = [_raw("v2"), _raw("v3")]
+
+    def __init__(self, query):
+        self.continuationKey = None
+
+    async def next(self):
+        return {"result": self.results}
+
+
+@pytest.mark.asyncio
+async def test_next_page_format_error(tmp_path, monkeypatch):
+    monkeypatch.setattr(iytdl.main, "_videos_search", FakeVideosSearch)
+    ytdl = await _iytdl(tmp_path, monkeypatch, {"v3"})
+    try:
+        first = await ResultFormatter.parse(ytdl, _raw("v1"))
+        await ytdl.cache.set_key("abcde", [first])
+        await ytdl.cache.set_continuation("abcde", "query", "token")
+        await ytdl._fetch_more("abcde")
+        # the page is loaded once, its results are formatted when asked for
+        assert await ytdl.cache.get_continuation("abcde") is None
+        result = await ytdl.next_result("abcde", 3)
+        assert "v3" in result.caption
+        assert "3 / 3" in str(result.buttons)
+    finally:
+        await ytdl.stop()
+
+
+@pytest.mark.asyncio
+async def test_single_result(tmp_path, monkeypatch):
+    monkeypatch.setattr(iytdl.main, "_videos_search", FakeVideosSearch)
+    monkeypatch.setattr(FakeVideosSearch, "results", [_raw("v1")])
+    ytdl = await _iytdl(tmp_path, monkeypatch, set(), fast_search=True)
+    try:
+        result = await ytdl.search("query")
+        assert "v1" in result.caption
+        # nothing left to format
+        assert not ytdl._hydrating
+    finally:
+        await ytdl.stop()
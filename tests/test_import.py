@@ -0,0 +1,43 @@
+import os
+import subprocess
+import sys
+
+from typing import List, Sequence
+
+
+# Only loaded once they are needed
+LAZY_MODULES = (
+    "aiohttp",
+    "hachoir",
+    "html_telegraph_poster",
+    "mutagen",
+    "PIL",
+    "youtubesearchpython",
+    "yt_dlp",
+)
+
+
+def _loaded(code: str, modules: Sequence[str]) -> List[str]:
+    """Which of `modules` are imported after running `code` in a new interpreter"""
+    out = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            f"{code}\nimport sys\n"
+            f"print('LOADED', *(m for m in {tuple(modules)!r} if m in sys.modules))",
+        ],
+        env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)},
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    loaded = [line for line in out.splitlines() if line.startswith("LOADED")][-1]
+    return loaded.split()[1:]
+
+
+def test_import_iytdl():
+    assert _loaded("import iytdl", ("iytdl.main", "pyrogram", *LAZY_MODULES)) == []
+
+
+def test_lazy_dependencies():
+    assert _loaded("from iytdl import iYTDL", LAZY_MODULES) == []
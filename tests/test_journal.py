@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+from pyrogram.types import Chat, Message
+
+from iytdl.main import iYTDL
+
+
+URL = "https://example.com/video"
+
+
+class FakeClient:
+    def __init__(self):
+        self.connected = False
+
+    async def get_messages(self, chat_id, message_id):
+        if not self.connected:
+            raise ConnectionError("Client has not been started yet")
+        return Message(message_id=message_id, chat=Chat(id=chat_id, type="supergroup"))
+
+
+async def _iytdl(tmp_path, client, downloaded):
+    ytdl = iYTDL(
+        log_group_id=1,
+        download_path=tmp_path.joinpath("downloads"),
+        cache_path=tmp_path.joinpath("cache"),
+        client=client,
+    )
+    await ytdl.cache._init()
+
+    async def video_downloader(url, uid, key, hook):
+        downloaded.append(key)
+        folder = ytdl.download_path.joinpath(key)
+        folder.mkdir()
+        folder.joinpath("video.mp4").write_bytes(b"video")
+        return 0
+
+    async def upload(*args, **kwargs):
+        raise AssertionError("not asked to upload")
+
+    ytdl.video_downloader = video_downloader
+    ytdl.upload = upload
+    return ytdl
+
+
+@pytest.mark.asyncio
+async def test_download_record(tmp_path):
+    client = FakeClient()
+    client.connected = True
+    ytdl = await _iytdl(tmp_path, client, [])
+    try:
+        update = await client.get_messages(-100, 1)
+        await ytdl.download(URL, "18", "video", update, with_progress=False)
+        # done, nothing left to resume
+        assert await ytdl.cache.get_jobs() == []
+    finally:
+        await ytdl.stop()
+
+
+@pytest.mark.asyncio
+async def test_resume_after_restore_failure(tmp_path):
+    client = FakeClient()
+    downloaded = []
+    ytdl = await _iytdl(tmp_path, client, downloaded)
+    try:
+        job = {
+            "url": URL,
+            "uid": "18",
+            "downtype": "video",
+            "with_progress": False,
+            "cb_extra": None,
+            "priority": "normal",
+            "upload": False,
+            "target": {"chat_id": -100, "message_id": 1},
+        }
+        await ytdl.cache.set_job("-100.1", "download", job)
+
+        await ytdl.resume_jobs()
+        await asyncio.gather(*ytdl._resumed.values())
+        # kept, as the client isn't started
+        assert [job_id for job_id, *_ in await ytdl.cache.get_jobs()] == ["-100.1"]
+        assert not downloaded
+
+        client.connected = True
+        await ytdl.resume_jobs()
+        await asyncio.gather(*ytdl._resumed.values())
+        # downloaded, but not uploaded without `resume_upload`
+        assert downloaded == [ytdl.media_key(URL, "18", "video")]
+        assert await ytdl.cache.get_jobs() == []
+        assert not ytdl._media_refs
+    finally:
+        await ytdl.stop()
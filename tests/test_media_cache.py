@@ -0,0 +1,51 @@
+import os
+
+import pytest
+
+from iytdl.constants import DOWNLOAD_COMPLETE_MARKER
+from iytdl.exceptions import InsufficientSpaceError
+from iytdl.media_cache import MediaCache
+
+
+def _media(path, key, size, last_used):
+    folder = path.joinpath(key)
+    folder.mkdir()
+    folder.joinpath("media.mp4").write_bytes(b"x" * size)
+    marker = folder.joinpath(DOWNLOAD_COMPLETE_MARKER)
+    marker.write_text("{}")
+    os.utime(marker, (last_used, last_used))
+
+
+def test_lru_eviction(tmp_path):
+    cache = MediaCache(tmp_path, quota=1000, high_watermark=0.9, low_watermark=0.5)
+    for i, key in enumerate(("a", "b", "c", "d")):
+        _media(tmp_path, key, 200, 1000 + i)
+    # not completed
+    tmp_path.joinpath("e").mkdir()
+
+    cache.make_room()
+    assert cache.stats()["entries"] == 4
+
+    _media(tmp_path, "f", 200, 2000)
+    cache.touch("a")
+    cache.make_room(in_use=["b"])
+    # down to the low watermark, least recently used first, skipping media in use
+    assert sorted(key for _, key, _ in cache.entries()) == ["a", "b"]
+    assert not tmp_path.joinpath("f").exists()
+    assert tmp_path.joinpath("e").exists()
+
+
+def test_free_space_guard(tmp_path):
+    min_free = MediaCache(tmp_path).free_space() * 2
+    cache = MediaCache(tmp_path, min_free=min_free)
+    _media(tmp_path, "a", 10, 1000)
+    with pytest.raises(InsufficientSpaceError):
+        cache.make_room()
+    # no quota, kept downloads are never deleted
+    assert [key for _, key, _ in cache.entries()] == ["a"]
+
+    cache = MediaCache(tmp_path, quota=10_000, min_free=min_free)
+    with pytest.raises(InsufficientSpaceError):
+        cache.make_room()
+    # evicted before giving up
+    assert not cache.entries()
@@ -0,0 +1,87 @@
+import os
+
+from io import BytesIO
+
+import pytest
+
+from PIL import Image
+
+from iytdl.constants import THUMBNAIL_CACHE
+from iytdl.media_info import read_media_info
+from iytdl.postprocessors import MediaInfoPP
+from iytdl.upload_lib.functions import normalize_thumb
+from iytdl.upload_lib.uploader import Uploader
+from iytdl.ydl_pool import YoutubeDLPool
+
+
+@pytest.mark.asyncio
+async def test_recorded_metadata(tmp_path):
+    folder = tmp_path.joinpath("key")
+    folder.mkdir()
+    media = folder.joinpath("it's-18.mp4")
+    media.write_bytes(b"not parsed")
+    # left over, not the final media
+    folder.joinpath("it's-18.f18.mp4").write_bytes(b"part")
+    thumb = folder.joinpath("it's-18.png")
+    Image.new("RGB", (32, 18)).save(thumb)
+    info = {
+        "filepath": str(media),
+        "thumbnails": [{"url": "a"}, {"url": "b", "filepath": str(thumb)}],
+        "duration": 212.4,
+        "width": 640,
+        "height": 360,
+        "uploader": "Uploader",
+        "title": "Title",
+    }
+    assert MediaInfoPP().run(info) == ([], info)
+    assert read_media_info(folder) == {
+        "file": "it's-18.mp4",
+        "thumbnail": "it's-18.png",
+        "duration": 212,
+        "width": 640,
+        "height": 360,
+        "performer": "Uploader",
+        "title": "Title",
+    }
+
+    uploader = Uploader()
+    uploader.download_path = tmp_path
+    found = await uploader.find_media("key", "video")
+    # not renamed
+    assert found.pop("thumb").startswith(str(tmp_path.joinpath(THUMBNAIL_CACHE)))
+    assert found == {
+        "video": str(media),
+        "file_name": "it's-18.mp4",
+        "duration": 212,
+        "width": 640,
+        "height": 360,
+    }
+
+
+def test_normalize_thumb(tmp_path):
+    source = BytesIO()
+    Image.effect_noise((1920, 1080), 100).convert("RGB").save(source, "JPEG")
+    cache = tmp_path.joinpath("thumbs")
+
+    path, size = normalize_thumb(source.getvalue(), cache)
+    # dimensions of the source, not the thumbnail
+    assert size == (1920, 1080)
+    with Image.open(path) as thumb:
+        assert thumb.size == (320, 180)
+    assert os.path.getsize(path) <= 200 * 1024
+    # same source, processed once
+    os.utime(path, (0, 0))
+    assert normalize_thumb(source.getvalue(), cache) == (path, size)
+    assert os.path.getmtime(path) > 0
+    assert len(os.listdir(cache)) == 1
+
+
+def test_pool_post_processors():
+    pool = YoutubeDLPool()
+    params = {"quiet": True}
+    with pool.checkout(params, post_processors=[MediaInfoPP()]) as ytdl:
+        assert isinstance(ytdl._pps["post_process"][-1], MediaInfoPP)
+    with pool.checkout(params) as reused:
+        assert reused is ytdl
+        assert not any(isinstance(pp, MediaInfoPP) for pp in ytdl._pps["post_process"])
+    pool.close()
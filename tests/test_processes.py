@@ -0,0 +1,30 @@
+import gc
+
+from iytdl.processes import Process, ProcessRegistry
+
+
+class FakeProcess:
+    def __init__(self, registry, process_id):
+        self.id = process_id
+        self.job = registry.job(process_id)
+
+
+def test_registry_lifecycle():
+    registry = ProcessRegistry()
+    process = FakeProcess(registry, "-100.1")
+    # same job for every process of a message
+    assert FakeProcess(registry, "-100.1").job is process.job
+    assert registry.stats() == {"created": 1, "running": 0, "done": 0}
+
+    with registry.running(process):
+        assert registry.stats()["running"] == 1
+        Process.cancel_id("-100.1")
+        assert process.job.cancelled.is_set()
+    assert registry.stats()["done"] == 1
+    # nothing left to cancel
+    assert not registry.cancel("-100.1")
+
+    del process
+    gc.collect()
+    assert registry.stats() == {"created": 0, "running": 0, "done": 0}
+    assert not registry.cancel("-100.1")
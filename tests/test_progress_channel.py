@@ -0,0 +1,42 @@
+import asyncio
+import threading
+
+import pytest
+
+from iytdl.progress_channel import ProgressChannel
+
+
+@pytest.mark.asyncio
+async def test_latest_snapshot_only():
+    channel = ProgressChannel()
+    assert channel.take() is None
+    # written from another thread, as yt-dlp progress hooks are
+    writer = threading.Thread(
+        target=lambda: [channel.put({"downloaded_bytes": i}) for i in range(1000)]
+    )
+    writer.start()
+    writer.join()
+    assert channel.take() == {"downloaded_bytes": 999}
+    assert channel.take() is None
+
+
+@pytest.mark.asyncio
+async def test_consume():
+    channel = ProgressChannel()
+    seen = []
+
+    async def callback(snapshot):
+        seen.append(snapshot["n"])
+
+    consumer = asyncio.create_task(channel.consume(callback, 0.05))
+    for n in range(5):
+        channel.put({"n": n})
+    await asyncio.sleep(0.08)
+    # skipped to the latest, at most once per interval
+    assert seen == [4]
+    assert channel.take() is None
+    channel.put({"n": 5})
+    channel.close()
+    # the last snapshot is passed on before it stops
+    await asyncio.wait_for(consumer, 1)
+    assert seen == [4, 5]
@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+
+from iytdl.scheduler import JobScheduler
+
+
+@pytest.mark.asyncio
+async def test_fair_order():
+    scheduler = JobScheduler({"download": 1}, report_interval=0.01)
+    started = []
+    positions = {}
+
+    async def job(name, user, priority="normal"):
+        async def on_wait(position):
+            positions.setdefault(name, []).append(position)
+
+        async with scheduler.slot("download", user, priority, on_wait=on_wait):
+            started.append(name)
+            await asyncio.sleep(0.01)
+
+    tasks = [asyncio.create_task(job("a1", "a"))]
+    await asyncio.sleep(0)
+    for name, user in (("a2", "a"), ("a3", "a"), ("b1", "b"), ("c1", "c")):
+        tasks.append(asyncio.create_task(job(name, user)))
+    tasks.append(asyncio.create_task(job("b2", "b", "high")))
+    await asyncio.sleep(0)
+    assert scheduler.stats()["download"] == {"limit": 1, "running": 1, "queued": 5}
+    await asyncio.gather(*tasks)
+
+    # high priority first, then users take turns
+    assert started == ["a1", "b2", "a2", "b1", "c1", "a3"]
+    # queued behind a2, then other users' jobs go ahead
+    assert positions["a3"][0] == 2
+    assert positions["a3"][-1] == 1
+    assert scheduler.stats()["download"]["running"] == 0
+
+
+@pytest.mark.asyncio
+async def test_leave_queue():
+    scheduler = JobScheduler({"upload": 1, "download": None})
+
+    async def cancel(position):
+        raise RuntimeError(position)
+
+    async with scheduler.slot("upload"):
+        with pytest.raises(RuntimeError):
+            async with scheduler.slot("upload", on_wait=cancel):
+                pass
+        assert not scheduler.queued("upload")
+    # no limit
+    async with scheduler.slot("download"), scheduler.slot("download"):
+        assert "download" not in scheduler.stats()
+    assert scheduler.stats()["upload"]["running"] == 0
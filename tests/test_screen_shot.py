@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+from iytdl.upload_lib.functions import take_screen_shot
+
+
+class FakeProcess:
+    def __init__(self, stdout, returncode):
+        self.stdout = stdout
+        self.returncode = returncode
+
+    async def communicate(self):
+        return self.stdout.encode(), b""
+
+
+def _fake_exec(monkeypatch, output, returncode=0):
+    """Record commands, ffmpeg writes `output` to its last argument"""
+    commands = []
+
+    async def create_subprocess_exec(*args, **kwargs):
+        commands.append(list(args))
+        if "ffprobe" in args[0]:
+            return FakeProcess("212.4", 0)
+        if output is not None:
+            with open(args[-1], "wb") as f:
+                f.write(output)
+        return FakeProcess("", returncode)
+
+    monkeypatch.setattr(asyncio, "create_subprocess_exec", create_subprocess_exec)
+    return commands
+
+
+@pytest.mark.asyncio
+async def test_screen_shot_command(tmp_path, monkeypatch):
+    commands = _fake_exec(monkeypatch, b"jpeg")
+    video = tmp_path.joinpath("it's 18.mp4")
+
+    thumb = await take_screen_shot(str(video), ffmpeg="/opt/ffmpeg")
+    assert thumb == str(tmp_path.joinpath("it's 18.jpg"))
+    # half of the ffprobe duration, file names passed as is without a shell
+    probe, ffmpeg = commands
+    assert probe[:3] == ["ffprobe", "-i", str(video)]
+    tmp = ffmpeg.pop()
+    assert ffmpeg == [
+        "/opt/ffmpeg",
+        "-hide_banner",
+        "-loglevel",
+        "error",
+        "-skip_frame",
+        "nokey",
+        "-ss",
+        "106",
+        "-i",
+        str(video),
+        "-frames:v",
+        "1",
+        "-vf",
+        "scale='min(320,iw)':'min(320,ih)':force_original_aspect_ratio=decrease",
+        "-q:v",
+        "4",
+        "-y",
+    ]
+    assert tmp != thumb and tmp.endswith(".jpg")
+    assert [p.name for p in tmp_path.iterdir()] == ["it's 18.jpg"]
+
+    commands.clear()
+    output = tmp_path.joinpath("thumb.jpg")
+    assert await take_screen_shot(str(video), ttl=5, output=output) == str(output)
+    # no ffprobe with a timestamp
+    assert len(commands) == 1 and commands[0][7] == "5"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "output, returncode", [(b"partial", 1), (b"", 0), (None, 0), (None, 1)]
+)
+async def test_failed_screen_shot(tmp_path, monkeypatch, output, returncode):
+    _fake_exec(monkeypatch, output, returncode)
+    video = tmp_path.joinpath("video.mp4")
+    assert await take_screen_shot(str(video), ttl=5) is None
+    # nothing left behind
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+
+from pyrogram import StopTransmission
+from pyrogram.types import Chat, Message
+
+from iytdl.main import iYTDL
+
+
+URL = "https://example.com/video"
+
+
+async def _iytdl(tmp_path, downloaded, **kwargs):
+    ytdl = iYTDL(
+        log_group_id=1,
+        download_path=tmp_path.joinpath("downloads"),
+        cache_path=tmp_path.joinpath("cache"),
+        **kwargs,
+    )
+    await ytdl.cache._init()
+
+    async def video_downloader(url, uid, key, hook):
+        downloaded.append(key)
+        try:
+            for _ in range(40):
+                hook({"status": "downloading"})
+                await asyncio.sleep(0.05)
+        except StopTransmission:
+            return "stopped"
+        folder = ytdl.download_path.joinpath(key)
+        folder.mkdir()
+        folder.joinpath("video.mp4").write_bytes(b"video")
+        return 0
+
+    ytdl.video_downloader = video_downloader
+    return ytdl
+
+
+def _update(message_id):
+    return Message(message_id=message_id, chat=Chat(id=-100, type="supergroup"))
+
+
+async def _download(ytdl, message_id):
+    return await ytdl.download(
+        URL, "18", "video", _update(message_id), with_progress=False
+    )
+
+
+@pytest.mark.asyncio
+async def test_cancel_detaches_caller(tmp_path):
+    downloaded = []
+    ytdl = await _iytdl(tmp_path, downloaded)
+    try:
+        first = asyncio.create_task(_download(ytdl, 1))
+        await asyncio.sleep(0.2)
+        second = asyncio.create_task(_download(ytdl, 2))
+        await asyncio.sleep(0.2)
+        # the first caller leaves, the download goes on for the second one
+        assert ytdl.processes.cancel("-100.1")
+        with pytest.raises(StopTransmission):
+            await first
+        assert await second == ytdl.media_key(URL, "18", "video")
+        assert len(downloaded) == 1
+        assert not ytdl._download_callers
+    finally:
+        await ytdl.stop()
+
+
+@pytest.mark.asyncio
+async def test_cancel_by_every_caller(tmp_path):
+    downloaded = []
+    ytdl = await _iytdl(tmp_path, downloaded)
+    try:
+        callers = [asyncio.create_task(_download(ytdl, i)) for i in (1, 2)]
+        await asyncio.sleep(0.2)
+        assert ytdl.processes.cancel("-100.2")
+        await asyncio.sleep(0.2)
+        # still needed by the first caller
+        assert not callers[0].done()
+        assert ytdl.processes.cancel("-100.1")
+        for caller in callers:
+            with pytest.raises(StopTransmission):
+                await caller
+        # stopped, so it isn't marked as complete
+        await asyncio.sleep(0.2)
+        assert ytdl._media_source(ytdl.media_key(URL, "18", "video")) is None
+        assert len(downloaded) == 1
+    finally:
+        await ytdl.stop()
+
+
+@pytest.mark.asyncio
+async def test_media_kept_for_every_caller(tmp_path):
+    downloaded = []
+    ytdl = await _iytdl(tmp_path, downloaded, delete_media=True)
+    folder = ytdl.download_path.joinpath(ytdl.media_key(URL, "18", "video"))
+    kept = []
+
+    async def download_and_release(message_id):
+        key = await _download(ytdl, message_id)
+        # as `upload()` does once it is done
+        ytdl._release_media(key)
+        kept.append(folder.is_dir())
+
+    try:
+        await asyncio.gather(*(download_and_release(i) for i in (1, 2)))
+        # deleted after the last caller only
+        assert kept == [True, False]
+        assert len(downloaded) == 1
+        assert not ytdl._media_refs
+    finally:
+        await ytdl.stop()
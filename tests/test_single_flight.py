@@ -0,0 +1,103 @@
+import asyncio
+
+import pytest
+
+import iytdl.main
+
+from iytdl.main import iYTDL
+from iytdl.single_flight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_join_in_flight_call():
+    flights = SingleFlight()
+    calls = []
+
+    async def fetch(key):
+        calls.append(key)
+        await asyncio.sleep(0.05)
+        return {"key": key, "items": [1, 2]}
+
+    first, second = await asyncio.gather(
+        flights.run("a", fetch, "a"), flights.run("a", fetch, "a")
+    )
+    assert calls == ["a"]
+    assert flights.stats() == {"calls": 2, "coalesced": 1, "in_flight": 0}
+    # each caller gets its own copy
+    assert first == second
+    first["items"].append(3)
+    assert second["items"] == [1, 2]
+
+    # not coalesced once done
+    await flights.run("a", fetch, "a")
+    assert calls == ["a", "a"]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller():
+    flights = SingleFlight()
+    started = asyncio.Event()
+
+    async def fetch():
+        started.set()
+        await asyncio.sleep(0.05)
+        return "done"
+
+    first = asyncio.create_task(flights.run("a", fetch))
+    await started.wait()
+    second = asyncio.create_task(flights.run("a", fetch))
+    await asyncio.sleep(0)
+    first.cancel()
+    # the shared call goes on for the other caller
+    assert await second == "done"
+    assert first.cancelled()
+
+
+@pytest.mark.asyncio
+async def test_failed_call():
+    flights = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("failed")
+
+    results = await asyncio.gather(
+        flights.run("a", fail), flights.run("a", fail), return_exceptions=True
+    )
+    assert all(isinstance(err, ValueError) for err in results)
+    assert flights.stats()["in_flight"] == 0
+
+
+class FakeVideosSearch:
+    searches = []
+
+    def __init__(self, query):
+        self.searches.append(query)
+        self.continuationKey = None
+
+    async def next(self):
+        await asyncio.sleep(0.05)
+        return {"result": [{"id": "v1", "title": "t", "channel": {"name": "c"}}]}
+
+
+@pytest.mark.asyncio
+async def test_search_key(tmp_path, monkeypatch):
+    monkeypatch.setattr(iytdl.main, "_videos_search", FakeVideosSearch)
+    ytdl = iYTDL(log_group_id=1, cache_path=tmp_path.joinpath("cache"))
+    await ytdl.cache._init()
+
+    async def get_ytthumb(yt_id):
+        return f"https://i.ytimg.com/vi/{yt_id}/0.jpg"
+
+    ytdl.get_ytthumb = get_ytthumb
+    try:
+        first, second = await asyncio.gather(
+            ytdl.search("Foo  bar"), ytdl.search("foo bar")
+        )
+        assert FakeVideosSearch.searches == ["Foo  bar"]
+        # the key is the same for either query
+        assert first.key == second.key
+        assert (await ytdl.search(" FOO bar ")).key == first.key
+        assert FakeVideosSearch.searches == ["Foo  bar"]
+    finally:
+        await ytdl.stop()
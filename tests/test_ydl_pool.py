@@ -0,0 +1,19 @@
+from iytdl.ydl_pool import YoutubeDLPool
+
+
+INFO = {"id": "abc", "title": "title", "ext": "mp4"}
+
+
+def test_outtmpl_override():
+    pool = YoutubeDLPool()
+    params = {"quiet": True}
+    with pool.checkout(params, outtmpl="media/%(id)s.%(ext)s") as ytdl:
+        assert ytdl.prepare_filename(INFO) == "media/abc.mp4"
+    with pool.checkout(params) as reused:
+        assert reused is ytdl
+        # back to the default template
+        assert reused.prepare_filename(INFO) == "title [abc].mp4"
+    with pool.checkout(params, outtmpl="other/%(title)s.%(ext)s") as reused:
+        assert reused.prepare_filename(INFO) == "other/title.mp4"
+    assert pool.stats()["reused"] == 2
+    pool.close()
@@ -0,0 +1,119 @@
+import asyncio
+import time
+
+import pytest
+
+from aiohttp import ClientError
+
+from iytdl.main import iYTDL
+
+
+YT_ID = "dQw4w9WgXcQ"
+
+
+def _link(quality, yt_id=YT_ID):
+    return f"https://i.ytimg.com/vi/{yt_id}/{quality}.jpg"
+
+
+class FakeResponse:
+    def __init__(self, delay, status):
+        self.delay = delay
+        self.status = status
+
+    async def __aenter__(self):
+        await asyncio.sleep(self.delay)
+        if self.status is None:
+            raise ClientError
+        return self
+
+    async def __aexit__(self, *_):
+        pass
+
+
+class FakeSession:
+    def __init__(self, responses):
+        # link -> (delay, status), a status of `None` fails the request
+        self.responses = responses
+        self.requests = []
+        self.closed = False
+
+    def head(self, link, timeout=None):
+        self.requests.append(link)
+        return FakeResponse(*self.responses.get(link, (0, 404)))
+
+    async def close(self):
+        self.closed = True
+
+
+async def _iytdl(tmp_path, responses, **kwargs):
+    ytdl = iYTDL(
+        log_group_id=1,
+        cache_path=tmp_path.joinpath("cache"),
+        session=FakeSession(responses),
+        **kwargs,
+    )
+    await ytdl.cache._init()
+    return ytdl
+
+
+@pytest.mark.asyncio
+async def test_best_available(tmp_path):
+    ytdl = await _iytdl(
+        tmp_path,
+        {
+            _link("maxresdefault"): (0, 404),
+            _link("hqdefault"): (0.05, 200),
+            _link("sddefault"): (0, 200),
+            _link("default"): (10, 200),
+        },
+    )
+    try:
+        start = time.monotonic()
+        thumbs = await asyncio.gather(*(ytdl.get_ytthumb(YT_ID) for _ in range(3)))
+        # best quality which exists, without waiting for worse ones
+        assert thumbs == [_link("hqdefault")] * 3
+        assert time.monotonic() - start < 1
+        # probed once for every caller, then cached
+        assert len(ytdl.http.requests) == 5
+        assert await ytdl.get_ytthumb(YT_ID) == _link("hqdefault")
+        assert len(ytdl.http.requests) == 5
+    finally:
+        await ytdl.stop()
+
+
+@pytest.mark.asyncio
+async def test_none_available(tmp_path):
+    ytdl = await _iytdl(
+        tmp_path,
+        {_link("maxresdefault"): (0, None), _link("hqdefault"): (0, 500)},
+    )
+    try:
+        assert await ytdl.get_ytthumb(YT_ID) == ytdl.default_thumb
+        # not cached, probed again next time
+        assert await ytdl.cache.get_thumb(YT_ID) is None
+    finally:
+        await ytdl.stop()
+
+
+@pytest.mark.asyncio
+async def test_timeout(tmp_path):
+    slow = {_link(q): (10, 200) for q in ("maxresdefault", "hqdefault")}
+    ytdl = await _iytdl(
+        tmp_path, {**slow, _link("sddefault"): (0, 200)}, thumb_timeout=0.2
+    )
+    try:
+        start = time.monotonic()
+        # the best one which answered in time
+        assert await ytdl.get_ytthumb(YT_ID) == _link("sddefault")
+        assert time.monotonic() - start < 1
+
+        # none answered in time
+        ytdl.http.responses = {
+            _link(q, "aaaaaaaaaaa"): (10, 200)
+            for q in ("maxresdefault", "hqdefault", "sddefault", "mqdefault", "default")
+        }
+        start = time.monotonic()
+        assert await ytdl.get_ytthumb("aaaaaaaaaaa") == ytdl.default_thumb
+        assert time.monotonic() - start < 1
+    finally:
+        await ytdl.stop()